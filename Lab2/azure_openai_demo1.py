@@ -17,19 +17,20 @@ Prerequisites:
 Reference: https://docs.microsoft.com/en-us/azure/ai-services/openai/quickstart
 """
 
-import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+
+# Make the shared helpers in the repository's common/ folder importable
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.clients import get_openai_client
 
 # Load your configuration from .env file
 load_dotenv()
 
 # Step 1: Set up connection to Azure OpenAI
-client = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version="2024-02-15-preview"
-)
+# (reads AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY and AZURE_OPENAI_API_VERSION from .env)
+client = get_openai_client()
 
 # Step 2: Ask a question
 question = "What is artificial intelligence?"
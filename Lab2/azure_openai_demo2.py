@@ -3,7 +3,9 @@ Azure OpenAI Demo - Simple Q&A Chat
 ====================================
 
 This demo shows how to connect to Azure OpenAI using Python with key-based authentication.
-Users can ask questions and receive responses from Azure OpenAI.
+Users can ask questions and receive responses from Azure OpenAI. The chat remembers the
+conversation, so follow-up questions work: recent turns are sent as-is and older ones as a
+short summary, keeping every request within a fixed token budget.
 
 Prerequisites:
 - Azure OpenAI resource deployed in Azure
@@ -14,12 +16,23 @@ Reference: https://docs.microsoft.com/en-us/azure/ai-services/openai/quickstart?
 """
 
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+
+# Make the shared helpers in the repository's common/ folder importable
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.clients import get_openai_client
+from common.conversation_memory import create_conversation_memory
+from common.rate_limit import create_rate_limiter, chat_completion
 
 # Load environment variables from .env file (override system env vars)
 load_dotenv(override=True)
 
+# Keeps requests within your deployment's quota and retries throttled (429) calls
+# Set AZURE_OPENAI_CHAT_RPM / AZURE_OPENAI_CHAT_TPM in .env to match your deployment
+rate_limiter = create_rate_limiter("AZURE_OPENAI_CHAT")
+
 def initialize_azure_openai():
     """
     Initialize Azure OpenAI client with key-based authentication
@@ -47,18 +60,32 @@ def initialize_azure_openai():
             print("❌ AZURE_OPENAI_API_KEY not found in environment variables")
             return None
             
-        client = AzureOpenAI(
-            azure_endpoint=endpoint,
-            api_key=api_key,
-            api_version=api_version
-        )
+        # The rate limiter does the retrying, so the SDK's own retries are turned off
+        client = get_openai_client(endpoint, api_key, api_version).with_options(max_retries=0)
         print("✅ Successfully connected to Azure OpenAI!")
         return client
     except Exception as e:
         print(f"❌ Failed to initialize Azure OpenAI: {str(e)}")
         return None
 
-def ask_question(client, question, model_deployment_name):
+def create_memory(client, model_deployment_name):
+    """
+    Conversation memory that uses the same deployment to summarize older turns
+    (tune it with MEMORY_RECENT_TURNS and MEMORY_TOKEN_BUDGET in .env)
+    """
+    def complete(messages, max_tokens):
+        response = chat_completion(
+            client, rate_limiter,
+            model=model_deployment_name,
+            messages=messages,
+            temperature=0,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+    
+    return create_conversation_memory(complete, model=model_deployment_name)
+
+def ask_question(client, question, model_deployment_name, memory=None, history=()):
     """
     Send a question to Azure OpenAI and get a response
     
@@ -66,6 +93,8 @@ def ask_question(client, question, model_deployment_name):
         client (AzureOpenAI): Azure OpenAI client
         question (str): User's question
         model_deployment_name (str): Name of your deployed model
+        memory (ConversationMemory): remembers earlier turns (optional)
+        history (list): earlier (question, answer) turns of this conversation
         
     Returns:
         str: AI response or error message
@@ -73,10 +102,15 @@ def ask_question(client, question, model_deployment_name):
     try:
         print(f"🔧 Using model deployment: {model_deployment_name}")
         
-        response = client.chat.completions.create(
+        # Earlier turns: a summary of the old ones plus the last few word for word
+        earlier_messages = memory.prepare(history, question, rewrite=False).messages if memory else []
+        
+        response = chat_completion(
+            client, rate_limiter,
             model=model_deployment_name,  # Your model deployment name (e.g., "gpt-35-turbo")
             messages=[
                 {"role": "system", "content": "You are a helpful assistant. Provide clear and concise answers."},
+                *earlier_messages,
                 {"role": "user", "content": question}
             ],
             temperature=0.7,  # Controls randomness (0-1)
@@ -92,6 +126,8 @@ def ask_question(client, question, model_deployment_name):
             return f"❌ Model deployment '{model_deployment_name}' not found. Please check your model deployment name in Azure OpenAI Studio."
         elif "Unauthorized" in error_msg:
             return f"❌ Authentication failed. Please check your API key."
+        elif getattr(e, "status_code", None) == 429:
+            return f"⏳ Rate limit reached and retries ran out. Please wait a minute or raise your deployment's quota."
         elif "Connection" in error_msg:
             return f"❌ Connection error: {error_msg}. Please check your endpoint URL and internet connection."
         else:
@@ -115,7 +151,11 @@ def main():
     model_name = os.getenv("AZURE_OPENAI_MODEL_NAME", "gpt-4o")
     print(f"Using model deployment: {model_name}")
     
-    print("\nYou can now ask questions! Type 'quit' or 'exit' to end the session.\n")
+    # Remember the conversation so follow-up questions have context
+    memory = create_memory(client, model_name)
+    history = []
+    
+    print("\nYou can now ask questions! Type 'new' to start a new conversation, 'quit' or 'exit' to end the session.\n")
     
     # Chat loop
     while True:
@@ -128,6 +168,12 @@ def main():
                 print("👋 Goodbye! Thanks for using Azure OpenAI demo.")
                 break
             
+            # Forget the conversation so far
+            if user_question.lower() == 'new':
+                history = []
+                print("🆕 Started a new conversation.")
+                continue
+            
             # Skip empty questions
             if not user_question:
                 print("Please enter a question.")
@@ -135,7 +181,11 @@ def main():
             
             # Get AI response
             print("🤔 Thinking...")
-            response = ask_question(client, user_question, model_name)
+            response = ask_question(client, user_question, model_name, memory, history)
+            
+            # Remember the turn (error messages are not part of the conversation)
+            if not response.startswith(("❌", "⏳")):
+                history.append((user_question, response))
             
             # Display response
             print(f"\n🤖 Azure OpenAI: {response}\n")
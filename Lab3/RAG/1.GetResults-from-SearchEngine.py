@@ -2,10 +2,14 @@
 # Step 1: Import Required Libraries
 # ===================================
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv  # For loading environment variables from .env file
-from azure.search.documents import SearchClient  # Azure AI Search client for performing searches
 from azure.search.documents.models import VectorizableTextQuery  # For creating vector-based queries
-from azure.core.credentials import AzureKeyCredential  # For authenticating with Azure services
+
+# Make the shared helpers in the repository's common/ folder importable
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.clients import get_search_client, search_backend  # Azure AI Search or local index client
 
 # Step 2: Load Configuration from Environment File
 # ==============================================
@@ -25,15 +29,16 @@ print(f"Search Service: {AZURE_SEARCH_SERVICE}")
 print(f"Search Key: {'Found' if AZURE_SEARCH_KEY else 'Missing'}")
 print(f"Index Name: {index_name}")
 
-# Exit if essential configuration is missing
-if not AZURE_SEARCH_KEY:
+# Exit if essential configuration is missing (the local index needs no key)
+if not AZURE_SEARCH_KEY and search_backend() == "azure":
     print("❌ AZURE_SEARCH_KEY is missing from .env file")
     exit(1)
 
-# Step 4: Create Authentication Credential
-# ======================================
-# Create credential object using the API key for Azure AI Search authentication
-credential = AzureKeyCredential(AZURE_SEARCH_KEY)
+# Step 4: Choose the Search Backend
+# =================================
+# SEARCH_BACKEND=azure (default) uses Azure AI Search with the API key above;
+# SEARCH_BACKEND=local searches an in-process copy of the index (see common/local_search.py)
+print(f"Search Backend: {search_backend()}")
 
 # Step 5: Define Search Query
 # ==========================
@@ -42,8 +47,8 @@ query = "Share Northwind Standard is a basic plan"
 
 # Step 6: Create Search Client
 # ===========================
-# Initialize the Azure AI Search client to connect to your search service
-search_client = SearchClient(endpoint=AZURE_SEARCH_SERVICE, credential=credential, index_name=index_name)
+# Initialize the search client to connect to your search service
+search_client = get_search_client(endpoint=AZURE_SEARCH_SERVICE, index_name=index_name, key=AZURE_SEARCH_KEY)
 
 # Step 7: Create Vector Query
 # ==========================
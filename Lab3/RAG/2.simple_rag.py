@@ -8,10 +8,16 @@
 # This version uses a HARDCODED question to show the RAG concept clearly
 
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-from azure.search.documents import SearchClient
-from azure.core.credentials import AzureKeyCredential
+
+# Make the shared helpers in the repository's common/ folder importable
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.clients import get_openai_client, get_search_client
+from common.context_packing import pack_context
+from common.fanout import create_query_fanout
+from common.lazy import Lazy
 
 # Load environment variables
 load_dotenv(override=True)
@@ -19,24 +25,38 @@ load_dotenv(override=True)
 # Step 1: Set up our connections to Azure Services
 # --------------------------------------------
 
-# Initialize Azure AI Search
-search_client = SearchClient(
+# Initialize Azure AI Search (or the local index when SEARCH_BACKEND=local).
+# Lazy: the clients are created on first use, so importing this file stays cheap.
+search_client = Lazy(lambda: get_search_client(
     endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
     index_name=os.getenv("AZURE_SEARCH_INDEX_NAME"),
-    credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_KEY"))
-)
+    key=os.getenv("AZURE_SEARCH_KEY")
+))
 
 # Initialize Azure OpenAI
-openai_client = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version="2024-02-15-preview"
-)
+openai_client = Lazy(get_openai_client)
+
+# Field that uniquely identifies each chunk in the index
+KEY_FIELD = os.getenv("AZURE_SEARCH_KEY_FIELD", "chunk_id")
 
 # Step 2: Define our helper functions
 # --------------------------------------------
 
-def search_documents(user_question, top_k=3):
+def complete_text(messages, max_tokens):
+    """A short, deterministic chat call (used to write search query variants)"""
+    response = openai_client.chat.completions.create(
+        model=os.getenv("AZURE_OPENAI_MODEL_NAME", "gpt-4o"),
+        messages=messages,
+        temperature=0,
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content
+
+# Optional multi-query search (FANOUT_MODE=llm or keywords in .env): a few rewrites of the
+# question are searched at the same time and the results merged, so vague questions find more
+fanout = create_query_fanout(complete_text)
+
+def retrieve_documents(user_question, top_k=3):
     """
     Search for relevant documents in Azure AI Search
     This is the 'Retrieval' part of RAG
@@ -44,21 +64,39 @@ def search_documents(user_question, top_k=3):
     print("\nš Searching for relevant documents...")
     
     # Search the index for relevant documents
-    results = search_client.search(
-        search_text=user_question,
-        select=["title", "chunk"],  # We want the content and source file
-        top=top_k  # Get top 3 most relevant documents
-    )
-    
-    # Collect all the relevant content
-    documents = []
-    for result in results:
-        documents.append(
-            f"Content: {result['chunk']}\n"
-            f"Source: {result['title']}\n"
+    # (results are fetched lazily as we iterate over them)
+    def search(query):
+        return search_client.search(
+            search_text=query,
+            select=[KEY_FIELD, "title", "chunk"],  # We want the content, source file and chunk id
+            top=top_k  # Get top 3 most relevant documents
         )
     
-    return "\n".join(documents)
+    # With fan-out on, all variants are searched in parallel and merged (no duplicate chunks)
+    results = fanout.search(user_question, search, key_field=KEY_FIELD, top=top_k)
+    if fanout.enabled:
+        print(f"🔀 Also searched for: {'; '.join(fanout.variants(user_question))}")
+    return results
+
+def format_document(result):
+    """How one search result is shown to the AI"""
+    return (
+        f"Content: {result['chunk']}\n"
+        f"Source: {result['title']}\n"
+    )
+
+def pack_documents(results):
+    """
+    Collect the relevant content, stopping once the token budget
+    (CONTEXT_TOKEN_BUDGET) is full so the prompt size stays predictable
+    """
+    packed = pack_context(results, format_document, model=os.getenv("AZURE_OPENAI_MODEL_NAME", "gpt-4o"))
+    print(f"📏 Context: {packed.tokens} tokens from {len(packed.documents)} documents")
+    return packed
+
+def search_documents(user_question, top_k=3):
+    """Search and return the relevant content as one text block"""
+    return pack_documents(retrieve_documents(user_question, top_k)).text
 
 def generate_answer(user_question, relevant_content):
     """
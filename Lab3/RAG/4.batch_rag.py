@@ -0,0 +1,154 @@
+# Batch RAG (Retrieval Augmented Generation)
+# ==========================================
+# Answers many questions from a file using the same search_documents() and
+# generate_answer() steps as 2.simple_rag.py - useful for regression runs and
+# for pre-generating FAQ answers.
+#
+# - Questions come from a JSONL file ({"id": ..., "question": ...} per line)
+#   or a CSV file with a "question" column (and an optional "id" column)
+# - A bounded pool of workers answers several questions at the same time
+# - Failed questions are retried with exponential backoff
+# - Each result is appended to the output JSONL as soon as it is ready
+# - Re-running with the same output file skips questions already answered
+#
+# Usage (from the Lab3 folder):
+#   python RAG/4.batch_rag.py questions.jsonl --output answers.jsonl --workers 8
+
+import argparse
+import csv
+import importlib.util
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from pathlib import Path
+
+# Step 1: Reuse the RAG helpers from 2.simple_rag.py
+# --------------------------------------------------
+# (the file name starts with a digit, so it is loaded by path instead of "import")
+_spec = importlib.util.spec_from_file_location("simple_rag", Path(__file__).with_name("2.simple_rag.py"))
+simple_rag = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(simple_rag)
+
+
+# Step 2: Read the questions
+# --------------------------
+
+def read_questions(path):
+    """Yield {"id", "question"} dicts from a JSONL or CSV file"""
+    path = Path(path)
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for number, row in enumerate(rows, start=1):
+            question = (row.get("question") or "").strip()
+            if question:
+                yield {"id": str(row.get("id") or number), "question": question}
+
+
+def load_answered_ids(output_path):
+    """Ids that already have a successful answer in the output file (for resuming)"""
+    answered = set()
+    if Path(output_path).exists():
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut off by an interrupted run
+                if record.get("status") == "ok":
+                    answered.add(record["id"])
+    return answered
+
+
+# Step 3: Answer one question, retrying on failure
+# ------------------------------------------------
+
+def answer_with_retries(item, retries=3, backoff_seconds=2.0, top_k=3):
+    """Search + Generate for one question; returns a result record"""
+    started = time.perf_counter()
+    for attempt in range(1, retries + 2):
+        try:
+            relevant_content = simple_rag.search_documents(item["question"], top_k=top_k)
+            answer = simple_rag.generate_answer(item["question"], relevant_content)
+            return dict(item, answer=answer, status="ok", error=None, attempts=attempt,
+                        seconds=round(time.perf_counter() - started, 3))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt <= retries:
+                # Exponential backoff with jitter so retries from many workers spread out
+                time.sleep(backoff_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+    return dict(item, answer=None, status="failed", error=error, attempts=attempt,
+                seconds=round(time.perf_counter() - started, 3))
+
+
+# Step 4: Run the whole batch with a bounded worker pool
+# ------------------------------------------------------
+
+def run_batch(questions, output_path, workers=8, retries=3, top_k=3):
+    """Answer questions concurrently and append results to output_path as they complete"""
+    answered = load_answered_ids(output_path)
+    counts = {"ok": 0, "failed": 0, "skipped": 0}
+    write_lock = threading.Lock()
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as executor:
+        def record(future):
+            result = future.result()
+            with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                counts[result["status"]] += 1
+                done = counts["ok"] + counts["failed"]
+                print(f"{'✅' if result['status'] == 'ok' else '❌'} [{done}] {result['id']}: "
+                      f"{result['seconds']:.1f}s ({done / (time.perf_counter() - started):.2f} questions/sec)")
+
+        # Keep only a few questions queued per worker so huge files are read lazily
+        in_flight = set()
+        for item in questions:
+            if item["id"] in answered:
+                counts["skipped"] += 1
+                continue
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future)
+            in_flight.add(executor.submit(answer_with_retries, item, retries, top_k=top_k))
+        for future in as_completed(in_flight):
+            record(future)
+
+    counts["seconds"] = time.perf_counter() - started
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions with RAG")
+    parser.add_argument("input", help="questions as .jsonl or .csv")
+    parser.add_argument("--output", help="results JSONL (default: <input>.answers.jsonl)")
+    parser.add_argument("--workers", type=int, default=8, help="questions answered at the same time")
+    parser.add_argument("--retries", type=int, default=3, help="retries per question after a failure")
+    parser.add_argument("--top-k", type=int, default=3, help="documents retrieved per question")
+    args = parser.parse_args()
+    output = args.output or str(Path(args.input).with_suffix(".answers.jsonl"))
+
+    print("🎯 Batch RAG")
+    print("=" * 50)
+    print(f"📥 Questions: {args.input}")
+    print(f"📤 Results:   {output}")
+    print(f"👷 Workers:   {args.workers}")
+    print("=" * 50)
+
+    counts = run_batch(read_questions(args.input), output, args.workers, args.retries, args.top_k)
+
+    print("=" * 50)
+    print(f"✅ Answered: {counts['ok']}  ❌ Failed: {counts['failed']}  ⏭️ Already done: {counts['skipped']}")
+    print(f"⏱️ {counts['seconds']:.1f}s total")
+    if counts["failed"]:
+        print("Run the same command again to retry the failed questions.")
+
+
+if __name__ == "__main__":
+    main()
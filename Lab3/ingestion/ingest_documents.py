@@ -0,0 +1,367 @@
+# Document Ingestion Pipeline
+# ===========================
+# A code-first alternative to the portal's "Import and vectorize data" wizard.
+# It streams the Lab-Data documents into chunks, embeds them in batches with a
+# bounded number of parallel requests, and uploads them to the search index in
+# large batches - reporting chunks/sec and tokens/sec as it goes.
+#
+# Runs are incremental: a manifest remembers a content hash for every chunk id,
+# so only new or changed chunks are re-embedded and uploaded, and chunks that
+# disappeared from the sources are deleted from the index. Only the sources passed
+# in this run are checked for removed chunks; --prune also deletes the chunks of
+# sources that were not passed. Use --dry-run to see the diff without changing
+# anything, or --full to re-ingest everything.
+#
+# The index must already exist with the wizard's schema:
+#   chunk_id (key), parent_id, title, chunk, text_vector
+#
+# Usage (from the Lab3 folder):
+#   python ingestion/ingest_documents.py
+#   python ingestion/ingest_documents.py path/to/file.pdf --batch-size 64 --concurrency 8
+#   python ingestion/ingest_documents.py --dry-run
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from itertools import islice
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Make the shared helpers in the repository's common/ folder importable
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT))
+from common.clients import get_openai_client, get_search_client
+
+load_dotenv(override=True)
+
+DEFAULT_SOURCES = [
+    REPO_ROOT / "Lab-Data" / "Northwind_Standard_Benefits_Details.pdf",
+    REPO_ROOT / "Lab-Data" / "Excel-data.xlsx",
+]
+
+# Same defaults as the portal wizard's text split skill
+CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "2000"))
+CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "500"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("INGEST_EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_CONCURRENCY = int(os.getenv("INGEST_EMBEDDING_CONCURRENCY", "4"))
+UPLOAD_BATCH_SIZE = int(os.getenv("INGEST_UPLOAD_BATCH_SIZE", "1000"))
+MANIFEST_PATH = Path(os.getenv("INGEST_MANIFEST_PATH", Path(__file__).resolve().parent / ".manifest.json"))
+
+
+# Step 1: Read documents and split them into chunks
+# -------------------------------------------------
+
+def split_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Split text into overlapping chunks, preferring to break at whitespace"""
+    text = text.strip()
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            space = text.rfind(" ", start + chunk_size // 2, end)
+            if space != -1:
+                end = space
+        yield text[start:end].strip()
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+
+
+def document_id(path):
+    """Stable parent id for a source file (same file name -> same id on every run)"""
+    return hashlib.sha1(Path(path).name.encode("utf-8")).hexdigest()[:16]
+
+
+def safe_key(text):
+    """Azure AI Search keys may only contain letters, digits, '_', '-' and '='"""
+    return re.sub(r"[^A-Za-z0-9_\-=]", "-", text)
+
+
+def iter_pdf_chunks(path):
+    """Yield chunks page by page, so a PDF is never held in memory as one string"""
+    from pypdf import PdfReader
+
+    parent_id = document_id(path)
+    reader = PdfReader(str(path))
+    for page_number, page in enumerate(reader.pages, start=1):
+        for n, chunk in enumerate(split_text(page.extract_text() or "")):
+            if chunk:
+                yield {
+                    "chunk_id": f"{parent_id}_p{page_number}_{n}",
+                    "parent_id": parent_id,
+                    "title": Path(path).name,
+                    "chunk": chunk,
+                }
+
+
+def iter_excel_chunks(path):
+    """Yield chunks of 'Column: value' rows, sheet by sheet, using a streaming reader"""
+    from openpyxl import load_workbook
+
+    parent_id = document_id(path)
+    workbook = load_workbook(str(path), read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(cell) if cell is not None else "" for cell in next(rows, [])]
+            lines = (
+                "; ".join(f"{name}: {value}" for name, value in zip(header, row) if value is not None)
+                for row in rows
+            )
+            buffer, n = "", 0
+            for line in lines:
+                if buffer and len(buffer) + len(line) + 1 > CHUNK_SIZE:
+                    yield _excel_chunk(path, parent_id, sheet.title, n, buffer)
+                    buffer, n = "", n + 1
+                buffer = f"{buffer}\n{line}" if buffer else line
+            if buffer:
+                yield _excel_chunk(path, parent_id, sheet.title, n, buffer)
+    finally:
+        workbook.close()
+
+
+def _excel_chunk(path, parent_id, sheet_name, n, text):
+    return {
+        "chunk_id": f"{parent_id}_{safe_key(sheet_name)}_{n}",
+        "parent_id": parent_id,
+        "title": f"{Path(path).name} ({sheet_name})",
+        "chunk": text,
+    }
+
+
+def iter_chunks(paths):
+    """Chunks from every source file, read lazily"""
+    for path in paths:
+        suffix = Path(path).suffix.lower()
+        if suffix == ".pdf":
+            yield from iter_pdf_chunks(path)
+        elif suffix in (".xlsx", ".xlsm"):
+            yield from iter_excel_chunks(path)
+        else:
+            print(f"⚠️ Skipping unsupported file: {path}")
+
+
+def batched(items, size):
+    """Group an iterable into lists of at most `size` items"""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# Step 2: Work out what changed since the last run
+# ------------------------------------------------
+
+def content_hash(doc):
+    """Hash of everything we index for a chunk, except its vector"""
+    return hashlib.sha256(f"{doc['title']}\n{doc['chunk']}".encode("utf-8")).hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """chunk_id -> content hash from the last successful run"""
+    path = Path(path)
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    path = Path(path)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=0, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def changed_chunks(chunks, manifest, seen, diff):
+    """
+    Yield only chunks that are new or whose content changed. Every chunk id and
+    hash is recorded in `seen`; ids are appended to diff["new"] / diff["changed"]
+    """
+    for doc in chunks:
+        digest = content_hash(doc)
+        seen[doc["chunk_id"]] = digest
+        previous = manifest.get(doc["chunk_id"])
+        if previous == digest:
+            diff["unchanged"] += 1
+            continue
+        diff["new" if previous is None else "changed"].append(doc["chunk_id"])
+        yield doc
+
+
+def removed_chunks(previous, seen, paths, prune=False):
+    """
+    Chunk ids in the manifest that this run no longer produced. Only chunks of the
+    sources in `paths` count, unless prune is set (then every other chunk does too)
+    """
+    parent_ids = {document_id(path) for path in paths}
+    return sorted(
+        chunk_id for chunk_id in set(previous) - set(seen)
+        if prune or chunk_id.split("_", 1)[0] in parent_ids
+    )
+
+
+def delete_removed(search_client, removed_ids, batch_size=UPLOAD_BATCH_SIZE):
+    """Delete chunks that no longer exist in the sources"""
+    for batch in batched(removed_ids, batch_size):
+        search_client.delete_documents(documents=[{"chunk_id": chunk_id} for chunk_id in batch])
+
+
+# Step 3: Embed chunks in batches with bounded concurrency
+# --------------------------------------------------------
+
+def embed_batch(openai_client, model, batch):
+    """Embed a whole batch with one multi-input request; returns (documents, tokens used)"""
+    response = openai_client.embeddings.create(input=[doc["chunk"] for doc in batch], model=model)
+    for doc, item in zip(batch, response.data):
+        doc["text_vector"] = item.embedding
+    return batch, response.usage.total_tokens
+
+
+def embed_chunks(openai_client, model, chunks, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY):
+    """
+    Yield (embedded batch, tokens) as requests complete, keeping at most
+    `concurrency` requests in flight so we stay inside the deployment's quota
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = set()
+        for batch in batched(chunks, batch_size):
+            if len(in_flight) >= concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            in_flight.add(executor.submit(embed_batch, openai_client, model, batch))
+        for future in as_completed(in_flight):
+            yield future.result()
+
+
+# Step 4: Upload to the index in large batches
+# --------------------------------------------
+
+def upload(search_client, documents):
+    """Upload one batch and fail loudly if any document was rejected"""
+    results = search_client.upload_documents(documents=documents)
+    failed = [result.key for result in results if not result.succeeded]
+    if failed:
+        raise RuntimeError(f"{len(failed)} documents failed to upload, e.g. {failed[:3]}")
+
+
+def ingest(documents_to_embed, openai_client, search_client, model, batch_size=EMBEDDING_BATCH_SIZE,
+           concurrency=EMBEDDING_CONCURRENCY, upload_batch_size=UPLOAD_BATCH_SIZE, on_uploaded=None):
+    """
+    Embed and upload a stream of chunk documents; returns throughput statistics.
+    on_uploaded(documents) is called after each successful upload batch.
+    """
+    started = time.perf_counter()
+    chunk_count = token_count = 0
+    pending = []
+
+    for batch, tokens in embed_chunks(openai_client, model, documents_to_embed, batch_size, concurrency):
+        pending.extend(batch)
+        chunk_count += len(batch)
+        token_count += tokens
+        if len(pending) >= upload_batch_size:
+            upload(search_client, pending)
+            if on_uploaded:
+                on_uploaded(pending)
+            pending = []
+        elapsed = time.perf_counter() - started
+        print(f"   📦 {chunk_count} chunks | {chunk_count / elapsed:.1f} chunks/sec | {token_count / elapsed:.0f} tokens/sec")
+
+    if pending:
+        upload(search_client, pending)
+        if on_uploaded:
+            on_uploaded(pending)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "chunks": chunk_count,
+        "tokens": token_count,
+        "seconds": elapsed,
+        "chunks_per_second": chunk_count / elapsed if elapsed else 0.0,
+        "tokens_per_second": token_count / elapsed if elapsed else 0.0,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chunk, embed and upload documents to the search index")
+    parser.add_argument("paths", nargs="*", default=DEFAULT_SOURCES, help="PDF or Excel files (default: Lab-Data files)")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="inputs per embeddings request")
+    parser.add_argument("--concurrency", type=int, default=EMBEDDING_CONCURRENCY, help="embeddings requests in flight")
+    parser.add_argument("--upload-batch-size", type=int, default=UPLOAD_BATCH_SIZE, help="documents per upload")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="where chunk content hashes are kept")
+    parser.add_argument("--dry-run", action="store_true", help="show what would change without embedding or uploading")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-ingest every chunk")
+    parser.add_argument("--prune", action="store_true",
+                        help="also delete chunks of sources not passed in this run")
+    return parser.parse_args()
+
+
+def print_diff(diff, removed_ids, limit=20):
+    for label, ids in (("🆕 New", diff["new"]), ("✏️ Changed", diff["changed"]), ("🗑️ Removed", removed_ids)):
+        print(f"   {label}: {len(ids)}")
+        for chunk_id in ids[:limit]:
+            print(f"      {chunk_id}")
+        if 0 < limit < len(ids):
+            print(f"      ... and {len(ids) - limit} more")
+    print(f"   ✅ Unchanged: {diff['unchanged']}")
+
+
+def main():
+    args = parse_args()
+    print("📥 Document Ingestion Pipeline")
+    print("=" * 50)
+    for path in args.paths:
+        print(f"   📄 {path}")
+
+    previous = load_manifest(args.manifest)
+    seen = {}
+    diff = {"new": [], "changed": [], "unchanged": 0}
+    to_embed = changed_chunks(iter_chunks(args.paths), {} if args.full else previous, seen, diff)
+
+    if args.dry_run:
+        for _ in to_embed:
+            pass
+        removed_ids = removed_chunks(previous, seen, args.paths, args.prune)
+        print("🔎 Dry run - nothing will be embedded, uploaded or deleted")
+        print_diff(diff, removed_ids)
+        return
+
+    # Record chunks in the manifest only once they are safely in the index
+    manifest = dict(previous)
+
+    def on_uploaded(documents):
+        for doc in documents:
+            manifest[doc["chunk_id"]] = seen[doc["chunk_id"]]
+
+    search_client = get_search_client()
+    try:
+        stats = ingest(
+            to_embed,
+            get_openai_client(),
+            search_client,
+            os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002"),
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            upload_batch_size=args.upload_batch_size,
+            on_uploaded=on_uploaded,
+        )
+
+        removed_ids = removed_chunks(previous, seen, args.paths, args.prune)
+        delete_removed(search_client, removed_ids)
+        for chunk_id in removed_ids:
+            manifest.pop(chunk_id, None)
+    finally:
+        save_manifest(manifest, args.manifest)
+
+    print("=" * 50)
+    print_diff(diff, removed_ids, limit=0)
+    print(f"✅ Ingested {stats['chunks']} chunks ({stats['tokens']} tokens) in {stats['seconds']:.1f}s")
+    if stats["chunks"]:
+        print(f"   ⚡ {stats['chunks_per_second']:.1f} chunks/sec, {stats['tokens_per_second']:.0f} tokens/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,17 @@ See README.md for complete workshop progression and learning objectives.
 
 # Import required libraries for advanced RAG
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-from azure.search.documents import SearchClient
-from azure.search.documents.models import VectorizableTextQuery  # Key for vector search
-from openai import AzureOpenAI
-from azure.core.credentials import AzureKeyCredential
+
+# Make the shared helpers in the repository's common/ folder importable
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.clients import get_openai_client, get_search_client, create_embed_fn
+from common.context_packing import pack_context
+from common.fanout import create_query_fanout
+from common.lazy import Lazy
+from common.reranking import create_adaptive_retriever
 
 # Load configuration from .env file
 load_dotenv(override=True)
@@ -27,22 +33,17 @@ AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 deployment_name = os.getenv("AZURE_OPENAI_MODEL_NAME", "gpt-4o")
 
 
-# Initialize Azure services
-credential = AzureKeyCredential(AZURE_SEARCH_KEY)
-
+# Initialize Azure services (created on first use, so importing this file stays cheap)
 # Azure OpenAI client for chat completions
-openai_client = AzureOpenAI(
-  azure_endpoint=AZURE_OPENAI_ENDPOINT, 
-  api_key=AZURE_OPENAI_API_KEY,  
-  api_version="2024-02-15-preview"
-)
-
-# Azure AI Search client for hybrid search
-search_client = SearchClient(
+openai_client = Lazy(lambda: get_openai_client(AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY))
+
+# Azure AI Search client for hybrid search (or the local index when SEARCH_BACKEND=local)
+search_client = Lazy(lambda: get_search_client(
      endpoint=AZURE_SEARCH_SERVICE,
      index_name=index_name,
-     credential=credential
-)
+     key=AZURE_SEARCH_KEY,
+     embed_fn=create_embed_fn(openai_client)
+))
 
 # Advanced grounded prompt template for better AI responses
 GROUNDED_PROMPT="""
@@ -57,45 +58,90 @@ Query: {query}
 Sources:\n{sources}
 """
 
-# Demo query for advanced RAG
-#share Northwind Standard basic plan
-#Share me Northwind Plan costs
-query = "Share me Northwind Plan costs"
-
-# KEY DIFFERENCE: Vector query for semantic similarity search (finds meaning, not just keywords)
-vector_query = VectorizableTextQuery(text=query, k_nearest_neighbors=50, fields="text_vector")
-
-# HYBRID SEARCH: Combines keyword search + vector embeddings for better results
-search_results = search_client.search(
-    search_text=query,              # Traditional keyword search
-    vector_queries=[vector_query],  # + Semantic vector search (THIS IS THE MAGIC!)
-    select=["title", "chunk"],
-    top=5,
-)
-
-# Format search results for AI context
-sources_formatted = "=================\n".join([
-    f'TITLE: {document["title"]}, CONTENT: {document["chunk"]}' 
-    for document in search_results
-])
-
-# Generate AI response using retrieved context (same as Lab3, but with better search results)
-response = openai_client.chat.completions.create(
-    messages=[
-        {
-            "role": "user",
-            "content": GROUNDED_PROMPT.format(query=query, sources=sources_formatted)
-        }
-    ],
-    model=deployment_name,
-    temperature=0  # Consistent responses
-)
-
-# Display the advanced RAG result
-print("\n" + "="*60)
-print("🚀 ADVANCED RAG RESPONSE (Hybrid Search)")
-print("="*60)
-print(response.choices[0].message.content)
-print("="*60)
-print("✨ This response used BOTH keyword + vector similarity search!")
-
+# Field that uniquely identifies each chunk in the index
+KEY_FIELD = os.getenv("AZURE_SEARCH_KEY_FIELD", "chunk_id")
+
+# RE-RANKING: results are re-scored locally and the best 5 kept. The search starts shallow
+# (RETRIEVAL_SHALLOW_K) and only goes RETRIEVAL_DEEP_K deep when the top results are ambiguous
+retriever = create_adaptive_retriever(keep=5)
+
+def complete_text(messages, max_tokens):
+    """A short, deterministic chat call (used to write search query variants)"""
+    response = openai_client.chat.completions.create(
+        messages=messages, model=deployment_name, temperature=0, max_tokens=max_tokens
+    )
+    return response.choices[0].message.content
+
+# MULTI-QUERY (FANOUT_MODE=llm or keywords): rewrites and sub-questions of the query are
+# searched concurrently and merged with reciprocal rank fusion before re-ranking
+fanout = create_query_fanout(complete_text)
+
+def hybrid_search(query):
+    """Keyword + vector search, re-ranked locally; returns the best chunks"""
+    from azure.search.documents.models import VectorizableTextQuery  # Key for vector search
+
+    def search(depth):
+        def search_one(text):
+            # KEY DIFFERENCE: Vector query for semantic similarity search (finds meaning, not just keywords)
+            vector_query = VectorizableTextQuery(text=text, k_nearest_neighbors=depth, fields="text_vector")
+
+            # HYBRID SEARCH: Combines keyword search + vector embeddings for better results
+            return search_client.search(
+                search_text=text,               # Traditional keyword search
+                vector_queries=[vector_query],  # + Semantic vector search (THIS IS THE MAGIC!)
+                select=[KEY_FIELD, "title", "chunk"],
+                top=depth,
+            )
+
+        return fanout.search(query, search_one, key_field=KEY_FIELD, top=depth)
+
+    return retriever.retrieve(query, search, key_field=KEY_FIELD)
+
+def format_sources(search_results):
+    """
+    Format search results for AI context, stopping once the prompt token budget
+    (CONTEXT_TOKEN_BUDGET) is full - prompt size drives latency and cost
+    """
+    packed = pack_context(
+        search_results,
+        lambda document: f'TITLE: {document["title"]}, CONTENT: {document["chunk"]}',
+        model=deployment_name,
+        separator="=================\n"
+    )
+    print(f"📏 Context: {packed.tokens} tokens from {len(packed.documents)} sources"
+          f"{' (last one truncated)' if packed.truncated else ''}")
+    return packed.text
+
+def generate_grounded_answer(query, sources_formatted):
+    """Generate AI response using retrieved context (same as Lab3, but with better search results)"""
+    response = openai_client.chat.completions.create(
+        messages=[
+            {
+                "role": "user",
+                "content": GROUNDED_PROMPT.format(query=query, sources=sources_formatted)
+            }
+        ],
+        model=deployment_name,
+        temperature=0  # Consistent responses
+    )
+    return response.choices[0].message.content
+
+def main():
+    # Demo query for advanced RAG
+    #share Northwind Standard basic plan
+    #Share me Northwind Plan costs
+    query = "Share me Northwind Plan costs"
+
+    sources_formatted = format_sources(hybrid_search(query))
+    answer = generate_grounded_answer(query, sources_formatted)
+
+    # Display the advanced RAG result
+    print("\n" + "="*60)
+    print("🚀 ADVANCED RAG RESPONSE (Hybrid Search)")
+    print("="*60)
+    print(answer)
+    print("="*60)
+    print("✨ This response used BOTH keyword + vector similarity search!")
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,34 @@
 Simple RAG with Gradio UI
 ========================
 Basic RAG: User Query → Search Documents → AI Response
+
+Importing this module is cheap: clients are created on first use and Gradio is only
+imported when the UI is built (app.app, or running this file).
 """
 
 import os
+import sys
+import asyncio
+import time
+from pathlib import Path
 from dotenv import load_dotenv
-import gradio as gr
-from openai import AzureOpenAI
-from azure.search.documents import SearchClient
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents.models import VectorizedQuery
+from embedding_cache import EmbeddingCache
+import structured_data
+import telemetry
+import warmup
+
+# Make the shared helpers in ../common importable
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.answer_cache import create_answer_cache
+from common.conversation_memory import create_conversation_memory
+from common.clients import (
+    get_openai_client, get_search_client, get_async_search_client, create_embed_fn, close_clients, aclose_clients
+)
+from common.fusion import reciprocal_rank_fusion
+from common.hedging import create_hedger
+from common.lazy import Lazy
+from common.load_balancer import create_load_balancer
+from common.reranking import create_adaptive_retriever
 
 load_dotenv()
 
@@ -23,68 +42,181 @@ aoai_key = os.getenv("AZURE_OPENAI_API_KEY")
 aoai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
 aoai_api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
 aoai_embedding_model = os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+search_key_field = os.getenv("AZURE_SEARCH_KEY_FIELD", "chunk_id")
 
-# Initialize clients
-chat_client = AzureOpenAI(
-    api_version=aoai_api_version,
-    api_key=aoai_key,
-    azure_endpoint=aoai_endpoint
-)
+# Initialize clients (shared per process; chat and embeddings reuse one connection pool).
+# Each one is created the first time it is used.
+openai_client = Lazy(lambda: get_openai_client(aoai_endpoint, aoai_key, aoai_api_version))
 
-embedding_client = AzureOpenAI(
-    api_version=aoai_api_version,
-    api_key=aoai_key,
-    azure_endpoint=aoai_endpoint
-)
+# Azure AI Search, or the local in-process index when SEARCH_BACKEND=local
+search_client = Lazy(lambda: get_search_client(
+    ai_search_endpoint, ai_search_index, ai_search_key,
+    embed_fn=create_embed_fn(openai_client, aoai_embedding_model)
+))
 
-search_client = SearchClient(ai_search_endpoint, ai_search_index, AzureKeyCredential(ai_search_key))
+# Async search client lets Gradio serve many chats on its event loop instead of one worker thread each
+async_search_client = Lazy(lambda: get_async_search_client(
+    ai_search_endpoint, ai_search_index, ai_search_key,
+    embed_fn=create_embed_fn(openai_client, aoai_embedding_model)
+))
 
-def search_and_respond(user_query):
-    """Simple RAG: Search + Generate Response"""
-    try:
-        # 1. Generate embeddings for user query
-        query_vector = embedding_client.embeddings.create(
-            input=user_query,
-            model=aoai_embedding_model
-        ).data[0].embedding
-        
-        # 2. Search for relevant documents
+# Chat and embedding calls go to the deployment with the most quota left (AZURE_OPENAI_BACKENDS),
+# staying within each deployment's rate limits and failing over when one is throttled or down
+balancer = Lazy(create_load_balancer)
+telemetry.register_backend_stats(lambda: balancer.stats())
+
+# Use the async pipeline for the chat UI (set ASYNC_PIPELINE=false to use the threaded one)
+use_async_pipeline = os.getenv("ASYNC_PIPELINE", "true").lower() == "true"
+
+# How many chats Gradio may run at the same time (per worker process)
+chat_concurrency_limit = int(os.getenv("CHAT_CONCURRENCY_LIMIT", "200"))
+
+# How many chats may wait in Gradio's queue before new ones are turned away (empty = no limit)
+queue_max_size = int(os.getenv("QUEUE_MAX_SIZE") or 0) or None
+
+# Cache query embeddings so repeated questions skip the embeddings call
+# (the SQLite file is opened on first use, so it is never shared by forked workers)
+embedding_cache = Lazy(lambda: EmbeddingCache(
+    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "1024")),
+    path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+    max_disk_entries=int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "100000"))
+))
+
+# Opt-in (QUERY_LOG_PATH): questions users ask are logged so the most frequent ones can warm the
+# caches on the next startup; the example questions shown in the UI are always warmed
+query_log = warmup.create_query_log()
+warmup_state = warmup.WarmupState()
+
+EXAMPLE_QUESTIONS = [
+    "What are the benefits offered?",
+    "Tell me about healthcare coverage",
+    "What is the Northwind Standard plan?"
+]
+
+def log_query(user_query):
+    if query_log is not None:
+        query_log.record(user_query)
+
+# Lookup and aggregate questions about the Excel workbook (STRUCTURED_DATA_PATHS) are answered
+# with SQL over an in-memory copy of its sheets: milliseconds, and no search or completion calls
+table_router = Lazy(structured_data.create_table_router)
+
+def answer_from_tables(user_query):
+    """The answer from the spreadsheet tables, or None when the question is for RAG"""
+    with telemetry.span("structured") as span:
+        answer = table_router.answer(user_query)
+        span.count = len(answer.rows) if answer else None
+    return answer.text if answer else None
+
+# Opt-in (HEDGING=true): a search or embedding call slower than its usual p95 gets a second,
+# identical attempt and the first answer wins, within a budget of HEDGE_BUDGET_PERCENT extra calls
+search_hedger = create_hedger("search")
+embedding_hedger = create_hedger("embedding")
+telemetry.register_hedge_stats(lambda: [search_hedger.stats(), embedding_hedger.stats()])
+
+def get_query_embedding(user_query):
+    """Embed the query, reusing a cached vector when we have seen it before"""
+    with telemetry.span("embed"):
+        query_vector = embedding_cache.get(user_query, aoai_embedding_model)
+        if query_vector is None:
+            response = embedding_hedger.call(lambda: balancer.embedding(input=user_query))
+            query_vector = response.data[0].embedding
+            embedding_cache.put(user_query, aoai_embedding_model, query_vector)
+        return query_vector
+
+async def get_query_embedding_async(user_query):
+    """Async version of get_query_embedding (the cache may read SQLite, so it runs off the event loop)"""
+    with telemetry.span("embed"):
+        query_vector = await asyncio.to_thread(embedding_cache.get, user_query, aoai_embedding_model)
+        if query_vector is None:
+            response = await embedding_hedger.acall(lambda: balancer.embedding_async(input=user_query))
+            query_vector = response.data[0].embedding
+            await asyncio.to_thread(embedding_cache.put, user_query, aoai_embedding_model, query_vector)
+        return query_vector
+
+# Reuse answers for near-duplicate questions that retrieve the same chunks.
+# The index document count is a cheap fingerprint: when it changes the cache is cleared.
+answer_cache = create_answer_cache(index_version_fn=lambda: search_client.get_document_count())
+
+def cache_stats():
+    """Stats of the caches that are in use, for /metrics"""
+    stats = {"embedding": embedding_cache.stats()}
+    if answer_cache is not None:
+        stats["answer"] = answer_cache.stats()
+    return stats
+
+telemetry.register_cache_stats(cache_stats)
+
+# Stream partial answers to the UI as tokens arrive (set STREAM_RESPONSES=false to disable)
+stream_responses = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+
+# Re-rank retrieved chunks locally and keep the best RERANK_KEEP; the search only goes
+# RETRIEVAL_DEEP_K deep when the shallow results are ambiguous (common/reranking.py)
+retriever = create_adaptive_retriever()
+
+def hybrid_search(user_query, query_vector):
+    """Keyword + vector search for the query, re-ranked; returns the top chunks"""
+    from azure.search.documents.models import VectorizedQuery
+    
+    # 2. Search for relevant documents (depth is chosen by the retriever)
+    def search(depth):
         vector_query = VectorizedQuery(
             vector=query_vector,
-            k_nearest_neighbors=5,
+            k_nearest_neighbors=depth,
             fields="text_vector"
         )
-        
-        search_results = list(search_client.search(
+        return search_hedger.call(lambda: list(search_client.search(
             search_text=user_query,
             vector_queries=[vector_query],
-            select=["chunk", "title"],
-            top=3
-        ))
-        
-        # 3. Format context from search results
+            select=[search_key_field, "chunk", "title"],
+            top=depth
+        )))
+    
+    with telemetry.span("search") as span:
+        results = retriever.retrieve(user_query, search, key_field=search_key_field)
+        span.count = len(results)
+        return results
+
+def complete_text(messages, max_tokens):
+    """One short, deterministic chat call; used to summarize history and rewrite follow-ups"""
+    response = balancer.chat_completion(messages=messages, temperature=0, max_tokens=max_tokens)
+    return response.choices[0].message.content
+
+# Remember the conversation: recent turns word for word, older ones in a cached summary,
+# all within MEMORY_TOKEN_BUDGET so long chats cost no more per turn than short ones
+conversation_memory = create_conversation_memory(complete_text, model=aoai_deployment)
+
+def recall(user_query, history):
+    """Conversation memory for this turn; its query is the follow-up rewritten to stand alone"""
+    with telemetry.span("memory") as span:
+        memory = conversation_memory.prepare(history, user_query)
+        span.count = memory.tokens
+        return memory
+
+def retrieve_documents(user_query):
+    """Embed the query and run the hybrid search; returns (query vector, results)"""
+    # 1. Generate embeddings for user query (cached)
+    query_vector = get_query_embedding(user_query)
+    return query_vector, hybrid_search(user_query, query_vector)
+
+def build_messages(user_query, search_results, memory_messages=()):
+    """Build the chat messages for the model from the retrieved chunks and the conversation so far"""
+    # 3. Format context from search results
+    with telemetry.span("context") as span:
         context = ""
         for doc in search_results:
             context += f"Title: {doc['title']}\nContent: {doc['chunk']}\n\n"
-        
-        # 4. Generate AI response
-        messages = [
-            {"role": "system", "content": f"Answer the user's question based on this context:\n\n{context}"},
-            {"role": "user", "content": user_query}
-        ]
-        
-        response = chat_client.chat.completions.create(
-            model=aoai_deployment,
-            messages=messages,
-            temperature=0.3,
-            max_tokens=200
-        )
-        
-        return response.choices[0].message.content
+        span.count = len(search_results)
     
-    except Exception as e:
-        # Simple demo response when Azure is unavailable
-        return f"""🤖 **Northwind Benefits Assistant** (Demo Mode)
+    return [
+        {"role": "system", "content": f"Answer the user's question based on this context:\n\n{context}"},
+        *memory_messages,
+        {"role": "user", "content": user_query}
+    ]
+
+def demo_mode_response(user_query):
+    """Simple demo response when Azure is unavailable"""
+    return f"""🤖 **Northwind Benefits Assistant** (Demo Mode)
 
 I apologize, but I'm currently unable to connect to Azure services to search through the documents.
 
@@ -104,24 +236,366 @@ In a real scenario, I would:
 
 *[Demo Mode - Azure connection unavailable]*"""
 
+def lookup_cached_answer(query_vector, search_results, memory_messages=()):
+    """
+    Return a cached answer for a near-duplicate question with the same chunks, or None.
+    Answers shaped by a conversation (memory_messages) are never shared, so follow-ups skip the cache.
+    """
+    if answer_cache is None or memory_messages:
+        return None
+    return answer_cache.lookup(query_vector, [doc[search_key_field] for doc in search_results])
+
+def store_cached_answer(query_vector, search_results, answer, memory_messages=()):
+    """Remember a generated answer for later near-duplicate questions (first turns only)"""
+    if answer_cache is not None and not memory_messages:
+        answer_cache.store(query_vector, [doc[search_key_field] for doc in search_results], answer)
+
+def generate_answer(user_query, search_results, memory_messages=()):
+    """Ask the chat model to answer from the retrieved chunks"""
+    messages = build_messages(user_query, search_results, memory_messages)
+    
+    # 4. Generate AI response
+    with telemetry.span("generate") as span:
+        response = balancer.chat_completion(
+            messages=messages,
+            temperature=0.3,
+            max_tokens=200
+        )
+        span.count = response.usage.completion_tokens if response.usage else None
+    
+    return response.choices[0].message.content
+
+def search_and_respond(user_query, history=None):
+    """Simple RAG: Search + Generate Response"""
+    with telemetry.track_request() as request:
+        try:
+            table_answer = answer_from_tables(user_query)
+            if table_answer is not None:
+                request.structured()
+                return table_answer
+            
+            memory = recall(user_query, history)
+            log_query(memory.query)
+            query_vector, search_results = retrieve_documents(memory.query)
+            cached_answer = lookup_cached_answer(query_vector, search_results, memory.messages)
+            if cached_answer is not None:
+                request.cache_hit()
+                return cached_answer
+            
+            answer = generate_answer(user_query, search_results, memory.messages)
+            store_cached_answer(query_vector, search_results, answer, memory.messages)
+            return answer
+        
+        except Exception as e:
+            request.fallback(e)
+            return demo_mode_response(user_query)
+
+def search_and_respond_stream(user_query, history=None):
+    """Streaming RAG: yields the answer so far each time new tokens arrive"""
+    with telemetry.track_request() as request:
+        try:
+            table_answer = answer_from_tables(user_query)
+            if table_answer is not None:
+                request.structured()
+                yield table_answer
+                return
+            
+            memory = recall(user_query, history)
+            log_query(memory.query)
+            query_vector, search_results = retrieve_documents(memory.query)
+            cached_answer = lookup_cached_answer(query_vector, search_results, memory.messages)
+            if cached_answer is not None:
+                request.cache_hit()
+                yield cached_answer
+                return
+            messages = build_messages(user_query, search_results, memory.messages)
+            
+            # 4. Stream the AI response token by token
+            with telemetry.span("generate") as span:
+                stream = balancer.chat_completion(
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=200,
+                    stream=True
+                )
+                
+                answer = ""
+                span.count = 0
+                for chunk in stream:
+                    # Azure sends a first chunk with content filter results and no choices
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        answer += delta
+                        span.count += 1
+                        yield answer
+            
+            store_cached_answer(query_vector, search_results, answer, memory.messages)
+        
+        except Exception as e:
+            # Replace any partial answer with the demo response, same as the non-streaming path
+            request.fallback(e)
+            yield demo_mode_response(user_query)
+
 def chat_function(message, history):
-    """Simple chat function for Gradio interface."""
-    return search_and_respond(message)
+    """Simple chat function for Gradio interface (a generator, so Gradio streams it)."""
+    if stream_responses:
+        yield from search_and_respond_stream(message, history)
+    else:
+        yield search_and_respond(message, history)
 
-if __name__ == "__main__":
-    print("🚀 Starting Simple RAG Chatbot...")
+async def keyword_search_async(user_query, top=3):
+    """Keyword-only search; does not need the query embedding, so it can start right away"""
+    async def fetch():
+        results = await async_search_client.search(
+            search_text=user_query,
+            select=[search_key_field, "chunk", "title"],
+            top=top
+        )
+        return [doc async for doc in results]
+    
+    with telemetry.span("keyword_search") as span:
+        documents = await search_hedger.acall(fetch)
+        span.count = len(documents)
+        return documents
+
+async def vector_search_async(query_vector, top=3):
+    """Vector-only search over the chunk embeddings"""
+    from azure.search.documents.models import VectorizedQuery
+    
+    vector_query = VectorizedQuery(
+        vector=query_vector,
+        k_nearest_neighbors=top,
+        fields="text_vector"
+    )
+    async def fetch():
+        results = await async_search_client.search(
+            search_text=None,
+            vector_queries=[vector_query],
+            select=[search_key_field, "chunk", "title"],
+            top=top
+        )
+        return [doc async for doc in results]
+    
+    with telemetry.span("vector_search") as span:
+        documents = await search_hedger.acall(fetch)
+        span.count = len(documents)
+        return documents
+
+async def retrieve_documents_async(user_query):
+    """Async retrieval: the keyword search runs while the query embedding is generated"""
+    shallow = retriever.shallow_k
+    started = time.perf_counter()
+    
+    # 1. Embed the query and run the keyword half of the hybrid search at the same time
+    query_vector, keyword_results = await asyncio.gather(
+        get_query_embedding_async(user_query),
+        keyword_search_async(user_query, top=shallow)
+    )
+    
+    # 2. Run the vector half once the embedding is ready, then fuse both rankings
+    vector_results = await vector_search_async(query_vector, top=shallow)
+    candidates = reciprocal_rank_fusion([keyword_results, vector_results], search_key_field, top=shallow)
+    
+    # 3. Re-rank; search both halves deeper only if the best chunks are not clear yet
+    async def deeper(depth):
+        keyword_results, vector_results = await asyncio.gather(
+            keyword_search_async(user_query, top=depth),
+            vector_search_async(query_vector, top=depth)
+        )
+        return reciprocal_rank_fusion([keyword_results, vector_results], search_key_field, top=depth)
+    
+    search_results = await retriever.aretrieve(
+        user_query, candidates, deeper, key_field=search_key_field,
+        search_ms=(time.perf_counter() - started) * 1000  # includes the embedding it overlaps
+    )
+    return query_vector, search_results
+
+async def search_and_respond_async(user_query, history=None):
+    """Async RAG: yields partial answers while streaming, or the full answer once"""
+    with telemetry.track_request() as request:
+        try:
+            # Table questions take well under a millisecond, so they are answered right on the loop
+            table_answer = answer_from_tables(user_query)
+            if table_answer is not None:
+                request.structured()
+                yield table_answer
+                return
+            
+            # Summarizing and rewriting are blocking calls; keep them off the event loop
+            memory = await asyncio.to_thread(recall, user_query, history)
+            await asyncio.to_thread(log_query, memory.query)
+            query_vector, search_results = await retrieve_documents_async(memory.query)
+            cached_answer = lookup_cached_answer(query_vector, search_results, memory.messages)
+            if cached_answer is not None:
+                request.cache_hit()
+                yield cached_answer
+                return
+            messages = build_messages(user_query, search_results, memory.messages)
+            
+            # 4. Generate AI response
+            if not stream_responses:
+                with telemetry.span("generate") as span:
+                    response = await balancer.chat_completion_async(
+                        messages=messages,
+                        temperature=0.3,
+                        max_tokens=200
+                    )
+                    span.count = response.usage.completion_tokens if response.usage else None
+                answer = response.choices[0].message.content
+                store_cached_answer(query_vector, search_results, answer, memory.messages)
+                yield answer
+                return
+            
+            with telemetry.span("generate") as span:
+                stream = await balancer.chat_completion_async(
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=200,
+                    stream=True
+                )
+                
+                answer = ""
+                span.count = 0
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        answer += delta
+                        span.count += 1
+                        yield answer
+            
+            store_cached_answer(query_vector, search_results, answer, memory.messages)
+        
+        except Exception as e:
+            request.fallback(e)
+            yield demo_mode_response(user_query)
+
+async def chat_function_async(message, history):
+    """Async chat function for Gradio interface; runs on Gradio's event loop."""
+    async for partial in search_and_respond_async(message, history):
+        yield partial
+
+def build_demo():
+    """Create the Gradio chat interface"""
+    import gradio as gr
     
-    # Create Gradio interface
     demo = gr.ChatInterface(
-        fn=chat_function,
+        fn=chat_function_async if use_async_pipeline else chat_function,
         title="Northwind RAG Chatbot 🏢",
         description="Ask me about Northwind's benefits!",
-        examples=[
-            "What are the benefits offered?",
-            "Tell me about healthcare coverage",
-            "What is the Northwind Standard plan?"
-        ]
+        examples=EXAMPLE_QUESTIONS,
+        concurrency_limit=chat_concurrency_limit
     )
+    return demo.queue(default_concurrency_limit=chat_concurrency_limit, max_size=queue_max_size)
+
+def create_app():
+    """
+    ASGI app for uvicorn/gunicorn: the Gradio UI at /, a stateless streaming API at /api/chat,
+    Prometheus metrics at /metrics, backend stats at /backends, re-ranking stats at /retrieval,
+    hedging stats at /hedging, table-answer stats at /structured and readiness at /ready
+    """
+    import gradio as gr
+    from fastapi import Body, FastAPI, Response
+    from fastapi.responses import JSONResponse, StreamingResponse
+    
+    server = FastAPI()
+    
+    @server.post("/api/chat")
+    async def api_chat(question: str = Body(..., embed=True), history: list = Body(default=[], embed=True)):
+        """
+        Answer one question as streamed text; needs no session, so any worker can serve it.
+        history holds the earlier turns as [question, answer] pairs or role/content messages.
+        """
+        async def stream():
+            sent = ""
+            async for partial in search_and_respond_async(question, history):
+                # Partials are the whole answer so far; send only the new text
+                yield partial[len(sent):] if partial.startswith(sent) else "\n\n" + partial
+                sent = partial
+        return StreamingResponse(stream(), media_type="text/plain; charset=utf-8")
+    
+    @server.on_event("startup")
+    async def warm_up():
+        """Open connections and fill the caches before the first chat arrives"""
+        if query_log is not None:
+            await asyncio.to_thread(query_log.compact)
+        queries = warmup.warmup_queries(query_log, EXAMPLE_QUESTIONS)
+        
+        async def connect():
+            # The spreadsheet tables load while the connections open
+            await asyncio.gather(
+                warmup.open_connections(warmup_state, search_client, async_search_client, balancer),
+                asyncio.to_thread(table_router.resolve)
+            )
+        
+        async def retrieve(query):
+            if use_async_pipeline:
+                await retrieve_documents_async(query)
+            else:
+                await asyncio.to_thread(retrieve_documents, query)
+        
+        # Keep a reference so a warm-up still running after the timeout is not garbage collected
+        server.state.warmup_task = await warmup.start(warmup_state, connect, queries, retrieve)
+    
+    @server.get("/ready")
+    def ready():
+        """200 once warm-up has finished, 503 before (point health checks and probes here)"""
+        return JSONResponse(warmup_state.report(), status_code=200 if warmup_state.ready else 503)
+    
+    @server.on_event("shutdown")
+    async def close_connections():
+        """Close pooled connections once in-flight requests have finished (graceful shutdown)"""
+        close_clients()
+        await aclose_clients()
+        if embedding_cache.created:
+            embedding_cache.close()
+    
+    @server.get("/metrics")
+    def metrics():
+        body, content_type = telemetry.render_metrics()
+        return Response(content=body, media_type=content_type)
+    
+    @server.get("/backends")
+    def backends():
+        """Health, latency and remaining quota of each Azure OpenAI deployment"""
+        return balancer.stats()
+    
+    @server.get("/retrieval")
+    def retrieval():
+        """How often searches went deep, what that added, and time spent searching and re-ranking"""
+        return retriever.stats()
+    
+    @server.get("/hedging")
+    def hedging():
+        """How often hedged searches and embeddings fired and won"""
+        return [search_hedger.stats(), embedding_hedger.stats()]
+    
+    @server.get("/structured")
+    def structured():
+        """Tables loaded, and how many questions they answered without RAG"""
+        return table_router.stats()
+    
+    return gr.mount_gradio_app(server, build_demo(), path="/")
+
+def __getattr__(name):
+    """
+    ASGI entry point: gunicorn -c gunicorn.conf.py app:app (see startup.txt).
+    The app is built when a server first asks for it, not when the module is imported.
+    """
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    print("🚀 Starting Simple RAG Chatbot...")
+    print("🌐 Chat: http://localhost:7862   📊 Metrics: http://localhost:7862/metrics")
     
-    # Launch the app
-    demo.launch(server_port=7862, inbrowser=True)
+    # Launch the app (Gradio UI and /metrics on the same port)
+    uvicorn.run(create_app(), host="127.0.0.1", port=7862)
@@ -0,0 +1,165 @@
+"""
+Query Embedding Cache
+=====================
+Keeps recent query embeddings in memory (LRU) and optionally on disk (SQLite),
+so repeated questions skip the embeddings round trip.
+
+The disk copy is written behind: new embeddings are queued in memory and written in
+one transaction every `flush_every` puts, every `flush_seconds` (a background thread),
+and when the process exits, instead of a commit per question. Each write also evicts
+the least recently used rows beyond `max_disk_entries`, so the file stops growing.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("rag.embedding_cache")
+
+
+def normalize_query(text):
+    """Lower-case and collapse whitespace so trivially different queries share an entry"""
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+class EmbeddingCache:
+    """Bounded LRU cache of query embeddings with optional, bounded SQLite persistence"""
+
+    def __init__(self, max_entries=1024, path=None, max_disk_entries=100000, flush_every=32, flush_seconds=5.0):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.flush_every = max(1, flush_every)
+        self.flush_seconds = flush_seconds
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._pending = {}  # key -> (vector or None for a disk hit, last used); not on disk yet
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_entries = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector TEXT)")
+            # Files written before eviction existed have no last-used column
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(embeddings)")]
+            if "used" not in columns:
+                self._db.execute("ALTER TABLE embeddings ADD COLUMN used REAL NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used)")
+            self._db.commit()
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._closed = threading.Event()
+            threading.Thread(target=self._flush_periodically, name="embedding-cache-flush", daemon=True).start()
+            atexit.register(self.close)
+
+    @staticmethod
+    def make_key(text, model):
+        """Cache key: embedding model + normalized query text"""
+        return hashlib.sha256(f"{model}\n{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, text, model):
+        """Return the cached embedding or None"""
+        key = self.make_key(text, model)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None and self._pending.get(key, (None,))[0] is not None:
+                # Dropped from memory before it reached the disk
+                vector = self._pending[key][0]
+                self._remember(key, vector)
+            if vector is None and self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vector = json.loads(row[0])
+                    self.disk_hits += 1
+                    self._remember(key, vector)
+                    # Refresh its last-used time with the next write, so eviction keeps it
+                    self._pending.setdefault(key, (None, time.time()))
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, text, model, vector):
+        """Store an embedding in memory and, if enabled, queue it for the disk"""
+        key = self.make_key(text, model)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._pending[key] = (vector, time.time())
+                if len(self._pending) >= self.flush_every:
+                    self._flush()
+
+    def flush(self):
+        """Write queued embeddings to disk now"""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Flush and close the SQLite file (also runs when the process exits)"""
+        with self._lock:
+            if self._db is not None:
+                self._closed.set()
+                self._flush()
+                self._db.close()
+                self._db = None
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.warning("Could not write the embedding cache to %s: %s", self.path, e)
+
+    def _flush(self):
+        if self._db is None or not self._pending:
+            return
+        new = [(key, json.dumps(vector), used) for key, (vector, used) in self._pending.items() if vector is not None]
+        touched = [(used, key) for key, (vector, used) in self._pending.items() if vector is None]
+        self._pending.clear()
+        # One transaction for the whole batch, eviction included
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO embeddings (key, vector, used) VALUES (?, ?, ?)", new)
+            self._db.executemany("UPDATE embeddings SET used = ? WHERE key = ?", touched)
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._closed = threading.Event()
+            threading.Thread(target=self._flush_periodically, name="embedding-cache-flush", daemon=True).start()
+            atexit.register(self.close)
+            excess = self._disk_entries - self.max_disk_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY used LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+                self._disk_entries -= excess
+
+    def _remember(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "disk_entries": None if self.path is None else
+                    self._disk_entries + sum(1 for vector, _ in self._pending.values() if vector is not None),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
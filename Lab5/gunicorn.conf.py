@@ -0,0 +1,69 @@
+"""
+Gunicorn configuration for serving the Lab5 app in production
+=============================================================
+    gunicorn -c gunicorn.conf.py app:app
+
+Runs the FastAPI + Gradio ASGI app (app.py's `app`) under uvicorn workers.
+Settings (environment variables):
+- PORT (default 8000): App Service passes the port to listen on
+- WEB_CONCURRENCY (default 1): worker processes, or "auto" for one per CPU core (see the note
+  on workers below)
+- GUNICORN_PRELOAD (default false): import app.py once in the master before forking workers
+- GUNICORN_TIMEOUT (default 120): seconds a worker may be silent before it is restarted
+- GUNICORN_GRACEFUL_TIMEOUT (default 30): seconds in-flight chats get to finish on shutdown/restart
+- GUNICORN_KEEPALIVE (default 5): seconds an idle client connection stays open
+
+Note on workers: Gradio keeps each browser session's queue in the worker process that
+created it, so the chat UI needs every request of a session to reach the same worker.
+Gunicorn cannot route by session, so the default is one worker per instance, scaled out
+with App Service instances (ARR affinity on). An instance that only serves the stateless
+/api/chat route can use every core with WEB_CONCURRENCY=auto.
+
+With more than one worker, Prometheus metrics are collected in multiprocess mode: each
+worker writes its counters to PROMETHEUS_MULTIPROC_DIR (a fresh temporary directory unless
+set) and /metrics adds them up over all workers (see telemetry.py).
+"""
+
+import glob
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+concurrency = os.getenv("WEB_CONCURRENCY", "1")
+workers = (os.cpu_count() or 1) if concurrency.lower() == "auto" else int(concurrency)
+
+# Must be set before app.py (and prometheus_client) is imported, which happens after this file
+if workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus_")
+
+# Preloading imports app.py once in the master and shares that memory with every worker.
+# It is safe: app.py creates its clients and opens the embedding cache database on first
+# use, so no connection is ever shared between forked processes.
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+
+# Streamed answers keep a request open for a while; don't kill workers that are busy streaming
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """Start from an empty metrics directory, so counts from an earlier run are not added in"""
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    """Drop a finished worker's live metrics (its counters stay in the totals)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
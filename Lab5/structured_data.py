@@ -0,0 +1,460 @@
+"""
+Structured Data Fast Path
+=========================
+The Excel workbook in Lab-Data used to be answerable only by chunking and vectorizing
+it like the PDF, so "What is the average salary in IT?" went through retrieval and the
+chat model, and came back slow and often with wrong arithmetic.
+
+Now every sheet is loaded once into an in-memory SQLite table. A router in front of the
+RAG pipeline recognizes lookup and aggregate questions about those tables without any
+model call, turns them into a SQL query and answers from the result, in milliseconds and
+without completion tokens:
+
+- "How many employees are in IT?"                     -> COUNT with a filter
+- "What is the average salary by department?"         -> AVG grouped by a column
+- "Who has the highest performance score?"            -> the top row
+- "List employees hired after 2020 with salary over 70k" -> rows with filters
+- "What is John Smith's salary?"                      -> a single value
+
+A question is only answered from a table when every word in it names a column, a value,
+an aggregate or the table's rows; one unknown word ("PTO", "deductible", "eligible") sends
+it to RAG as before.
+
+Settings (all optional):
+- STRUCTURED_DATA_PATHS (default ../Lab-Data/Excel-data.xlsx): workbooks to load,
+  separated by commas; empty turns the fast path off
+- STRUCTURED_MAX_ROWS (default 20): most rows shown in an answer
+"""
+
+import datetime
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+logger = logging.getLogger("rag.structured")
+
+DEFAULT_PATHS = str(Path(__file__).resolve().parent.parent / "Lab-Data" / "Excel-data.xlsx")
+
+Column = namedtuple("Column", ["name", "kind", "words"])  # kind: integer, real, date or text
+
+QueryPlan = namedtuple("QueryPlan", ["table", "sql", "params", "summary", "scalar"])
+
+StructuredAnswer = namedtuple("StructuredAnswer", ["text", "sql", "rows", "milliseconds"])
+
+# Other words people use for a column, keyed by the words in its name
+SYNONYMS = {
+    "salary": {"salary", "salaries", "earn", "earns", "compensation", "wage", "wages"},
+    "performance": {"performance", "rating", "ratings", "rated"},
+    "score": {"score", "scores"},
+    "hire": {"hire", "hired", "joined", "started"},
+    "department": {"department", "departments", "dept", "team", "teams"},
+    "name": {"name", "names"},
+}
+
+# Words that mean "rows of this table" besides the name of its id column ("Employee_ID")
+ROW_WORDS = {"people", "person", "staff", "who", "whose"}
+
+AGGREGATES = [
+    ("COUNT", re.compile(r"\b(how many|count|number of)\b")),
+    ("AVG", re.compile(r"\b(average|avg|mean)\b")),
+    ("SUM", re.compile(r"\b(total|sum|combined)\b")),
+    ("MAX", re.compile(r"\b(highest|max|maximum|most|top|largest|biggest|best|latest|most recent)\b")),
+    ("MIN", re.compile(r"\b(lowest|min|minimum|least|smallest|worst|earliest|first)\b")),
+]
+LIST_WORDS = re.compile(r"\b(list|show|which|who|whose|all)\b")
+GROUP_BY = re.compile(r"\b(?:by|per|each|every|for each)\s+(\w+)")
+TOP_N = re.compile(r"\btop\s+(\d+)\b")
+COMPARISON = re.compile(
+    r"\b(above|over|more than|greater than|at least|below|under|less than|at most)\s+\$?(\d[\d,]*(?:\.\d+)?)\s*(k)?\b"
+)
+YEAR = re.compile(r"\b(after|before|since|in)\s+((?:19|20)\d\d)\b")
+# Words that carry no meaning of their own in a table question. A question is only answered
+# from a table when every other word names a column, a value, an aggregate or the table's rows;
+# anything left over ("PTO", "deductible", "eligible") means the question is for RAG. "it" is
+# not filler: "how many are in it?" refers to something the table does not know about
+FILLER_WORDS = frozenset(
+    "a about all an and any are as at be been by can could did do does each every for from "
+    "get gets give has have how i in is list many me much my number of on or our per please "
+    "s show tell than that the their there these they this those to us was we were what when "
+    "where which who whom whose with work works worked working would you your".split()
+)
+AGGREGATE_WORDS = frozenset(
+    "how many count number average avg mean total sum combined highest max maximum most top largest "
+    "biggest best latest recent lowest min minimum least smallest worst earliest first".split()
+)
+
+OPERATORS = {"above": ">", "over": ">", "more than": ">", "greater than": ">", "at least": ">=",
+             "below": "<", "under": "<", "less than": "<", "at most": "<="}
+
+
+def column_words(name):
+    """Words that refer to a column: the parts of its name and their synonyms"""
+    parts = [part for part in re.split(r"[_\W]+", name.lower()) if part]
+    words = set(parts) | {part + "s" for part in parts}
+    for part in parts:
+        words |= SYNONYMS.get(part, set())
+    return frozenset(words)
+
+
+def _sql_name(text):
+    return re.sub(r"\W+", "_", text).strip("_").lower() or "sheet"
+
+
+def _cell(value):
+    """Cell value as stored in SQLite (dates as ISO text, so they sort and compare)"""
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat() if value.time() == datetime.time() else value.isoformat(sep=" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def _kind(values):
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, (datetime.date, datetime.datetime)) for value in present):
+        return "date"
+    if present and all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        return "integer"
+    if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return "real"
+    return "text"
+
+
+class Table:
+    """One worksheet loaded into SQLite, with what the router needs to know about it"""
+
+    def __init__(self, name, source, columns, noun, values):
+        self.name = name
+        self.source = source  # "Excel-data.xlsx (Sheet1)"
+        self.columns = columns
+        self.noun = noun  # what one row is, plural: "employees"
+        self.row_words = frozenset(ROW_WORDS | {noun, noun.rstrip("s")})
+        self.values = values  # text column -> its distinct values
+        self.ranges = {}  # numeric column -> (min, max)
+
+    def column(self, name):
+        return next(column for column in self.columns if column.name == name)
+
+
+class TableStore:
+    """Workbook sheets in an in-memory SQLite database, loaded once"""
+
+    def __init__(self):
+        self.connection = sqlite3.connect(":memory:", check_same_thread=False)
+        self.tables = []
+        self._lock = threading.Lock()
+
+    def load_workbook(self, path):
+        """Load every sheet of an .xlsx file (first row = column names) as a table"""
+        from openpyxl import load_workbook
+
+        path = Path(path)
+        workbook = load_workbook(str(path), read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                rows = sheet.iter_rows(values_only=True)
+                header = [str(cell).strip() for cell in next(rows, []) if cell is not None]
+                data = [row[:len(header)] for row in rows if any(cell is not None for cell in row)]
+                if header and data:
+                    self._add_table(path, sheet.title, header, data)
+        finally:
+            workbook.close()
+
+    def _add_table(self, path, sheet_name, header, data):
+        name = _sql_name(f"{path.stem}_{sheet_name}")
+        kinds = [_kind(column) for column in zip(*data)]
+        columns = [Column(column, kind, column_words(column)) for column, kind in zip(header, kinds)]
+        sql_types = {"integer": "INTEGER", "real": "REAL", "date": "TEXT", "text": "TEXT"}
+        definition = ", ".join(f'"{column.name}" {sql_types[column.kind]}' for column in columns)
+        with self._lock:
+            self.connection.execute(f'CREATE TABLE "{name}" ({definition})')
+            self.connection.executemany(
+                f'INSERT INTO "{name}" VALUES ({", ".join("?" * len(columns))})',
+                ([_cell(value) for value in row] for row in data),
+            )
+
+        # "Employee_ID" makes "employee" / "employees" refer to the rows of this table
+        noun = "rows"
+        for column in columns:
+            match = re.match(r"(.+?)[_\s]+id$", column.name, re.IGNORECASE)
+            if match:
+                noun = match.group(1).lower() + "s"
+                break
+        values = {column.name: sorted({str(row[i]) for row in data if row[i] is not None})
+                  for i, column in enumerate(columns) if column.kind == "text"}
+        table = Table(name, f"{path.name} ({sheet_name})", columns, noun, values)
+        for i, column in enumerate(columns):
+            if column.kind in ("integer", "real"):
+                numbers = [row[i] for row in data if row[i] is not None]
+                table.ranges[column.name] = (min(numbers), max(numbers))
+        self.tables.append(table)
+        logger.info("Loaded %s as table %s: %d rows, columns %s",
+                    table.source, name, len(data), [f"{c.name}:{c.kind}" for c in columns])
+
+    def query(self, sql, params=()):
+        """(column names, rows) for a read-only query"""
+        with self._lock:
+            cursor = self.connection.execute(sql, params)
+            return [description[0] for description in cursor.description], cursor.fetchall()
+
+
+def _value_pattern(value):
+    # Short all-caps values ("IT", "HR") must match exactly, so the word "it" does not count
+    flags = 0 if len(value) <= 3 and value.isupper() else re.IGNORECASE
+    return re.compile(r"(?<!\w)" + re.escape(value) + r"(?:'s)?(?!\w)", flags)
+
+
+def _label(name):
+    return name.replace("_", " ")
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return "—" if value is None else str(value)
+
+
+class TableRouter:
+    """Answers lookup and aggregate questions about the tables with SQL; None means use RAG"""
+
+    def __init__(self, store, max_rows=20):
+        self.store = store
+        self.max_rows = max_rows
+        self._patterns = {}  # (table, column) -> [(value, pattern)]
+        for table in store.tables:
+            for column, values in table.values.items():
+                self._patterns[table.name, column] = [(value, _value_pattern(value)) for value in values]
+        self._lock = threading.Lock()
+        self._stats = {"questions": 0, "structured": 0, "errors": 0, "milliseconds": 0.0}
+
+    def _mentioned(self, table, words, text):
+        """Columns the question names (id columns aside) -> where they are first named"""
+        positions = {}
+        for column in table.columns:
+            hits = [text.find(word) for word in column.words if word in words]
+            if hits and not re.search(r"[_\s]id$", column.name, re.IGNORECASE):
+                positions[column.name] = min(hits)
+        return dict(sorted(positions.items(), key=lambda item: item[1]))
+
+    def _values(self, table, question):
+        """Text column -> the values of it that appear in the question ("IT", "Jane Doe")"""
+        matched = {}
+        for column in table.values:
+            found = [value for value, pattern in self._patterns[table.name, column] if pattern.search(question)]
+            # A value inside a longer match ("John" in "John Smith") is not a separate filter
+            found = [value for value in found if not any(value != other and value in other for other in found)]
+            if found:
+                matched[column] = found
+        return matched
+
+    def _unexplained(self, table, text, values):
+        """Words of the question that the table cannot account for"""
+        # Comparisons, years and "top N" are understood as a whole, numbers included
+        for pattern in (COMPARISON, YEAR, TOP_N):
+            text = pattern.sub(" ", text)
+        known = set(FILLER_WORDS | AGGREGATE_WORDS | table.row_words)
+        for column in table.columns:
+            known |= column.words
+        for found in values.values():
+            for value in found:
+                known |= set(re.findall(r"[a-z0-9]+", value.lower()))
+        words = re.findall(r"[a-z0-9]+", text.replace("'s", ""))
+        return [word for word in words if word not in known]
+
+    def _filters(self, table, text, values, mentioned):
+        """(SQL conditions, params, readable filters) from values, comparisons and years in the question"""
+        conditions, params, readable = [], [], []
+
+        for column, found in values.items():
+            if found:
+                conditions.append(f'"{column}" IN ({", ".join("?" * len(found))})')
+                params += found
+                readable.append(f"{_label(column)} = {' or '.join(found)}")
+
+        # Numeric comparisons: "salary over 70k", "score at least 4.5"
+        numeric = [c.name for c in table.columns if c.kind in ("integer", "real")]
+        for match in COMPARISON.finditer(text):
+            number = float(match.group(2).replace(",", "")) * (1000 if match.group(3) else 1)
+            number = int(number) if number.is_integer() else number
+            before = [name for name, position in mentioned.items() if name in numeric and position < match.start()]
+            in_range = [name for name in numeric if table.ranges[name][0] / 10 <= number <= table.ranges[name][1] * 10]
+            candidates = before[-1:] or [name for name in in_range if name in mentioned] or in_range
+            if len(candidates) != 1:
+                return None  # cannot tell which column the number is about
+            operator = OPERATORS[match.group(1)]
+            conditions.append(f'"{candidates[0]}" {operator} ?')
+            params.append(number)
+            readable.append(f"{_label(candidates[0])} {operator} {_format(number)}")
+
+        # Years: "hired after 2020", "in 2021"
+        dates = [c.name for c in table.columns if c.kind == "date"]
+        for match in YEAR.finditer(text):
+            if len(dates) != 1:
+                return None
+            column, word, year = dates[0], match.group(1), match.group(2)
+            if word == "in":
+                conditions.append(f"substr(\"{column}\", 1, 4) = ?")
+            else:
+                conditions.append(f'"{column}" {">=" if word == "since" else ">" if word == "after" else "<"} ?')
+                year = f"{year}-12-31" if word == "after" else f"{year}-01-01"
+            params.append(year)
+            readable.append(f"{_label(column)} {word} {match.group(2)}")
+
+        return conditions, params, readable
+
+    def plan(self, question):
+        """The SQL query that answers the question, or None when it is not a table question"""
+        text = question.lower()
+        words = set(re.findall(r"[a-z0-9_]+", text))
+        best = None
+        for table in self.store.tables:
+            mentioned = self._mentioned(table, words, text)
+            about_rows = bool(words & table.row_words)
+            values = self._values(table, question)
+            # Only "people" or "who" is not enough: the question must name the table, a column or a value
+            if not (mentioned or values or words & {table.noun, table.noun.rstrip("s")}):
+                continue
+            leftover = self._unexplained(table, text, values)
+            if leftover:
+                logger.debug("Not a question for %s (unknown words %s)", table.name, leftover)
+                continue
+            filters = self._filters(table, text, values, mentioned)
+            if filters is None:
+                continue
+            conditions, params, readable = filters
+            plan = self._plan_for(table, text, list(mentioned), about_rows, conditions, params, readable)
+            score = len(mentioned) + len(conditions) + about_rows
+            if plan and (best is None or score > best[0]):
+                best = (score, plan)
+        return best[1] if best else None
+
+    def _plan_for(self, table, text, mentioned, about_rows, conditions, params, readable):
+        aggregate = next((name for name, pattern in AGGREGATES if pattern.search(text)), None)
+        measures = [name for name in mentioned if table.column(name).kind != "text"]
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        scope = f" ({', '.join(readable)})" if readable else ""
+
+        group = None
+        for match in GROUP_BY.finditer(text):
+            group = next((c.name for c in table.columns
+                          if c.kind == "text" and match.group(1) in c.words), group)
+
+        if aggregate == "COUNT" and (about_rows or conditions) and not measures:
+            if group:
+                sql = (f'SELECT "{group}", COUNT(*) AS "Count" FROM "{table.name}"{where} '
+                       f'GROUP BY "{group}" ORDER BY 2 DESC')
+                return QueryPlan(table, sql, params, f"Number of {table.noun} by {_label(group)}{scope}", False)
+            sql = f'SELECT COUNT(*) FROM "{table.name}"{where}'
+            return QueryPlan(table, sql, params, f"Number of {table.noun}{scope}", True)
+
+        if aggregate in ("AVG", "SUM", "MAX", "MIN") and measures:
+            measure = measures[0]
+            is_date = table.column(measure).kind == "date"
+            if aggregate in ("AVG", "SUM") and is_date:
+                return None
+            names = {"AVG": "Average", "SUM": "Total", "MAX": "Latest" if is_date else "Highest",
+                     "MIN": "Earliest" if is_date else "Lowest"}
+            label = f"{names[aggregate]} {_label(measure)}"
+            if group:
+                sql = (f'SELECT "{group}", {aggregate}("{measure}") AS "{label}" FROM "{table.name}"{where} '
+                       f'GROUP BY "{group}" ORDER BY 2 DESC')
+                return QueryPlan(table, sql, params, f"{label} by {_label(group)}{scope}", False)
+            top = TOP_N.search(text)
+            if aggregate in ("MAX", "MIN") and (about_rows or top or LIST_WORDS.search(text)):
+                # "Who has the highest score?" and "top 3 salaries" want rows, not just a number
+                order = "DESC" if aggregate == "MAX" else "ASC"
+                sql = f'SELECT * FROM "{table.name}"{where} ORDER BY "{measure}" {order} LIMIT ?'
+                limit = min(int(top.group(1)), self.max_rows + 1) if top else 1
+                return QueryPlan(table, sql, params + [limit], f"{label}{scope}", False)
+            sql = f'SELECT {aggregate}("{measure}") FROM "{table.name}"{where}'
+            return QueryPlan(table, sql, params, f"{label}{scope}", True)
+
+        if aggregate is None and conditions and mentioned:
+            # A lookup: "What is John Smith's salary?", "Which department is Jane Doe in?"
+            shown = list(dict.fromkeys([c.name for c in table.columns if c.kind == "text"][:1] + mentioned))
+            columns = ", ".join(f'"{name}"' for name in shown)
+            sql = f'SELECT {columns} FROM "{table.name}"{where} LIMIT ?'
+            return QueryPlan(table, sql, params + [self.max_rows + 1], f"{table.noun.capitalize()}{scope}", False)
+
+        if aggregate is None and conditions and about_rows and LIST_WORDS.search(text):
+            sql = f'SELECT * FROM "{table.name}"{where} LIMIT ?'
+            return QueryPlan(table, sql, params + [self.max_rows + 1], f"{table.noun.capitalize()}{scope}", False)
+
+        return None
+
+    def answer(self, question):
+        """StructuredAnswer from the tables, or None to let RAG answer the question"""
+        if not self.store.tables:
+            return None
+        started = time.perf_counter()
+        try:
+            plan = self.plan(question)
+            if plan is None:
+                return self._record(started, structured=False)
+            columns, rows = self.store.query(plan.sql, plan.params)
+        except Exception as e:
+            # Any planning or query problem leaves the question to RAG rather than failing the chat
+            logger.warning("Structured query failed for %r, using RAG instead: %s", question, e)
+            return self._record(started, structured=False, error=True)
+
+        milliseconds = (time.perf_counter() - started) * 1000
+        text = self.format_answer(plan, columns, rows, milliseconds)
+        self._record(started, structured=True)
+        logger.info("structured question=%r sql=%r params=%r rows=%d ms=%.2f",
+                    question[:80], plan.sql, plan.params, len(rows), milliseconds)
+        return StructuredAnswer(text, plan.sql, rows, milliseconds)
+
+    def format_answer(self, plan, columns, rows, milliseconds):
+        if plan.scalar:
+            body = f"**{plan.summary}:** {_format(rows[0][0] if rows else None)}"
+        elif not rows:
+            body = f"**{plan.summary}:** no matching rows."
+        else:
+            shown = rows[:self.max_rows]
+            lines = [f"**{plan.summary}:**", "",
+                     "| " + " | ".join(_label(c) for c in columns) + " |",
+                     "|" + "---|" * len(columns)]
+            lines += ["| " + " | ".join(_format(value) for value in row) + " |" for row in shown]
+            if len(rows) > self.max_rows:
+                lines.append(f"\n(first {self.max_rows} rows shown)")
+            body = "\n".join(lines)
+        return f"{body}\n\n_From {plan.table.source} in {milliseconds:.1f} ms_"
+
+    def _record(self, started, structured, error=False):
+        with self._lock:
+            self._stats["questions"] += 1
+            self._stats["structured"] += int(structured)
+            self._stats["errors"] += int(error)
+            self._stats["milliseconds"] += (time.perf_counter() - started) * 1000
+        return None
+
+    def stats(self):
+        """How many questions the tables answered, and the average time spent routing"""
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            "tables": [table.source for table in self.store.tables],
+            "questions": stats["questions"],
+            "structured": stats["structured"],
+            "errors": stats["errors"],
+            "avg_ms": stats["milliseconds"] / (stats["questions"] or 1),
+        }
+
+
+def create_table_router():
+    """TableRouter over the workbooks in STRUCTURED_DATA_PATHS (no tables when it is empty)"""
+    store = TableStore()
+    for path in filter(None, (p.strip() for p in os.getenv("STRUCTURED_DATA_PATHS", DEFAULT_PATHS).split(","))):
+        try:
+            store.load_workbook(path)
+        except Exception as e:
+            # Without the tables every question simply goes to RAG
+            logger.warning("Could not load %s for structured answers: %s", path, e)
+    return TableRouter(store, max_rows=int(os.getenv("STRUCTURED_MAX_ROWS", "20")))
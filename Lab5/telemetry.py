@@ -0,0 +1,266 @@
+"""
+Pipeline Telemetry
+==================
+Timing spans for each RAG stage (embed, search, context, generate) and Prometheus
+metrics, served at /metrics next to the Gradio UI.
+
+    with telemetry.span("search") as span:
+        results = search(...)
+        span.count = len(results)
+
+Every span records its duration, how many items it produced, and the exception class
+if it failed. Every chat request is counted by outcome: ok, cache_hit, structured (answered
+from the spreadsheet tables) or fallback (the demo-mode answer shown when Azure could not be
+reached).
+
+Several worker processes: each process counts on its own, so a scrape would only see the
+worker that answered it. When PROMETHEUS_MULTIPROC_DIR is set (gunicorn.conf.py sets it for
+more than one worker) the counters and histograms are written to files in that directory
+and /metrics adds them up over all workers. The backend, hedging and cache stats are read
+from live objects at scrape time, so those still describe the worker that answered.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger("rag.telemetry")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds", "Time spent in each RAG stage",
+    ["stage", "error"], buckets=LATENCY_BUCKETS
+)
+STAGE_RESULTS = Histogram(
+    "rag_stage_results", "Items produced by each stage (documents retrieved, tokens generated)",
+    ["stage"], buckets=COUNT_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "rag_stage_errors_total", "Stage failures by exception class", ["stage", "error"]
+)
+REQUESTS = Counter(
+    "rag_requests_total", "Chat requests by outcome (ok, cache_hit, structured, fallback)", ["outcome"]
+)
+REQUEST_SECONDS = Histogram(
+    "rag_request_duration_seconds", "End-to-end chat latency by outcome",
+    ["outcome"], buckets=LATENCY_BUCKETS
+)
+FALLBACKS = Counter(
+    "rag_fallbacks_total", "Demo-mode answers by the exception that caused them", ["error"]
+)
+
+
+class Span:
+    """One timed stage; set count to the number of items it produced"""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.count = None
+        self.error = None
+        self.seconds = None
+
+
+@contextmanager
+def span(stage):
+    """Time a pipeline stage and record its duration, result count and error class"""
+    current = Span(stage)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.error = type(e).__name__
+        STAGE_ERRORS.labels(stage, current.error).inc()
+        raise
+    finally:
+        current.seconds = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage, current.error or "none").observe(current.seconds)
+        if current.count is not None:
+            STAGE_RESULTS.labels(stage).observe(current.count)
+        logger.debug("stage=%s seconds=%.3f count=%s error=%s",
+                     stage, current.seconds, current.count, current.error)
+
+
+class RequestOutcome:
+    """Outcome of one chat request; "ok" unless marked otherwise"""
+
+    def __init__(self):
+        self.outcome = "ok"
+        self.error = None
+
+    def cache_hit(self):
+        self.outcome = "cache_hit"
+
+    def structured(self):
+        self.outcome = "structured"
+
+    def fallback(self, error):
+        """Count a demo-mode answer instead of hiding the failure"""
+        self.outcome = "fallback"
+        self.error = type(error).__name__
+        FALLBACKS.labels(self.error).inc()
+        logger.warning("Falling back to demo mode after %s: %s", self.error, error)
+
+
+@contextmanager
+def track_request():
+    """Count one chat request by outcome and time it end to end"""
+    request = RequestOutcome()
+    started = time.perf_counter()
+    try:
+        yield request
+    finally:
+        REQUESTS.labels(request.outcome).inc()
+        REQUEST_SECONDS.labels(request.outcome).observe(time.perf_counter() - started)
+
+
+# Collectors that read this process's live objects (added to every multiprocess scrape)
+_live_collectors = []
+
+
+def _register(collector):
+    REGISTRY.register(collector)
+    _live_collectors.append(collector)
+
+
+class BackendStatsCollector:
+    """Exports the load balancer's per-backend stats (read at scrape time)"""
+
+    def __init__(self, stats_fn):
+        self.stats_fn = stats_fn
+
+    def _families(self):
+        healthy = GaugeMetricFamily("rag_backend_healthy", "1 if the backend is taking calls", labels=["backend"])
+        in_flight = GaugeMetricFamily("rag_backend_in_flight", "Calls in flight", labels=["backend"])
+        latency = GaugeMetricFamily("rag_backend_latency_seconds", "Recent average call latency", labels=["backend"])
+        remaining = GaugeMetricFamily("rag_backend_remaining_tokens", "Quota left this minute",
+                                      labels=["backend", "kind"])
+        counters = {
+            name: CounterMetricFamily(f"rag_backend_{name}", f"Backend {name}", labels=["backend"])
+            for name in ("calls", "failures", "throttled", "ejections")
+        }
+        return healthy, in_flight, latency, remaining, counters
+
+    def describe(self):
+        # Lets the registry learn the metric names without reading stats (and building clients)
+        healthy, in_flight, latency, remaining, counters = self._families()
+        yield from (healthy, in_flight, latency, remaining, *counters.values())
+
+    def collect(self):
+        healthy, in_flight, latency, remaining, counters = self._families()
+        for backend in self.stats_fn():
+            name = backend["name"]
+            healthy.add_metric([name], 1 if backend["healthy"] else 0)
+            in_flight.add_metric([name], backend["in_flight"])
+            if backend["latency_ms"] is not None:
+                latency.add_metric([name], backend["latency_ms"] / 1000)
+            for kind, tokens in backend["remaining_tokens"].items():
+                if tokens is not None:
+                    remaining.add_metric([name, kind], tokens)
+            for counter_name, family in counters.items():
+                family.add_metric([name], backend[counter_name])
+        yield from (healthy, in_flight, latency, remaining, *counters.values())
+
+
+def register_backend_stats(stats_fn):
+    """Publish per-backend stats (e.g. LoadBalancer.stats) on /metrics"""
+    _register(BackendStatsCollector(stats_fn))
+
+
+class HedgeStatsCollector:
+    """Exports how often hedged requests fired and won, per kind of call (read at scrape time)"""
+
+    def __init__(self, stats_fn):
+        self.stats_fn = stats_fn
+
+    def _families(self):
+        counters = {
+            stat: CounterMetricFamily(metric, help_text, labels=["call"])
+            for stat, metric, help_text in (
+                ("calls", "rag_hedge_calls", "Calls that could be hedged"),
+                ("hedged", "rag_hedges_sent", "Second attempts sent"),
+                ("hedge_wins", "rag_hedge_wins", "Second attempts that answered first"),
+                ("budget_denied", "rag_hedges_denied", "Hedges skipped because the hedge budget was spent"),
+            )
+        }
+        delay = GaugeMetricFamily("rag_hedge_delay_seconds", "Wait before a hedge is sent", labels=["call"])
+        return counters, delay
+
+    def describe(self):
+        counters, delay = self._families()
+        yield from (*counters.values(), delay)
+
+    def collect(self):
+        counters, delay = self._families()
+        for hedger in self.stats_fn():
+            for name, family in counters.items():
+                family.add_metric([hedger["name"]], hedger[name])
+            if hedger["hedge_delay_ms"] is not None:
+                delay.add_metric([hedger["name"]], hedger["hedge_delay_ms"] / 1000)
+        yield from (*counters.values(), delay)
+
+
+def register_hedge_stats(stats_fn):
+    """Publish hedging stats (a list of Hedger.stats()) on /metrics"""
+    _register(HedgeStatsCollector(stats_fn))
+
+
+class CacheStatsCollector:
+    """Exports hit, miss and size counters of the query caches, per cache (read at scrape time)"""
+
+    def __init__(self, stats_fn):
+        self.stats_fn = stats_fn
+
+    def _families(self):
+        counters = {
+            stat: CounterMetricFamily(metric, help_text, labels=["cache"])
+            for stat, metric, help_text in (
+                ("hits", "rag_cache_hits", "Lookups answered from the cache"),
+                ("misses", "rag_cache_misses", "Lookups not found in the cache"),
+                ("evictions", "rag_cache_evictions", "Entries dropped from disk to stay under the size cap"),
+            )
+        }
+        gauges = {
+            stat: GaugeMetricFamily(metric, help_text, labels=["cache"])
+            for stat, metric, help_text in (
+                ("entries", "rag_cache_entries", "Entries held in memory"),
+                ("disk_entries", "rag_cache_disk_entries", "Entries stored on disk"),
+            )
+        }
+        return counters, gauges
+
+    def describe(self):
+        counters, gauges = self._families()
+        yield from (*counters.values(), *gauges.values())
+
+    def collect(self):
+        counters, gauges = self._families()
+        for cache, stats in self.stats_fn().items():
+            for name, family in (*counters.items(), *gauges.items()):
+                if stats.get(name) is not None:
+                    family.add_metric([cache], stats[name])
+        yield from (*counters.values(), *gauges.values())
+
+
+def register_cache_stats(stats_fn):
+    """Publish cache stats (a dict of cache name -> stats()) on /metrics"""
+    _register(CacheStatsCollector(stats_fn))
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus text exposition for /metrics"""
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest(), CONTENT_TYPE_LATEST
+    # Counters and histograms of every worker, from the files in PROMETHEUS_MULTIPROC_DIR
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _live_collectors:
+        registry.register(collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,59 +1,128 @@
 """
-Simple connection test for Lab5 RAG app
+Connection health check for Lab5 RAG app
+========================================
+Probes Azure AI Search, the chat deployment and the embedding deployment in
+parallel. Each check has its own deadline (CHECK_TIMEOUT seconds, default 10)
+and reports its measured round-trip latency.
+
+    python test_connections.py
+
+Exits with status 1 if any check fails, so it can gate a deployment script.
 """
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-from azure.search.documents import SearchClient
-from azure.core.credentials import AzureKeyCredential
+
+# Make the shared helpers in ../common importable
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from common.clients import get_openai_client, get_search_client
 
 # Load environment
 load_dotenv(override=True)
 
 # Get configuration
 ai_search_endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
-ai_search_key = os.getenv("AZURE_SEARCH_KEY") 
+ai_search_key = os.getenv("AZURE_SEARCH_KEY")
 ai_search_index = os.getenv("AZURE_SEARCH_INDEX_NAME")
 
 aoai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
 aoai_key = os.getenv("AZURE_OPENAI_API_KEY")
 aoai_model = os.getenv("AZURE_OPENAI_MODEL_NAME")
+aoai_embedding_model = os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
 
-print("🔧 Testing Connections...")
-print(f"Search Endpoint: {ai_search_endpoint}")
-print(f"Search Index: {ai_search_index}")
-print(f"OpenAI Endpoint: {aoai_endpoint}")
-print(f"OpenAI Model: {aoai_model}")
-print("-" * 50)
-
-# Test Azure AI Search
-try:
-    print("🔄 Testing Azure AI Search...")
-    search_client = SearchClient(ai_search_endpoint, ai_search_index, AzureKeyCredential(ai_search_key))
-    
-    # Try a simple search
-    results = list(search_client.search("test", top=1))
-    print("✅ Azure AI Search connection successful!")
-except Exception as e:
-    print(f"❌ Azure AI Search failed: {e}")
-
-# Test Azure OpenAI
-try:
-    print("🔄 Testing Azure OpenAI...")
-    openai_client = AzureOpenAI(
-        azure_endpoint=aoai_endpoint,
-        api_key=aoai_key,
-        api_version="2024-02-15-preview"
-    )
-    
-    # Try a simple completion
-    response = openai_client.chat.completions.create(
+CHECK_TIMEOUT = float(os.getenv("CHECK_TIMEOUT", "10"))
+
+
+# Step 1: One small request per service, bounded by the deadline
+# ---------------------------------------------------------------
+
+def check_search(timeout):
+    search_client = get_search_client(ai_search_endpoint, ai_search_index, ai_search_key)
+    # connection_timeout/read_timeout apply to this call only
+    list(search_client.search("test", top=1, connection_timeout=timeout, read_timeout=timeout))
+
+
+def check_chat(timeout):
+    # No retries: a health check should report the first failure, not hide it
+    client = get_openai_client(aoai_endpoint, aoai_key).with_options(timeout=timeout, max_retries=0)
+    client.chat.completions.create(
         model=aoai_model,
         messages=[{"role": "user", "content": "Hello"}],
-        max_tokens=10
+        max_tokens=1
     )
-    print("✅ Azure OpenAI connection successful!")
-except Exception as e:
-    print(f"❌ Azure OpenAI failed: {e}")
 
-print("\n🎯 Connection test complete!")
\ No newline at end of file
+
+def check_embeddings(timeout):
+    client = get_openai_client(aoai_endpoint, aoai_key).with_options(timeout=timeout, max_retries=0)
+    client.embeddings.create(input="health check", model=aoai_embedding_model)
+
+
+CHECKS = {
+    "Azure AI Search": check_search,
+    "Azure OpenAI chat": check_chat,
+    "Azure OpenAI embeddings": check_embeddings,
+}
+
+
+def timed(check, timeout):
+    """Run one check; returns (error or None, latency in ms)"""
+    started = time.perf_counter()
+    try:
+        check(timeout)
+        error = None
+    except Exception as e:
+        error = e
+    return error, (time.perf_counter() - started) * 1000
+
+
+# Step 2: Run every check at once
+# -------------------------------
+
+def run_checks(timeout=CHECK_TIMEOUT):
+    """
+    Run all checks in parallel; returns {name: {"ok", "latency_ms", "error"}}.
+    A check still running after the deadline is reported as timed out.
+    """
+    executor = ThreadPoolExecutor(max_workers=len(CHECKS))
+    futures = {name: executor.submit(timed, check, timeout) for name, check in CHECKS.items()}
+    # A little grace on top of the SDK timeouts, which only bound each network read
+    wait(futures.values(), timeout=timeout + 1)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    for name, future in futures.items():
+        if future.done():
+            error, latency_ms = future.result()
+        else:
+            error, latency_ms = TimeoutError(f"no answer within {timeout:.0f}s"), None
+        results[name] = {"ok": error is None, "latency_ms": latency_ms, "error": error}
+    return results
+
+
+def main():
+    print("🔧 Testing Connections...")
+    print(f"Search Endpoint: {ai_search_endpoint}")
+    print(f"Search Index: {ai_search_index}")
+    print(f"OpenAI Endpoint: {aoai_endpoint}")
+    print(f"OpenAI Models: {aoai_model}, {aoai_embedding_model}")
+    print(f"Deadline per check: {CHECK_TIMEOUT:.0f}s")
+    print("-" * 50)
+
+    results = run_checks()
+    for name, result in results.items():
+        latency = f"{result['latency_ms']:.0f} ms" if result["latency_ms"] is not None else "timed out"
+        if result["ok"]:
+            print(f"✅ {name}: OK ({latency})")
+        else:
+            print(f"❌ {name}: failed ({latency}) - {type(result['error']).__name__}: {result['error']}")
+
+    failed = [name for name, result in results.items() if not result["ok"]]
+    print(f"\n🎯 Connection test complete! {len(results) - len(failed)}/{len(results)} checks passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Embedding cache tests (memory LRU + SQLite write-behind), on a temporary file.
+Run from the repository root: python -m pytest Lab5/tests
+"""
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from embedding_cache import EmbeddingCache  # noqa: E402
+
+
+def rows(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+def test_queued_vector_is_a_hit_after_leaving_memory(tmp_path):
+    cache = EmbeddingCache(max_entries=1, path=tmp_path / "cache.db", flush_seconds=60)
+    cache.put("first question", "model", [1.0])
+    cache.put("second question", "model", [2.0])  # pushes the first out of memory before any flush
+    assert cache.get("First  question", "model") == [1.0]
+    assert cache.stats()["misses"] == 0
+    cache.close()
+
+
+def test_queued_vectors_are_flushed_on_a_timer(tmp_path):
+    path = tmp_path / "cache.db"
+    cache = EmbeddingCache(path=path, flush_seconds=0.05)
+    cache.put("question", "model", [1.0])
+    deadline = time.monotonic() + 2
+    while rows(path) == 0 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert rows(path) == 1
+    cache.close()
+
+
+def test_disk_is_capped_least_recently_used_first(tmp_path):
+    path = tmp_path / "cache.db"
+    cache = EmbeddingCache(max_entries=2, path=path, max_disk_entries=3, flush_every=1, flush_seconds=60)
+    for n in range(6):
+        cache.put(f"question {n}", "model", [float(n)])
+    cache.close()
+    assert rows(path) == 3
+
+    reopened = EmbeddingCache(path=path, flush_seconds=60)
+    assert reopened.get("question 5", "model") == [5.0]
+    assert reopened.get("question 0", "model") is None
+    assert reopened.stats()["evictions"] == 0
+    reopened.close()
@@ -0,0 +1,87 @@
+"""
+Hedged request tests (no network).
+Run from the repository root: python -m pytest Lab5/tests
+"""
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from common import hedging  # noqa: E402
+
+
+def warmed_hedger(delay_ms=50):
+    hedger = hedging.Hedger("test", min_samples=1, min_delay_ms=delay_ms)
+    hedger.latencies.add(delay_ms / 1000)
+    return hedger
+
+
+def test_slow_async_call_is_hedged_and_the_loser_cancelled():
+    hedger = warmed_hedger()
+    attempts = []
+
+    async def call():
+        attempts.append("started")
+        try:
+            await asyncio.sleep(1 if len(attempts) == 1 else 0)
+            return len(attempts)
+        except asyncio.CancelledError:
+            attempts.append("cancelled")
+            raise
+
+    async def run():
+        result = await hedger.acall(call)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == 2
+    assert "cancelled" in attempts
+    assert hedger.stats()["hedge_wins"] == 1
+
+
+def test_cancelled_caller_cancels_the_first_attempt():
+    hedger = warmed_hedger()
+    state = {}
+
+    async def call():
+        try:
+            await asyncio.sleep(1)
+            state["finished"] = True
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def run():
+        task = asyncio.ensure_future(hedger.acall(call))
+        await asyncio.sleep(0.01)  # still inside the first wait, before any hedge
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert state == {"cancelled": True}
+
+
+def test_time_queued_in_the_pool_does_not_trigger_a_hedge(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(hedging, "_executor", pool)
+    hedger = warmed_hedger()
+    pool.submit(time.sleep, 0.3)  # the only pool thread is busy for longer than the hedge delay
+    assert hedger.call(lambda: "ok") == "ok"
+    assert hedger.stats()["hedged"] == 0
+    pool.shutdown()
+
+
+def test_sync_calls_run_inline_until_latencies_are_known(monkeypatch):
+    def no_pool():
+        raise AssertionError("the pool was used before any hedge was possible")
+    monkeypatch.setattr(hedging, "get_hedge_executor", no_pool)
+    hedger = hedging.Hedger("test", min_samples=5)
+    assert hedger.call(lambda: 42) == 42
+    assert len(hedger.latencies) == 1
@@ -0,0 +1,123 @@
+"""
+Load balancer tests against a mock HTTP transport (no Azure calls).
+Run from the repository root: python -m pytest Lab5/tests
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+openai = pytest.importorskip("openai")
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from common.load_balancer import Backend, LoadBalancer  # noqa: E402
+from common.rate_limit import RateLimiter  # noqa: E402
+
+EMBEDDING = {"object": "list", "model": "embed", "usage": {"prompt_tokens": 1, "total_tokens": 1},
+             "data": [{"object": "embedding", "index": 0, "embedding": [0.1, 0.2]}]}
+CHAT = {"id": "1", "object": "chat.completion", "created": 0, "model": "chat",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "hi"}}]}
+
+
+def make_backend(name, statuses):
+    """Backend whose calls answer with the given statuses in turn (then 200); returns (backend, calls)"""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        status = statuses.pop(0) if statuses else 200
+        if status != 200:
+            return httpx.Response(status, json={"error": {"code": str(status), "message": "mock"}})
+        return httpx.Response(200, json=CHAT if request.url.path.endswith("/chat/completions") else EMBEDDING)
+
+    settings = {"azure_endpoint": f"https://{name}.openai.azure.com/", "api_key": "key",
+                "api_version": "2024-02-15-preview", "max_retries": 0}
+    client = openai.AzureOpenAI(http_client=httpx.Client(transport=httpx.MockTransport(handler)), **settings)
+    async_client = openai.AsyncAzureOpenAI(
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), **settings)
+    # No backoff between rounds, so failing tests do not sleep
+    limiter = lambda kind: RateLimiter(max_retries=0, base_delay=0.0, name=f"{name}-{kind}")  # noqa: E731
+    backend = Backend(name, client, async_client, "chat", "embed",
+                      chat_limiter=limiter("chat"), embedding_limiter=limiter("embedding"))
+    return backend, calls
+
+
+def test_call_returns_parsed_responses():
+    backend, calls = make_backend("a", [])
+    balancer = LoadBalancer([backend])
+    assert balancer.embedding(input="hello").data[0].embedding == [0.1, 0.2]
+    assert balancer.chat_completion(messages=[{"role": "user", "content": "hi"}]).choices[0].message.content == "hi"
+    assert len(calls) == 2
+
+
+def test_acall_returns_parsed_responses():
+    backend, calls = make_backend("a", [])
+    balancer = LoadBalancer([backend])
+
+    async def both():
+        embedding = await balancer.embedding_async(input="hello")
+        chat = await balancer.chat_completion_async(messages=[{"role": "user", "content": "hi"}])
+        return embedding, chat
+
+    embedding, chat = asyncio.run(both())
+    assert embedding.data[0].embedding == [0.1, 0.2]
+    assert chat.choices[0].message.content == "hi"
+    assert backend.in_flight == 0
+
+
+def test_failed_call_moves_to_another_backend():
+    first, first_calls = make_backend("a", [503])
+    second, second_calls = make_backend("b", [])
+    balancer = LoadBalancer([first, second], strategy="latency")
+    first.latency_ewma, second.latency_ewma = 0.1, 0.2  # "a" is chosen first
+    assert balancer.embedding(input="hello").data[0].embedding == [0.1, 0.2]
+    assert (len(first_calls), len(second_calls)) == (1, 1)
+    assert first.counts["failures"] == 1 and first.consecutive_failures == 1
+
+
+def test_backend_is_ejected_after_repeated_failures():
+    failing, _ = make_backend("a", [503] * 10)
+    healthy, _ = make_backend("b", [])
+    balancer = LoadBalancer([failing, healthy], strategy="latency", failure_threshold=2)
+    failing.latency_ewma, healthy.latency_ewma = 0.0, 1.0  # "a" is chosen first until it is ejected
+    for _ in range(balancer.failure_threshold):
+        balancer.embedding(input="hello")
+    stats = {backend["name"]: backend for backend in balancer.stats()}
+    assert stats["a"]["ejections"] == 1 and not stats["a"]["healthy"]
+    assert stats["b"]["healthy"]
+
+
+def test_backend_with_bad_deployment_is_ejected_at_once():
+    missing, _ = make_backend("a", [404])
+    healthy, _ = make_backend("b", [])
+    balancer = LoadBalancer([missing, healthy], strategy="latency")
+    missing.latency_ewma, healthy.latency_ewma = 0.0, 1.0
+    balancer.embedding(input="hello")
+    assert missing.counts["ejections"] == 1
+
+
+def test_only_backend_is_never_ejected():
+    backend, calls = make_backend("only", [503, 503, 503, 503])
+    balancer = LoadBalancer([backend], failure_threshold=2)
+    assert balancer.embedding(input="hello").data[0].embedding == [0.1, 0.2]
+    assert len(calls) == 5
+    assert backend.counts["ejections"] == 0 and balancer.stats()[0]["healthy"]
+
+
+def test_only_backend_does_not_retry_a_missing_deployment():
+    backend, calls = make_backend("only", [404])
+    balancer = LoadBalancer([backend])
+    with pytest.raises(openai.NotFoundError):
+        balancer.embedding(input="hello")
+    assert len(calls) == 1 and backend.counts["ejections"] == 0
+
+
+def test_gives_up_after_max_retries():
+    backend, calls = make_backend("only", [503] * 10)
+    balancer = LoadBalancer([backend], max_retries=2)
+    with pytest.raises(openai.InternalServerError):
+        asyncio.run(balancer.embedding_async(input="hello"))
+    assert len(calls) == 3 and backend.in_flight == 0
@@ -0,0 +1,62 @@
+"""
+Local index tests (SEARCH_BACKEND=local), on a temporary folder.
+Run from the repository root: python -m pytest Lab5/tests
+"""
+
+import json
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from common.local_search import LocalSearchClient, write_local_index  # noqa: E402
+
+
+def documents(count, tag):
+    return [{"chunk_id": f"{tag}{i}", "chunk": f"benefits {tag} {i}", "text_vector": [float(i + 1), 1.0]}
+            for i in range(count)]
+
+
+def test_top_zero_returns_nothing(tmp_path):
+    write_local_index(tmp_path, documents(3, "a"))
+    client = LocalSearchClient(tmp_path)
+    assert client.search("benefits", top=0) == []
+    assert [doc["chunk_id"] for doc in client.search("benefits a", top=2)] == ["a0", "a1"]
+
+
+def test_readers_never_mix_generations(tmp_path):
+    write_local_index(tmp_path, documents(3, "a"))
+    mismatched = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            client = LocalSearchClient(tmp_path)
+            if client._vectors is not None and len(client._vectors) != len(client._documents):
+                mismatched.append(len(client._documents))
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    for generation in range(100):
+        write_local_index(tmp_path, documents(3 + generation % 5, f"g{generation}"))
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert mismatched == []
+    # Only the current generation is left on disk
+    assert len(list(tmp_path.glob("documents-*.json"))) == 1
+    assert len(list(tmp_path.glob("vectors-*.npy"))) == 1
+
+
+def test_index_written_before_generations_still_loads(tmp_path):
+    (tmp_path / "documents.json").write_text(json.dumps([{"chunk_id": "old", "chunk": "benefits"}]))
+    np.save(tmp_path / "vectors.npy", np.ones((1, 2), dtype=np.float32))
+    client = LocalSearchClient(tmp_path)
+    assert client.get_document_count() == 1
+    client.upload_documents(documents(1, "new"))
+    assert client.get_document_count() == 2
+    assert not (tmp_path / "documents.json").exists()
@@ -0,0 +1,71 @@
+"""
+Routing tests for the structured data fast path, against Lab-Data/Excel-data.xlsx.
+Run from the repository root: python -m pytest Lab5/tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("openpyxl")
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import structured_data  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def router():
+    store = structured_data.TableStore()
+    store.load_workbook(structured_data.DEFAULT_PATHS)
+    return structured_data.TableRouter(store)
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("How many employees are in IT?", "3"),
+    ("What is John Smith's salary?", "75,000"),
+    ("Lowest salary in HR", "63,000"),
+    ("Which department is Jane Doe in?", "| Jane Doe | HR |"),
+    ("Who has the highest performance score?", "Jane Doe"),
+    ("What is the average salary by department?", "| IT | 76,333.33 |"),
+    ("How many people per department?", "| Finance | 3 |"),
+    ("List employees hired after 2020 with salary over 70k", "Tom Davis"),
+    ("Top 3 salaries", "Mike Brown"),
+])
+def test_table_questions_are_answered_with_sql(router, question, expected):
+    answer = router.answer(question)
+    assert answer is not None
+    assert expected in answer.text
+
+
+@pytest.mark.parametrize("question", [
+    "How many days of PTO do employees get?",
+    "How many dependents can employees cover under Northwind Standard?",
+    "How many visits per year do employees get for physical therapy?",
+    "What is the highest deductible employees pay?",
+    "Who handles HR complaints?",
+    "Are employees hired in 2024 eligible right away?",
+    "How many employees have a 401k?",
+    "What are the benefits offered?",
+    "Tell me about healthcare coverage",
+    "Is it covered by the plan?",
+    "How many employees are in it?",
+    "How many people can I cover?",
+])
+def test_benefits_questions_go_to_rag(router, question):
+    assert router.answer(question) is None
+
+
+def test_huge_top_n_is_capped(router):
+    answer = router.answer("top 99999999999999999999 salaries")
+    assert answer is not None
+    assert "Mike Brown" in answer.text
+    assert len(answer.rows) <= router.max_rows + 1
+
+
+def test_query_errors_leave_the_question_to_rag(router, monkeypatch):
+    def broken(sql, params=()):
+        raise OverflowError("Python int too large to convert to SQLite INTEGER")
+    monkeypatch.setattr(router.store, "query", broken)
+    assert router.answer("How many employees are in IT?") is None
+    assert router.stats()["errors"] >= 1
@@ -0,0 +1,202 @@
+"""
+Startup Warm-up
+===============
+The first chats after a deploy or restart used to pay for DNS lookups, TLS
+handshakes and empty caches. Before the app takes traffic it now:
+
+1. Opens the pooled connections to Azure AI Search and every Azure OpenAI
+   deployment (sync and async clients) with one cheap call each.
+2. Replays the most frequent questions from the query log, plus the UI's example
+   questions, through embedding and retrieval. This fills the embedding cache
+   (and loads the local index when SEARCH_BACKEND=local). No answers are generated.
+
+/ready answers 503 until warm-up has finished, then 200 with a short report.
+
+Settings (all optional):
+- QUERY_LOG_PATH (default empty, logging off): file where the questions asked are written, one per
+  line in plain text; only the example questions are warmed while it is off
+- QUERY_LOG_MAX_LINES (default 10000): most recent lines kept when the log is compacted (at startup,
+  by one worker at a time)
+- WARMUP_TOP_N (default 20): logged questions replayed at startup
+- WARMUP_CONCURRENCY (default 4): replays running at the same time
+- WARMUP_TIMEOUT (default 60): seconds startup waits; warm-up then finishes in the background
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+
+logger = logging.getLogger("rag.warmup")
+
+# A compaction lock older than this was left behind by a worker that crashed
+STALE_LOCK_SECONDS = 600
+
+
+class QueryLog:
+    """Append-only log of the questions users ask, one per line"""
+
+    def __init__(self, path, max_lines=10000):
+        self.path = path
+        self.max_lines = max_lines
+        self._lock = threading.Lock()
+
+    def record(self, query):
+        query = " ".join(str(query).split())
+        if not query:
+            return
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(query + "\n")
+        except OSError as e:
+            logger.warning("Could not write to query log %s: %s", self.path, e)
+
+    def recent(self):
+        """The most recent max_lines questions"""
+        if not os.path.exists(self.path):
+            return []
+        with self._lock, open(self.path, encoding="utf-8") as f:
+            return [line.rstrip("\n") for line in deque(f, maxlen=self.max_lines) if line.strip()]
+
+    def top_queries(self, n):
+        """The n most frequently asked recent questions"""
+        return [query for query, _ in Counter(self.recent()).most_common(n)]
+
+    def compact(self):
+        """
+        Drop everything but the most recent max_lines questions. Every worker calls this at
+        startup; a lock file lets only one of them rewrite the log, the others skip it.
+        Returns True when the log was rewritten.
+        """
+        lock_path = self.path + ".lock"
+        try:
+            lock = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                    os.remove(lock_path)  # the next startup compacts
+            except OSError:
+                pass
+            return False
+        except OSError as e:
+            logger.warning("Could not compact query log %s: %s", self.path, e)
+            return False
+        try:
+            with self._lock:
+                if not os.path.exists(self.path):
+                    return False
+                with open(self.path, encoding="utf-8") as f:
+                    lines = [line for line in f if line.strip()]
+                if len(lines) <= self.max_lines:
+                    return False
+                # Write a new file and swap it in, so a reader never sees a half-written log
+                temp = self.path + ".tmp"
+                with open(temp, "w", encoding="utf-8") as f:
+                    f.writelines(lines[-self.max_lines:])
+                os.replace(temp, self.path)
+                return True
+        finally:
+            os.close(lock)
+            os.remove(lock_path)
+
+
+def create_query_log():
+    """QueryLog from QUERY_LOG_PATH / QUERY_LOG_MAX_LINES, or None when logging is off"""
+    path = os.getenv("QUERY_LOG_PATH", "")
+    if not path:
+        return None
+    return QueryLog(path, max_lines=int(os.getenv("QUERY_LOG_MAX_LINES", "10000")))
+
+
+def warmup_queries(query_log, examples, top_n=None):
+    """Top logged questions followed by the examples, without duplicates"""
+    top_n = int(os.getenv("WARMUP_TOP_N", "20")) if top_n is None else top_n
+    logged = query_log.top_queries(top_n) if query_log else []
+    return list(dict.fromkeys(logged + list(examples)))
+
+
+class WarmupState:
+    """Progress of the warm-up, reported by /ready"""
+
+    def __init__(self):
+        self.ready = False
+        self.seconds = None
+        self.connections = {}  # name -> latency in ms, or the error
+        self.queries = 0
+        self.failed_queries = 0
+
+    def report(self):
+        return {
+            "ready": self.ready,
+            "seconds": None if self.seconds is None else round(self.seconds, 2),
+            "connections": self.connections,
+            "queries_warmed": self.queries,
+            "queries_failed": self.failed_queries,
+        }
+
+
+async def _timed(state, name, call):
+    started = time.perf_counter()
+    try:
+        await call()
+        state.connections[name] = f"{(time.perf_counter() - started) * 1000:.0f} ms"
+    except Exception as e:
+        state.connections[name] = f"{type(e).__name__}: {e}"
+        logger.warning("Warm-up could not connect to %s: %s", name, e)
+
+
+async def open_connections(state, search_client, async_search_client, balancer):
+    """One cheap call per pooled client, all at once (no tokens are spent)"""
+    calls = {
+        "search": lambda: asyncio.to_thread(search_client.get_document_count),
+        "search (async)": async_search_client.get_document_count,
+    }
+    for backend in balancer.backends:
+        calls[f"openai {backend.name}"] = lambda b=backend: asyncio.to_thread(b.client.models.list)
+        calls[f"openai {backend.name} (async)"] = lambda b=backend: b.async_client.models.list()
+    await asyncio.gather(*(_timed(state, name, call) for name, call in calls.items()))
+
+
+async def replay_queries(state, queries, retrieve, concurrency=None):
+    """Run retrieve(query) for every query, a few at a time"""
+    concurrency = concurrency or int(os.getenv("WARMUP_CONCURRENCY", "4"))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def replay(query):
+        async with semaphore:
+            try:
+                await retrieve(query)
+                state.queries += 1
+            except Exception as e:
+                state.failed_queries += 1
+                logger.warning("Warm-up query %r failed: %s", query, e)
+
+    await asyncio.gather(*(replay(query) for query in queries))
+
+
+async def warm_up(state, connect, queries, retrieve):
+    """Open connections, then replay queries; always ends with state.ready = True"""
+    started = time.perf_counter()
+    try:
+        await connect()
+        await replay_queries(state, queries, retrieve)
+    except Exception as e:
+        # A failed warm-up only means a slower first request; never keep the app from serving
+        logger.warning("Warm-up stopped early: %s", e)
+    finally:
+        state.seconds = time.perf_counter() - started
+        state.ready = True
+        logger.info("Warm-up finished in %.1fs: %s", state.seconds, state.report())
+
+
+async def start(state, connect, queries, retrieve, timeout=None):
+    """
+    Run the warm-up from the server's startup hook. Startup waits up to WARMUP_TIMEOUT
+    seconds; if warm-up takes longer it carries on in the background and /ready stays 503.
+    """
+    timeout = float(os.getenv("WARMUP_TIMEOUT", "60")) if timeout is None else timeout
+    task = asyncio.create_task(warm_up(state, connect, queries, retrieve))
+    await asyncio.wait({task}, timeout=timeout)
+    return task
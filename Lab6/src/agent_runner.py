@@ -0,0 +1,260 @@
+"""
+Reusable AI Foundry Agent Runner
+================================
+quickstart-agent.py creates a new agent and a new thread every time it runs, then
+polls until the run has finished. This runner:
+
+- Reuses the agent: it is looked up by name and a hash of its model, instructions
+  and tools (kept in the agent's metadata). A matching agent is reused, a stale one
+  is updated in place, and a new agent is only created when none exists, so runs
+  no longer leave orphaned agents behind.
+- Keeps the conversation: thread ids are saved in a small state file, so the next
+  run continues the same thread. Type 'new' to start a fresh one.
+- Streams the run: replies are printed as they are written and tool calls
+  (Code Interpreter) are shown as they start and finish, instead of waiting for
+  the whole run to complete.
+
+Settings (all optional):
+- AGENT_NAME (default my-agent1): name of the agent to reuse or create
+- AGENT_THREAD (default default): name of the saved thread to continue
+- AGENT_STATE_PATH (default .agent_state.json): where agent and thread ids are saved
+- AGENT_PRUNE_DUPLICATES (default false): delete other agents with the same name
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from azure.ai.agents.models import (
+    AgentStreamEvent,
+    CodeInterpreterTool,
+    MessageDeltaChunk,
+    RunStep,
+    ThreadMessage,
+    ThreadRun,
+)
+from azure.ai.projects import AIProjectClient
+from azure.core.exceptions import ResourceNotFoundError
+from azure.identity import DefaultAzureCredential
+from dotenv import load_dotenv
+from file_downloader import create_downloader
+
+load_dotenv()
+
+INSTRUCTIONS = "You politely help with math questions. Use the Code Interpreter tool when asked to visualize numbers."
+
+# What the runner reports while a run streams: kind is text, tool, status, image or error
+RunEvent = namedtuple("RunEvent", ["kind", "data"])
+
+
+def config_hash(model, instructions, tools):
+    """Short hash of everything that defines the agent's behavior"""
+    definitions = [tool.as_dict() if hasattr(tool, "as_dict") else tool for tool in tools or []]
+    config = json.dumps({"model": model, "instructions": instructions, "tools": definitions}, sort_keys=True)
+    return hashlib.sha256(config.encode("utf-8")).hexdigest()[:16]
+
+
+class AgentState:
+    """Agent and thread ids saved between runs, in a small JSON file"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.data = {"agents": {}, "threads": {}}
+        if self.path.exists():
+            try:
+                self.data.update(json.loads(self.path.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable state file {self.path}: {e}")
+
+    def save(self):
+        # Write to a temporary file first so an interrupted run never leaves a broken state file
+        temp = self.path.with_suffix(".tmp")
+        temp.write_text(json.dumps(self.data, indent=2), encoding="utf-8")
+        os.replace(temp, self.path)
+
+
+class AgentRunner:
+    """Finds or creates an agent once, keeps threads, and streams runs"""
+
+    def __init__(self, project_client, state_path=".agent_state.json"):
+        self.agents = project_client.agents
+        self.state = AgentState(state_path)
+        self.downloader = create_downloader(project_client)
+
+    def get_or_create_agent(self, name, model, instructions, tools=(), prune_duplicates=False):
+        """
+        The agent called `name` with this model, instructions and tools
+
+        Uses the saved agent id when its configuration hash still matches (one lookup),
+        otherwise searches the project's agents by name: a match is reused, a stale
+        agent is updated in place, and an agent is only created when none exists.
+        """
+        tools = list(tools)
+        wanted = config_hash(model, instructions, tools)
+        metadata = {"config_hash": wanted}
+
+        saved = self.state.data["agents"].get(name)
+        if saved and saved.get("hash") == wanted:
+            try:
+                agent = self.agents.get_agent(saved["id"])
+                if (agent.metadata or {}).get("config_hash") == wanted:
+                    print(f"♻️ Reusing agent {name} ({agent.id})")
+                    return agent
+            except ResourceNotFoundError:
+                pass  # deleted in the portal; look it up again below
+
+        same_name = [agent for agent in self.agents.list_agents() if agent.name == name]
+        matching = [agent for agent in same_name if (agent.metadata or {}).get("config_hash") == wanted]
+        if matching:
+            agent = matching[0]
+            print(f"♻️ Reusing agent {name} ({agent.id})")
+        elif same_name:
+            agent = self.agents.update_agent(
+                same_name[0].id, model=model, instructions=instructions,
+                tools=tools, metadata=metadata,
+            )
+            print(f"🔄 Updated agent {name} ({agent.id}) to the new configuration")
+        else:
+            agent = self.agents.create_agent(
+                model=model, name=name, instructions=instructions,
+                tools=tools, metadata=metadata,
+            )
+            print(f"✅ Created agent {name} ({agent.id})")
+
+        duplicates = [other for other in same_name if other.id != agent.id]
+        if duplicates and prune_duplicates:
+            for other in duplicates:
+                self.agents.delete_agent(other.id)
+            print(f"🧹 Deleted {len(duplicates)} other agent(s) named {name}")
+        elif duplicates:
+            print(f"ℹ️ {len(duplicates)} other agent(s) are also named {name} (set AGENT_PRUNE_DUPLICATES=true to delete them)")
+
+        self.state.data["agents"][name] = {"id": agent.id, "hash": wanted}
+        self.state.save()
+        return agent
+
+    def get_thread(self, key="default"):
+        """The saved thread called `key`, or a new one if it does not exist yet"""
+        thread_id = self.state.data["threads"].get(key)
+        if thread_id:
+            try:
+                thread = self.agents.threads.get(thread_id)
+                print(f"🧵 Continuing thread {thread.id}")
+                return thread
+            except ResourceNotFoundError:
+                print(f"⚠️ Saved thread {thread_id} no longer exists; starting a new one")
+        return self.new_thread(key)
+
+    def new_thread(self, key="default"):
+        """Start a new thread and save it under `key`"""
+        thread = self.agents.threads.create()
+        self.state.data["threads"][key] = thread.id
+        self.state.save()
+        print(f"🧵 Started thread {thread.id}")
+        return thread
+
+    def stream_reply(self, thread_id, agent_id, content, additional_instructions=None):
+        """
+        Add the user's message and run the agent, yielding RunEvents as they arrive
+
+        Yields:
+            RunEvent("text", delta): part of the reply
+            RunEvent("tool", message): a tool call started or finished
+            RunEvent("image", file_id): an image the agent produced
+            RunEvent("status", status): the run's final status
+            RunEvent("error", message): the run failed
+        """
+        self.agents.messages.create(thread_id=thread_id, role="user", content=content)
+        with self.agents.runs.stream(
+            thread_id=thread_id,
+            agent_id=agent_id,
+            additional_instructions=additional_instructions,
+        ) as stream:
+            for event_type, event_data, _ in stream:
+                if isinstance(event_data, MessageDeltaChunk):
+                    if event_data.text:
+                        yield RunEvent("text", event_data.text)
+                elif isinstance(event_data, RunStep) and event_data.type == "tool_calls":
+                    if event_type in (AgentStreamEvent.THREAD_RUN_STEP_CREATED, AgentStreamEvent.THREAD_RUN_STEP_COMPLETED):
+                        action = "started" if event_type == AgentStreamEvent.THREAD_RUN_STEP_CREATED else "finished"
+                        tool_calls = getattr(event_data.step_details, "tool_calls", None) or []
+                        names = ", ".join(sorted({call.type for call in tool_calls})) or "tool"
+                        yield RunEvent("tool", f"{names} {action}")
+                elif isinstance(event_data, ThreadMessage) and event_type == AgentStreamEvent.THREAD_MESSAGE_COMPLETED:
+                    for image in event_data.image_contents:
+                        yield RunEvent("image", image.image_file.file_id)
+                elif isinstance(event_data, ThreadRun) and event_data.status in ("completed", "failed", "cancelled", "expired"):
+                    if event_data.status == "failed":
+                        yield RunEvent("error", str(event_data.last_error))
+                    yield RunEvent("status", event_data.status)
+                elif event_type == AgentStreamEvent.ERROR:
+                    yield RunEvent("error", str(event_data))
+
+    def save_image(self, file_id):
+        """Stream an image into the output cache (skipped if it was downloaded before)"""
+        return self.downloader.download(file_id, f"{file_id}_image_file.png").resolve()
+
+
+def ask(runner, thread, agent, question, additional_instructions=None):
+    """Stream one answer to the console; returns the seconds until the first output"""
+    started = time.perf_counter()
+    first_output = None
+    print("🤖 Agent: ", end="", flush=True)
+    for event in runner.stream_reply(thread.id, agent.id, question, additional_instructions):
+        if first_output is None:
+            first_output = time.perf_counter() - started
+        if event.kind == "text":
+            print(event.data, end="", flush=True)
+        elif event.kind == "tool":
+            print(f"\n🛠️ {event.data}", flush=True)
+        elif event.kind == "image":
+            print(f"\n🖼️ Saved image file to: {runner.save_image(event.data)}")
+        elif event.kind == "error":
+            print(f"\n❌ Run failed: {event.data}")
+        elif event.kind == "status" and event.data != "completed":
+            print(f"\n⚠️ Run ended with status: {event.data}")
+    print(f"\n⏱️ First output after {first_output or 0:.1f}s, done after {time.perf_counter() - started:.1f}s\n")
+    return first_output
+
+
+def main():
+    project_client = AIProjectClient(
+        endpoint=os.environ["AZURE_AI_PROJECT_ENDPOINT"],
+        credential=DefaultAzureCredential(),
+    )
+    thread_key = os.getenv("AGENT_THREAD", "default")
+
+    with project_client:
+        runner = AgentRunner(project_client, os.getenv("AGENT_STATE_PATH", ".agent_state.json"))
+        agent = runner.get_or_create_agent(
+            name=os.getenv("AGENT_NAME", "my-agent1"),
+            model=os.environ["AZURE_AI_MODEL_DEPLOYMENT"],
+            instructions=INSTRUCTIONS,
+            tools=CodeInterpreterTool().definitions,
+            prune_duplicates=os.getenv("AGENT_PRUNE_DUPLICATES", "false").lower() == "true",
+        )
+        thread = runner.get_thread(thread_key)
+
+        print("\nAsk the agent anything! Type 'new' to start a new thread, 'quit' or 'exit' to end the session.\n")
+        while True:
+            try:
+                question = input("🙋 Your question: ").strip()
+            except (KeyboardInterrupt, EOFError):
+                print("\n👋 Goodbye!")
+                break
+            if question.lower() in ["quit", "exit", "bye"]:
+                print("👋 Goodbye! Your thread is saved for next time.")
+                break
+            if question.lower() == "new":
+                thread = runner.new_thread(thread_key)
+                continue
+            if not question:
+                continue
+            ask(runner, thread, agent, question)
+
+
+if __name__ == "__main__":
+    main()
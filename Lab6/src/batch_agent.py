@@ -0,0 +1,273 @@
+"""
+Batch Agent Runs
+================
+Pushes many prompts through the Code Interpreter agent from agent_runner.py
+instead of one thread and one message at a time.
+
+- Prompts come from a .txt file (one per line), a JSONL file ({"id": ..., "prompt": ...}
+  per line) or a CSV file with a "prompt" column (and an optional "id" column)
+- The agent is looked up or created once; every prompt gets its own thread, created
+  together with its run in a single call
+- A bounded pool of workers runs several prompts at the same time
+- Each run has a timeout; a run that takes longer is cancelled
+- Failed, expired and timed-out runs are retried with exponential backoff
+- Each result (reply text, output file ids, status, last_error, timing) is appended
+  to the output JSONL as soon as it is ready
+- Re-running with the same output file skips prompts that already completed
+- The summary reports throughput and the latency distribution
+
+Usage (from the Lab6 folder):
+    python src/batch_agent.py prompts.txt --output results.jsonl --workers 8 --timeout 300
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from pathlib import Path
+
+from azure.ai.agents.models import (
+    AgentThreadCreationOptions,
+    CodeInterpreterTool,
+    ListSortOrder,
+    ThreadMessageOptions,
+)
+from azure.ai.projects import AIProjectClient
+from azure.identity import DefaultAzureCredential
+from dotenv import load_dotenv
+
+from agent_runner import INSTRUCTIONS, AgentRunner
+from file_downloader import create_downloader, output_files
+
+load_dotenv()
+
+# Statuses a run can end in; any other status means it is still going
+FINISHED = ("completed", "failed", "cancelled", "expired", "incomplete")
+
+
+# Step 1: Read the prompts
+# ------------------------
+
+def read_prompts(path):
+    """Yield {"id", "prompt"} dicts from a .txt, .jsonl or .csv file"""
+    path = Path(path)
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = csv.DictReader(f)
+        elif path.suffix.lower() == ".jsonl":
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = ({"prompt": line} for line in f if line.strip())
+        for number, row in enumerate(rows, start=1):
+            prompt = (row.get("prompt") or "").strip()
+            if prompt:
+                yield {"id": str(row.get("id") or number), "prompt": prompt}
+
+
+def load_completed_ids(output_path):
+    """Ids that already have a completed run in the output file (for resuming)"""
+    completed = set()
+    if Path(output_path).exists():
+        with open(output_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut off by an interrupted run
+                if record.get("status") == "completed":
+                    completed.add(record["id"])
+    return completed
+
+
+# Step 2: Run one prompt, with a timeout
+# --------------------------------------
+
+def _error_dict(error):
+    if error is None:
+        return None
+    return error.as_dict() if hasattr(error, "as_dict") else {"message": str(error)}
+
+
+def run_prompt(agents, agent_id, prompt, timeout=300):
+    """
+    Run the agent on a new thread with this prompt and wait (up to timeout seconds)
+
+    Returns:
+        dict: status, text, file_ids, last_error, thread_id, run_id and run_seconds
+    """
+    started = time.perf_counter()
+    run = agents.create_thread_and_run(
+        agent_id=agent_id,
+        thread=AgentThreadCreationOptions(messages=[ThreadMessageOptions(role="user", content=prompt)]),
+    )
+    # Poll quickly at first, then less often, so hundreds of runs do not flood the service
+    delay = 0.5
+    while run.status not in FINISHED:
+        if time.perf_counter() - started > timeout:
+            try:
+                agents.runs.cancel(thread_id=run.thread_id, run_id=run.id)
+            except Exception:
+                pass  # the run may have finished in the meantime
+            return {"status": "timeout", "text": "", "file_ids": [], "file_names": {},
+                    "last_error": {"code": "timeout", "message": f"no result after {timeout}s"},
+                    "thread_id": run.thread_id, "run_id": run.id,
+                    "run_seconds": round(time.perf_counter() - started, 3)}
+        time.sleep(delay)
+        delay = min(delay * 1.5, 3.0)
+        run = agents.runs.get(thread_id=run.thread_id, run_id=run.id)
+
+    text, files = "", {}
+    if run.status == "completed":
+        messages = list(agents.messages.list(thread_id=run.thread_id, order=ListSortOrder.ASCENDING))
+        replies = [message for message in messages if message.role == "assistant"]
+        text = "\n".join(part.text.value for message in replies for part in message.text_messages)
+        files = dict(output_files(replies))
+    return {"status": run.status, "text": text, "file_ids": list(files), "file_names": files,
+            "last_error": _error_dict(run.last_error), "thread_id": run.thread_id, "run_id": run.id,
+            "run_seconds": round(time.perf_counter() - started, 3)}
+
+
+# Step 3: Retry failed runs
+# -------------------------
+
+def run_with_retries(agents, agent_id, item, retries=2, timeout=300, backoff_seconds=5.0,
+                     downloader=None, delete_threads=False):
+    """Run one prompt until it completes or the retries are used up; returns a result record"""
+    started = time.perf_counter()
+    for attempt in range(1, retries + 2):
+        try:
+            result = run_prompt(agents, agent_id, item["prompt"], timeout)
+        except Exception as e:
+            result = {"status": "error", "text": "", "file_ids": [], "file_names": {}, "thread_id": None, "run_id": None,
+                      "last_error": {"code": type(e).__name__, "message": str(e)}, "run_seconds": None}
+        finished = result["status"] == "completed"
+        retrying = not finished and attempt <= retries
+        # The thread of an attempt that is retried is never looked at again; delete it so they do not pile up
+        if result["thread_id"] and (delete_threads or retrying):
+            try:
+                agents.threads.delete(result["thread_id"])
+            except Exception:
+                pass
+        if not retrying:
+            break
+        # Exponential backoff with jitter so retries from many workers spread out
+        time.sleep(backoff_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    file_names = result.pop("file_names")
+    if downloader and file_names:
+        saved = downloader.download_all(file_names.items())
+        result["saved_files"] = {file_id: str(path) for file_id, path in saved.items()}
+    return dict(item, **result, attempts=attempt, seconds=round(time.perf_counter() - started, 3))
+
+
+# Step 4: Run the whole batch with a bounded worker pool
+# ------------------------------------------------------
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def run_batch(agents, agent_id, prompts, output_path, workers=8, retries=2, timeout=300,
+              downloader=None, delete_threads=False):
+    """Run prompts concurrently and append results to output_path as they complete"""
+    completed = load_completed_ids(output_path)
+    counts = {"completed": 0, "failed": 0, "skipped": 0, "retried": 0}
+    latencies = []
+    write_lock = threading.Lock()
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as executor:
+        def record(future):
+            result = future.result()
+            ok = result["status"] == "completed"
+            with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                counts["completed" if ok else "failed"] += 1
+                counts["retried"] += int(result["attempts"] > 1)
+                if ok:
+                    latencies.append(result["seconds"])
+                done = counts["completed"] + counts["failed"]
+                print(f"{'✅' if ok else '❌'} [{done}] {result['id']}: {result['status']} in "
+                      f"{result['seconds']:.1f}s ({done * 60 / (time.perf_counter() - started):.1f} runs/min)")
+
+        # Keep only a few prompts queued per worker so huge files are read lazily
+        in_flight = set()
+        for item in prompts:
+            if item["id"] in completed:
+                counts["skipped"] += 1
+                continue
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future)
+            in_flight.add(executor.submit(run_with_retries, agents, agent_id, item, retries, timeout,
+                                          downloader=downloader, delete_threads=delete_threads))
+        for future in as_completed(in_flight):
+            record(future)
+
+    counts["seconds"] = time.perf_counter() - started
+    counts["latency"] = {f"p{pct}": percentile(latencies, pct) for pct in (50, 90, 95, 99)}
+    counts["latency"]["max"] = max(latencies, default=0.0)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a file of prompts through the Lab6 agent")
+    parser.add_argument("input", help="prompts as .txt (one per line), .jsonl or .csv")
+    parser.add_argument("--output", help="results JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("--workers", type=int, default=8, help="runs at the same time")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds before a run is cancelled")
+    parser.add_argument("--retries", type=int, default=2, help="retries per prompt after a failed run")
+    parser.add_argument("--download", action="store_true", help="also download output files (see file_downloader.py)")
+    parser.add_argument("--delete-threads", action="store_true", help="delete each thread once its result is saved")
+    args = parser.parse_args()
+    output = args.output or str(Path(args.input).with_suffix(".results.jsonl"))
+
+    project_client = AIProjectClient(
+        endpoint=os.environ["AZURE_AI_PROJECT_ENDPOINT"],
+        credential=DefaultAzureCredential(),
+    )
+    with project_client:
+        runner = AgentRunner(project_client, os.getenv("AGENT_STATE_PATH", ".agent_state.json"))
+        agent = runner.get_or_create_agent(
+            name=os.getenv("AGENT_NAME", "my-agent1"),
+            model=os.environ["AZURE_AI_MODEL_DEPLOYMENT"],
+            instructions=INSTRUCTIONS,
+            tools=CodeInterpreterTool().definitions,
+        )
+
+        print("🎯 Batch Agent Runs")
+        print("=" * 50)
+        print(f"📥 Prompts:  {args.input}")
+        print(f"📤 Results:  {output}")
+        print(f"👷 Workers:  {args.workers}")
+        print(f"⏳ Timeout:  {args.timeout:.0f}s per run")
+        print("=" * 50)
+
+        counts = run_batch(
+            project_client.agents, agent.id, read_prompts(args.input), output,
+            workers=args.workers, retries=args.retries, timeout=args.timeout,
+            downloader=create_downloader(project_client) if args.download else None,
+            delete_threads=args.delete_threads,
+        )
+
+    finished = counts["completed"] + counts["failed"]
+    latency = counts["latency"]
+    print("=" * 50)
+    print(f"✅ Completed: {counts['completed']}  ❌ Failed: {counts['failed']}  "
+          f"🔁 Retried: {counts['retried']}  ⏭️ Already done: {counts['skipped']}")
+    print(f"⏱️ {counts['seconds']:.1f}s total, {finished * 60 / (counts['seconds'] or 1):.1f} runs/min")
+    print(f"📊 Latency: p50 {latency['p50']:.1f}s  p90 {latency['p90']:.1f}s  p95 {latency['p95']:.1f}s  "
+          f"p99 {latency['p99']:.1f}s  max {latency['max']:.1f}s")
+    if counts["failed"]:
+        print("Run the same command again to retry the failed prompts.")
+
+
+if __name__ == "__main__":
+    main()
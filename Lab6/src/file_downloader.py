@@ -0,0 +1,154 @@
+"""
+Agent Output File Downloader
+============================
+Agents that draw many charts produce many output files. Saving them one at a time
+with files.save spends most of a run's wall time waiting on downloads, and
+re-downloads files that were already saved. This downloader:
+
+- Fetches all of a run's output files at once on a bounded thread pool.
+- Streams each file to disk chunk by chunk (never holding a whole file in memory),
+  hashing it on the way.
+- Stores files in a content-addressed cache (cache/ab/abcdef....png, named by the
+  SHA-256 of the content), so the same chart is only stored once.
+- Skips files it has already downloaded: an index maps each file id to its
+  cached file, and a known id is never fetched again.
+
+    downloader = create_downloader(project_client)
+    paths = downloader.download_all(output_files(messages))
+
+Settings (all optional):
+- DOWNLOAD_CACHE_DIR (default agent_outputs): where output files are stored
+- DOWNLOAD_WORKERS (default 8): downloads running at the same time
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+
+def output_files(messages):
+    """
+    (file_id, file name) for every file the agent produced: images it drew and
+    files it wrote (e.g. sandbox:/mnt/data/report.csv), without duplicates
+    """
+    files = {}
+    for message in messages:
+        for image in message.image_contents:
+            files.setdefault(image.image_file.file_id, f"{image.image_file.file_id}_image_file.png")
+        for annotation in getattr(message, "file_path_annotations", None) or []:
+            name = PurePosixPath(annotation.text or "").name
+            files.setdefault(annotation.file_path.file_id, name or annotation.file_path.file_id)
+    return list(files.items())
+
+
+class FileDownloader:
+    """Downloads agent output files concurrently into a content-addressed cache"""
+
+    def __init__(self, agents_client, cache_dir="agent_outputs", max_workers=8):
+        self.agents = agents_client
+        self.cache_dir = Path(cache_dir)
+        self.max_workers = max_workers
+        self.index_path = self.cache_dir / "index.json"
+        self._lock = threading.Lock()
+        self._index = {}  # file id -> path of the cached file, relative to cache_dir
+        if self.index_path.exists():
+            try:
+                self._index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable download index {self.index_path}: {e}")
+        self._stats = {"downloaded": 0, "skipped": 0, "duplicates": 0, "bytes": 0}
+
+    def cached_path(self, file_id):
+        """Path of an already downloaded file, or None"""
+        with self._lock:
+            relative = self._index.get(file_id)
+        if relative and (self.cache_dir / relative).exists():
+            return self.cache_dir / relative
+        return None
+
+    def _remember(self, file_id, path):
+        with self._lock:
+            self._index[file_id] = path.relative_to(self.cache_dir).as_posix()
+            # Write to a temporary file first so an interrupted run never leaves a broken index
+            temp = self.index_path.with_suffix(".tmp")
+            temp.write_text(json.dumps(self._index, indent=2), encoding="utf-8")
+            os.replace(temp, self.index_path)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def download(self, file_id, file_name=""):
+        """Stream one file into the cache (unless it is already there); returns its path"""
+        path = self.cached_path(file_id)
+        if path:
+            self._count("skipped")
+            return path
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        # Stream into a temporary file next to the cache, hashing as we go
+        handle, temp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        try:
+            with os.fdopen(handle, "wb") as f:
+                for chunk in self.agents.files.get_content(file_id):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            content_hash = digest.hexdigest()
+            path = self.cache_dir / content_hash[:2] / (content_hash + Path(file_name).suffix.lower())
+            if path.exists():
+                self._count("duplicates")  # same content under another file id
+                os.remove(temp_name)
+            else:
+                path.parent.mkdir(exist_ok=True)
+                os.replace(temp_name, path)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+        self._remember(file_id, path)
+        self._count("downloaded")
+        self._count("bytes", size)
+        return path
+
+    def download_all(self, files):
+        """
+        Download every (file_id, file name) at once, a few at a time
+
+        Returns:
+            dict: file id -> path of the cached file (files that failed are left out)
+        """
+        files = list(dict(files).items())
+        if not files:
+            return {}
+        paths = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(files)), thread_name_prefix="download") as pool:
+            futures = {pool.submit(self.download, file_id, name): file_id for file_id, name in files}
+            for future, file_id in futures.items():
+                try:
+                    paths[file_id] = future.result()
+                except Exception as e:
+                    print(f"❌ Could not download {file_id}: {e}")
+        return paths
+
+    def stats(self):
+        """Files downloaded, skipped because they were already cached, and stored only once"""
+        with self._lock:
+            return dict(self._stats)
+
+
+def create_downloader(project_client):
+    """FileDownloader configured from DOWNLOAD_CACHE_DIR / DOWNLOAD_WORKERS"""
+    return FileDownloader(
+        project_client.agents,
+        cache_dir=os.getenv("DOWNLOAD_CACHE_DIR", "agent_outputs"),
+        max_workers=int(os.getenv("DOWNLOAD_WORKERS", "8")),
+    )
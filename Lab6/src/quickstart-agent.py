@@ -6,11 +6,11 @@ https://learn.microsoft.com/en-us/azure/ai-foundry/agents/quickstart?pivots=prog
 
 
 import os
-from pathlib import Path
 from azure.ai.projects import AIProjectClient
 from azure.identity import DefaultAzureCredential
 from azure.ai.agents.models import CodeInterpreterTool
 from dotenv import load_dotenv
+from file_downloader import create_downloader, output_files
 
 load_dotenv()
 # Create an AIProjectClient from an endpoint, copied from your Azure AI Foundry project.
@@ -59,16 +59,14 @@ with project_client:
         print(f"Run failed: {run.last_error}")
 
     # Fetch and log all messages
-    messages = project_client.agents.messages.list(thread_id=thread.id)
+    messages = list(project_client.agents.messages.list(thread_id=thread.id))
     for message in messages:
         print(f"Role: {message.role}, Content: {message.content}")
 
-        # Save every image file in the message
-        for img in message.image_contents:
-            file_id = img.image_file.file_id
-            file_name = f"{file_id}_image_file.png"
-            project_client.agents.files.save(file_id=file_id, file_name=file_name)
-            print(f"Saved image file to: {Path.cwd() / file_name}")
+    # Download every output file at once (files downloaded before are skipped)
+    downloader = create_downloader(project_client)
+    for file_id, path in downloader.download_all(output_files(messages)).items():
+        print(f"Saved file {file_id} to: {path.resolve()}")
 
     # Uncomment these lines to delete the agent when done
     # project_client.agents.delete_agent(agent.id)
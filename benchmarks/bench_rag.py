@@ -0,0 +1,304 @@
+"""
+RAG Pipeline Microbenchmarks
+============================
+Measures the client-side cost of each RAG flow in this repository, stage by stage,
+without depending on live Azure latency:
+
+  lab5  Lab5/app.py                  embed -> search -> generate
+  lab3  Lab3/RAG/2.simple_rag.py     search -> pack -> generate
+  lab4  Lab4/src/advance_rag.py      search -> pack -> generate
+
+1. Record real responses once (needs your .env with live Azure credentials):
+       python benchmarks/bench_rag.py record
+2. Replay them as often as you like, with simulated service latency:
+       python benchmarks/bench_rag.py replay --iterations 200 --latency-ms 20 --jitter-ms 5
+
+Reports p50/p95/p99 per stage and end to end, peak memory allocated per request
+(tracemalloc, measured in a separate pass), and throughput with --concurrency workers.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+from common.clients import create_azure_search_client, create_openai_client
+from common.load_balancer import Backend, LoadBalancer
+from common.replay import FixtureStore, InjectedLatency, replay_http_client, replay_search_transport
+
+DEFAULT_FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+DEFAULT_QUERIES = [
+    "What are the benefits offered?",
+    "Tell me about healthcare coverage",
+    "What is the Northwind Standard plan?",
+    "What are the benefits of the Northwind Standard plan?",
+    "Share me Northwind Plan costs",
+]
+
+# Settings that decide request URLs; recorded so replays hit the same fixtures
+RECORDED_SETTINGS = [
+    "AZURE_SEARCH_INDEX_NAME",
+    "AZURE_OPENAI_MODEL_NAME",
+    "AZURE_OPENAI_EMBEDDING_MODEL",
+    "AZURE_OPENAI_API_VERSION",
+    "AZURE_SEARCH_KEY_FIELD",
+]
+
+# Placeholder credentials for replay mode (no request leaves the process)
+REPLAY_DEFAULTS = {
+    "AZURE_SEARCH_ENDPOINT": "https://replay.search.windows.net",
+    "AZURE_SEARCH_KEY": "replay",
+    "AZURE_OPENAI_ENDPOINT": "https://replay.openai.azure.com/",
+    "AZURE_OPENAI_API_KEY": "replay",
+}
+
+
+class StageTimer:
+    """Collects duration samples per stage name"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - started)
+
+
+# Step 1: Load each lab's flow with clients that use the record/replay transports
+# -------------------------------------------------------------------------------
+
+def make_clients(store, mode, latency):
+    """The labs' own client factories, with the record/replay transports plugged in"""
+    os.environ["AZURE_OPENAI_MAX_RETRIES"] = "0"
+    openai_client = create_openai_client(http_client=replay_http_client(store, mode, latency))
+    search_client = create_azure_search_client(transport=replay_search_transport(store, mode, latency))
+    return openai_client, search_client
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, str(Path(path).parent))
+    spec.loader.exec_module(module)
+    return module
+
+
+def setup_lab5(openai_client, search_client):
+    app = load_module("lab5_app", REPO_ROOT / "Lab5" / "app.py")
+    from embedding_cache import EmbeddingCache
+
+    app.openai_client = openai_client
+    app.balancer = LoadBalancer([Backend(
+        "replay", openai_client, None,
+        os.getenv("AZURE_OPENAI_MODEL_NAME"), os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+    )])
+    app.search_client = search_client
+    app.embedding_cache = EmbeddingCache(max_entries=0)  # measure real calls, not cache hits
+    app.answer_cache = None
+
+    def run(query, timer):
+        with timer.stage("embed"):
+            query_vector = app.get_query_embedding(query)
+        with timer.stage("search"):
+            results = app.hybrid_search(query, query_vector)
+        with timer.stage("generate"):
+            app.generate_answer(query, results)
+
+    return run
+
+
+def setup_lab3(openai_client, search_client):
+    rag = load_module("lab3_simple_rag", REPO_ROOT / "Lab3" / "RAG" / "2.simple_rag.py")
+    rag.openai_client = openai_client
+    rag.search_client = search_client
+
+    def run(query, timer):
+        with timer.stage("search"):
+            results = list(rag.retrieve_documents(query))
+        with timer.stage("pack"):
+            packed = rag.pack_documents(results)
+        with timer.stage("generate"):
+            rag.generate_answer(query, packed.text)
+
+    return run
+
+
+def setup_lab4(openai_client, search_client):
+    rag = load_module("lab4_advance_rag", REPO_ROOT / "Lab4" / "src" / "advance_rag.py")
+    rag.openai_client = openai_client
+    rag.search_client = search_client
+
+    def run(query, timer):
+        with timer.stage("search"):
+            results = list(rag.hybrid_search(query))
+        with timer.stage("pack"):
+            sources = rag.format_sources(results)
+        with timer.stage("generate"):
+            rag.generate_grounded_answer(query, sources)
+
+    return run
+
+
+FLOWS = {"lab5": setup_lab5, "lab3": setup_lab3, "lab4": setup_lab4}
+
+
+# Step 2: Measure
+# ---------------
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_once(run, query, timer):
+    with timer.stage("end_to_end"):
+        run(query, timer)
+
+
+def measure_latency(run, queries, iterations, warmup):
+    for query in islice(cycle(queries), warmup):
+        run(query, StageTimer())
+    timer = StageTimer()
+    for query in islice(cycle(queries), iterations):
+        run_once(run, query, timer)
+    return timer.samples
+
+
+def measure_allocations(run, queries, iterations):
+    """Peak bytes allocated while serving one request (a separate pass: tracemalloc is slow)"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for query in islice(cycle(queries), iterations):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            run(query, StageTimer())
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def measure_throughput(run, queries, iterations, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda query: run(query, StageTimer()), islice(cycle(queries), iterations)))
+    return iterations / (time.perf_counter() - started)
+
+
+def summarize(samples):
+    return {
+        stage: {
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "mean_ms": sum(values) / len(values) * 1000,
+            "count": len(values),
+        }
+        for stage, values in samples.items()
+    }
+
+
+def print_report(name, report):
+    print(f"\n📊 {name}")
+    print(f"   {'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for stage, stats in report["stages"].items():
+        print(f"   {stage:<12}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['mean_ms']:>10.2f}")
+    print(f"   peak allocated per request: p50 {report['alloc_p50_kib']:.1f} KiB, "
+          f"max {report['alloc_max_kib']:.1f} KiB")
+    print(f"   throughput: {report['throughput_rps']:.1f} requests/sec "
+          f"with {report['concurrency']} workers")
+
+
+# Step 3: Command line
+# --------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Record or replay RAG benchmarks")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--flows", default="lab5,lab3,lab4", help="comma-separated: " + ",".join(FLOWS))
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="folder for recorded responses")
+    parser.add_argument("--queries", help="text file with one query per line")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="injected latency per replayed call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="+/- random jitter on the latency")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        queries = [line.strip() for line in open(args.queries, encoding="utf-8") if line.strip()]
+
+    store = FixtureStore(args.fixtures)
+    settings_file = Path(args.fixtures) / "settings.json"
+    os.environ["SEARCH_BACKEND"] = "azure"
+    if args.mode == "record":
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        settings_file.write_text(json.dumps({k: os.getenv(k) for k in RECORDED_SETTINGS if os.getenv(k)}, indent=1))
+    else:
+        os.environ.update(json.loads(settings_file.read_text()) if settings_file.exists() else {})
+        for name, value in REPLAY_DEFAULTS.items():
+            os.environ.setdefault(name, value)
+    # Keep the labs from reading .env over the settings above
+    os.environ.setdefault("AZURE_SEARCH_INDEX_NAME", "replay-index")
+
+    latency = InjectedLatency(args.latency_ms, args.jitter_ms, seed=42)
+    openai_client, search_client = make_clients(store, args.mode, latency)
+    results = {}
+
+    for name in args.flows.split(","):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            run = FLOWS[name](openai_client, search_client)
+            if args.mode == "record":
+                for query in queries:
+                    run(query, StageTimer())
+                continue
+            samples = measure_latency(run, queries, args.iterations, args.warmup)
+            allocations = measure_allocations(run, queries, min(args.iterations, 50))
+            throughput = measure_throughput(run, queries, args.iterations, args.concurrency)
+
+        results[name] = {
+            "stages": summarize(samples),
+            "alloc_p50_kib": percentile(allocations, 50) / 1024,
+            "alloc_max_kib": max(allocations) / 1024,
+            "throughput_rps": throughput,
+            "concurrency": args.concurrency,
+        }
+        print_report(name, results[name])
+
+    if args.mode == "record":
+        print(f"✅ Recorded responses for {len(queries)} queries to {args.fixtures}")
+    elif args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Adaptive Retrieval Depth Evaluation
+===================================
+Checks how often the adaptive retriever (common/reranking.py) goes deep, and whether
+the deep search finds chunks the shallow one missed, for a given set of settings.
+
+Runs offline: the PDFs in Lab-Data are chunked the way Lab3/ingestion does it, and a
+local BM25 index stands in for the search service (no embeddings, so this measures the
+trigger, not the hybrid ranking of a real index). For every question it reports:
+
+- whether the retriever went deep
+- whether re-ranking RETRIEVAL_DEEP_K results would keep a chunk that the shallow
+  results did not contain (a "miss" when the retriever stayed shallow)
+
+    python benchmarks/eval_retrieval_depth.py
+    python benchmarks/eval_retrieval_depth.py --keep 5 --shallow-k 10 --tail 2 --margin 0.15
+    python benchmarks/eval_retrieval_depth.py --queries my_questions.txt
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+sys.path.append(str(REPO_ROOT / "Lab3" / "ingestion"))
+
+from common.local_search import BM25Index
+from common.reranking import AdaptiveRetriever, create_reranker, rerank
+from ingest_documents import iter_pdf_chunks
+
+DEFAULT_QUESTIONS = [
+    "What are the benefits offered?",
+    "Tell me about healthcare coverage",
+    "What is the Northwind Standard plan?",
+    "What are the benefits of the Northwind Standard plan?",
+    "Does Northwind Standard cover vision?",
+    "Is dental care covered?",
+    "How do I file a claim?",
+    "What is the deductible?",
+    "Are emergency room visits covered?",
+    "Does the plan cover mental health services?",
+    "What is covered for prescription drugs?",
+    "How many physical therapy visits are covered per year?",
+    "Are preventive care services free?",
+    "What happens if I go out of network?",
+    "Does the plan cover chiropractic care?",
+    "What is the out-of-pocket maximum?",
+    "Can I add my dependents to the plan?",
+    "Is maternity care covered?",
+    "What are the exclusions?",
+    "How do I appeal a denied claim?",
+    "Does the plan cover hearing aids?",
+    "What is coinsurance?",
+    "Are virtual care visits covered?",
+    "What is covered for substance abuse treatment?",
+    "Does the plan cover infertility treatment?",
+    "What are the copays for specialists?",
+    "How does prior authorization work?",
+    "Are ambulance services covered?",
+    "Does Northwind Standard cover cosmetic surgery?",
+    "What is the coordination of benefits?",
+]
+
+
+def load_chunks(data_dir):
+    chunks = []
+    for path in sorted(Path(data_dir).glob("*.pdf")):
+        chunks += list(iter_pdf_chunks(path))
+    return chunks
+
+
+def make_search(index, chunks, question):
+    """search_fn(depth) over the local BM25 index, best-first, with @search.score set"""
+    scores = index.scores(question)
+    order = np.argsort(-scores, kind="stable")
+
+    def search(depth):
+        search.depths.append(depth)
+        return [dict(chunks[i], **{"@search.score": float(scores[i])}) for i in order[:depth]]
+    search.depths = []
+    return search
+
+
+def evaluate(chunks, questions, keep, shallow_k, deep_k, margin, tail, reranker_kind):
+    index = BM25Index([f"{chunk['title']} {chunk['chunk']}" for chunk in chunks])
+    retriever = AdaptiveRetriever(create_reranker(reranker_kind), keep=keep, shallow_k=shallow_k,
+                                  deep_k=deep_k, margin=margin, tail=tail)
+    rows = []
+    for question in questions:
+        search = make_search(index, chunks, question)
+        retriever.retrieve(question, search)
+        went_deep = deep_k in search.depths
+        shallow_keys = {doc["chunk_id"] for doc in search(shallow_k)}
+        deep_ranked, _ = rerank(question, search(deep_k), retriever.reranker, retriever.weight)
+        gain = sum(1 for doc in deep_ranked[:keep] if doc["chunk_id"] not in shallow_keys)
+        rows.append((question, went_deep, gain))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how often adaptive retrieval goes deep")
+    parser.add_argument("--data", default=str(REPO_ROOT / "Lab-Data"), help="folder with the PDFs")
+    parser.add_argument("--queries", help="text file with one question per line (default: built-in list)")
+    parser.add_argument("--keep", type=int, default=3, help="chunks kept (RERANK_KEEP)")
+    parser.add_argument("--shallow-k", type=int, help="first search depth (default: keep + 5)")
+    parser.add_argument("--deep-k", type=int, default=50, help="deep search depth (RETRIEVAL_DEEP_K)")
+    parser.add_argument("--margin", type=float, default=0.0, help="RETRIEVAL_MARGIN (0 = off)")
+    parser.add_argument("--tail", type=int, default=2, help="RETRIEVAL_TAIL")
+    parser.add_argument("--reranker", default="lexical", help="lexical, cross-encoder or none")
+    parser.add_argument("--verbose", action="store_true", help="print every question")
+    args = parser.parse_args()
+
+    questions = DEFAULT_QUESTIONS
+    if args.queries:
+        questions = [line.strip() for line in open(args.queries, encoding="utf-8") if line.strip()]
+    shallow_k = args.shallow_k or args.keep + 5
+    chunks = load_chunks(args.data)
+
+    rows = evaluate(chunks, questions, args.keep, shallow_k, args.deep_k, args.margin, args.tail, args.reranker)
+    deep = sum(1 for _, went_deep, _ in rows if went_deep)
+    could_gain = [row for row in rows if row[2]]
+    missed = [row for row in could_gain if not row[1]]
+
+    print(f"📚 {len(chunks)} chunks, {len(questions)} questions")
+    print(f"⚙️ keep={args.keep} shallow_k={shallow_k} deep_k={args.deep_k} margin={args.margin} "
+          f"tail={args.tail} reranker={args.reranker}")
+    if args.verbose:
+        for question, went_deep, gain in rows:
+            print(f"  {'deep   ' if went_deep else 'shallow'}  +{gain}  {question}")
+    print(f"🔎 Deep ratio: {deep / len(rows):.2f} ({deep}/{len(rows)})")
+    print(f"🎯 Questions where the deep search keeps a new chunk: {len(could_gain)}, "
+          f"missed by staying shallow: {len(missed)}")
+
+
+if __name__ == "__main__":
+    main()
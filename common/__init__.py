@@ -0,0 +1,6 @@
+"""
+Shared helpers for the GenAI labs
+=================================
+Code used by more than one lab lives here. Lab scripts add the repository root
+to sys.path so this package imports the same way from every lab folder.
+"""
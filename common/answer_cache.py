@@ -0,0 +1,143 @@
+"""
+Semantic Answer Cache
+=====================
+Reuses a previous answer when a new question is a near-duplicate of an earlier one
+(cosine similarity of the query embeddings above a threshold) AND retrieval returned
+the same chunks, so the expensive generation step can be skipped.
+
+The index fingerprint (index_version_fn, e.g. the document count) is fetched on a
+background thread at most once per version_check_interval, so lookup() never waits
+on a network call and is safe to call from an event loop.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Answer cache keyed by query embedding similarity and the retrieved chunk set"""
+
+    def __init__(self, threshold=0.95, ttl_seconds=3600, max_entries=500,
+                 index_version_fn=None, version_check_interval=300):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.index_version_fn = index_version_fn
+        self.version_check_interval = version_check_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # entry id -> (unit vector, chunk ids, answer, created at)
+        self._next_id = 0
+        self._matrix = None
+        self._matrix_ids = []
+        self._index_version = None
+        self._last_version_check = 0.0
+        self._version_check_running = False
+        self._lock = threading.Lock()
+
+    def lookup(self, query_vector, chunk_ids):
+        """Return a cached answer for a similar query with the same chunks, or None"""
+        self._check_index_version()
+        query = _unit(query_vector)
+        chunk_set = frozenset(chunk_ids)
+        with self._lock:
+            self._expire()
+            if self._entries:
+                matrix, ids = self._get_matrix()
+                similarities = matrix @ query
+                for row in np.argsort(-similarities):
+                    if similarities[row] < self.threshold:
+                        break
+                    entry_id = ids[row]
+                    _, cached_chunks, answer, _ = self._entries[entry_id]
+                    if cached_chunks == chunk_set:
+                        self._entries.move_to_end(entry_id)
+                        self.hits += 1
+                        return answer
+            self.misses += 1
+            return None
+
+    def store(self, query_vector, chunk_ids, answer):
+        """Remember an answer for this query embedding and chunk set"""
+        with self._lock:
+            self._entries[self._next_id] = (_unit(query_vector), frozenset(chunk_ids), answer, time.monotonic())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the search index has been updated"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry[3] < cutoff]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        if expired:
+            self._matrix = None
+
+    def _get_matrix(self):
+        if self._matrix is None:
+            self._matrix_ids = list(self._entries)
+            self._matrix = np.vstack([self._entries[entry_id][0] for entry_id in self._matrix_ids])
+        return self._matrix, self._matrix_ids
+
+    def _check_index_version(self):
+        """Start a background fingerprint check when the interval has passed (never blocks)"""
+        if self.index_version_fn is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._version_check_running or now - self._last_version_check < self.version_check_interval:
+                return
+            self._last_version_check = now
+            self._version_check_running = True
+        threading.Thread(target=self._refresh_index_version, name="answer-cache-version", daemon=True).start()
+
+    def _refresh_index_version(self):
+        """Clear the cache when the index fingerprint changed since the last check"""
+        try:
+            version = self.index_version_fn()
+        except Exception:
+            return
+        finally:
+            self._version_check_running = False
+        if self._index_version is not None and version != self._index_version:
+            self.invalidate()
+        self._index_version = version
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def create_answer_cache(index_version_fn=None):
+    """Build the answer cache from environment settings, or return None when disabled"""
+    if os.getenv("ANSWER_CACHE", "true").lower() != "true":
+        return None
+    return SemanticAnswerCache(
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+        ttl_seconds=int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "500")),
+        index_version_fn=index_version_fn,
+    )
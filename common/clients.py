@@ -0,0 +1,273 @@
+"""
+Client Factory
+==============
+One place to build the Azure OpenAI and search clients the labs use.
+
+get_openai_client() / get_search_client() (and their async variants) hand out one
+shared client per process. All of them send requests over a single keep-alive
+connection pool per HTTP library, so connections and TLS sessions are reused across
+chat, embeddings and search calls instead of every client opening its own.
+
+Connection pool settings (environment variables):
+- HTTP_MAX_CONNECTIONS (default 100): open connections per pool
+- HTTP_MAX_KEEPALIVE (default 20): idle connections kept open for reuse
+- HTTP_KEEPALIVE_EXPIRY (default 30): seconds an idle connection is kept
+- HTTP_CONNECT_TIMEOUT (default 5) / HTTP_READ_TIMEOUT (default 60): seconds
+- HTTP2 (default false): use HTTP/2 for Azure OpenAI (needs: pip install "httpx[http2]")
+- AZURE_OPENAI_MAX_RETRIES (default 2): SDK retries for throttled or failed calls. Clients
+  built by common/load_balancer.py turn these off; BALANCER_MAX_RETRIES applies there instead
+
+SEARCH_BACKEND selects where retrieval runs:
+- "azure" (default): Azure AI Search via azure.search.documents.SearchClient
+- "local": the in-process index in common/local_search.py, read from LOCAL_INDEX_PATH
+"""
+
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_VERSION = "2024-02-15-preview"
+
+# Shared clients, keyed by what they were built for; created on first use
+_clients = {}
+_clients_lock = threading.RLock()  # re-entrant: building a client may create the shared pool
+
+
+def _shared(key, factory):
+    """Return the client stored under key, creating it once even with many threads"""
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, str(default)))
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+def _http2_enabled():
+    if os.getenv("HTTP2", "false").lower() != "true":
+        return False
+    try:
+        import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    except ImportError:
+        logger.warning("HTTP2=true but the h2 package is missing; using HTTP/1.1 (pip install \"httpx[http2]\")")
+        return False
+    return True
+
+
+def _httpx_settings():
+    import httpx
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=_env_int("HTTP_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=_env_int("HTTP_MAX_KEEPALIVE", 20),
+            keepalive_expiry=_env_float("HTTP_KEEPALIVE_EXPIRY", 30),
+        ),
+        "timeout": httpx.Timeout(_env_float("HTTP_READ_TIMEOUT", 60), connect=_env_float("HTTP_CONNECT_TIMEOUT", 5)),
+        "http2": _http2_enabled(),
+    }
+
+
+def get_http_client():
+    """The process-wide httpx.Client (connection pool) used by every sync Azure OpenAI client"""
+    import httpx
+
+    return _shared(("http",), lambda: httpx.Client(**_httpx_settings()))
+
+
+def get_async_http_client():
+    """
+    The process-wide httpx.AsyncClient used by every async Azure OpenAI client.
+    Use it from one event loop (the app's); pooled connections belong to that loop.
+    """
+    import httpx
+
+    return _shared(("async_http",), lambda: httpx.AsyncClient(**_httpx_settings()))
+
+
+def _openai_settings(endpoint=None, key=None, api_version=None):
+    return {
+        "azure_endpoint": endpoint or os.getenv("AZURE_OPENAI_ENDPOINT"),
+        "api_key": key or os.getenv("AZURE_OPENAI_API_KEY"),
+        "api_version": api_version or os.getenv("AZURE_OPENAI_API_VERSION", DEFAULT_API_VERSION),
+        "max_retries": _env_int("AZURE_OPENAI_MAX_RETRIES", 2),
+    }
+
+
+def create_openai_client(endpoint=None, key=None, api_version=None, http_client=None):
+    """A new AzureOpenAI client (on the shared pool unless http_client is given)"""
+    from openai import AzureOpenAI
+
+    http_client = http_client or get_http_client()
+    return AzureOpenAI(http_client=http_client, timeout=http_client.timeout,
+                       **_openai_settings(endpoint, key, api_version))
+
+
+def get_openai_client(endpoint=None, key=None, api_version=None):
+    """The shared AzureOpenAI client for an endpoint (AZURE_OPENAI_* settings by default)"""
+    settings = _openai_settings(endpoint, key, api_version)
+    return _shared(("openai", settings["azure_endpoint"], settings["api_key"], settings["api_version"]),
+                   lambda: create_openai_client(endpoint, key, api_version))
+
+
+def create_async_openai_client(endpoint=None, key=None, api_version=None, http_client=None):
+    """A new AsyncAzureOpenAI client (on the shared async pool unless http_client is given)"""
+    from openai import AsyncAzureOpenAI
+
+    http_client = http_client or get_async_http_client()
+    return AsyncAzureOpenAI(http_client=http_client, timeout=http_client.timeout,
+                            **_openai_settings(endpoint, key, api_version))
+
+
+def get_async_openai_client(endpoint=None, key=None, api_version=None):
+    """The shared AsyncAzureOpenAI client for an endpoint"""
+    settings = _openai_settings(endpoint, key, api_version)
+    return _shared(("async_openai", settings["azure_endpoint"], settings["api_key"], settings["api_version"]),
+                   lambda: create_async_openai_client(endpoint, key, api_version))
+
+
+def get_search_transport():
+    """
+    The process-wide azure-core transport for Azure AI Search: one requests.Session
+    whose connection pool is shared by every sync SearchClient
+    """
+    def build():
+        import requests
+        from azure.core.pipeline.transport import RequestsTransport
+
+        session = requests.Session()
+        pool_size = _env_int("HTTP_MAX_CONNECTIONS", 100)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # session_owner=False: closing one SearchClient must not close the shared session
+        return RequestsTransport(
+            session=session, session_owner=False,
+            connection_timeout=_env_float("HTTP_CONNECT_TIMEOUT", 5),
+            read_timeout=_env_float("HTTP_READ_TIMEOUT", 60),
+        )
+
+    return _shared(("search_transport",), build)
+
+
+def search_backend():
+    """Which retrieval backend to use: 'azure' or 'local'"""
+    return os.getenv("SEARCH_BACKEND", "azure").lower()
+
+
+def create_azure_search_client(endpoint=None, index_name=None, key=None, transport=None):
+    """Azure AI Search client from explicit values or the AZURE_SEARCH_* settings (on the shared pool)"""
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents import SearchClient
+
+    return SearchClient(
+        endpoint=endpoint or os.getenv("AZURE_SEARCH_ENDPOINT"),
+        index_name=index_name or os.getenv("AZURE_SEARCH_INDEX_NAME"),
+        credential=AzureKeyCredential(key or os.getenv("AZURE_SEARCH_KEY")),
+        transport=transport or get_search_transport(),
+    )
+
+
+def create_local_search_client(embed_fn=None):
+    """Local in-process search client over the index in LOCAL_INDEX_PATH"""
+    from common.local_search import LocalSearchClient
+
+    return LocalSearchClient(
+        os.getenv("LOCAL_INDEX_PATH", "local_index"),
+        key_field=os.getenv("AZURE_SEARCH_KEY_FIELD", "chunk_id"),
+        embed_fn=embed_fn or create_embed_fn(),
+    )
+
+
+def create_search_client(endpoint=None, index_name=None, key=None, embed_fn=None):
+    """
+    Search client for the configured backend. Both backends support
+    search(search_text=..., vector_queries=[...], select=..., top=...).
+    """
+    if search_backend() == "local":
+        return create_local_search_client(embed_fn)
+    return create_azure_search_client(endpoint, index_name, key)
+
+
+def create_async_search_client(endpoint=None, index_name=None, key=None, embed_fn=None):
+    """Async search client for the configured backend"""
+    if search_backend() == "local":
+        from common.local_search import AsyncLocalSearchClient
+
+        return AsyncLocalSearchClient(create_local_search_client(embed_fn))
+
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents.aio import SearchClient as AsyncSearchClient
+
+    return AsyncSearchClient(
+        endpoint=endpoint or os.getenv("AZURE_SEARCH_ENDPOINT"),
+        index_name=index_name or os.getenv("AZURE_SEARCH_INDEX_NAME"),
+        credential=AzureKeyCredential(key or os.getenv("AZURE_SEARCH_KEY")),
+        connection_timeout=_env_float("HTTP_CONNECT_TIMEOUT", 5),
+        read_timeout=_env_float("HTTP_READ_TIMEOUT", 60),
+    )
+
+
+def _search_key(kind, endpoint, index_name):
+    if search_backend() == "local":
+        return (kind, "local", os.getenv("LOCAL_INDEX_PATH", "local_index"))
+    return (kind, endpoint or os.getenv("AZURE_SEARCH_ENDPOINT"), index_name or os.getenv("AZURE_SEARCH_INDEX_NAME"))
+
+
+def get_search_client(endpoint=None, index_name=None, key=None, embed_fn=None):
+    """The shared search client for an index (see create_search_client)"""
+    return _shared(_search_key("search", endpoint, index_name),
+                   lambda: create_search_client(endpoint, index_name, key, embed_fn))
+
+
+def get_async_search_client(endpoint=None, index_name=None, key=None, embed_fn=None):
+    """The shared async search client for an index (see create_async_search_client)"""
+    return _shared(_search_key("async_search", endpoint, index_name),
+                   lambda: create_async_search_client(endpoint, index_name, key, embed_fn))
+
+
+def create_embed_fn(client=None, model=None):
+    """
+    Embedding function for the local backend's text vector queries.
+    Accepts one string (returns one vector) or a list of strings (returns a list).
+    The Azure OpenAI client is only created on first use.
+    """
+    state = {"client": client}
+    model = model or os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+
+    def embed(texts):
+        if state["client"] is None:
+            state["client"] = get_openai_client()
+        response = state["client"].embeddings.create(input=texts, model=model)
+        vectors = [item.embedding for item in response.data]
+        return vectors[0] if isinstance(texts, str) else vectors
+
+    return embed
+
+
+def close_clients():
+    """Close the shared sync clients and pools (async ones: see aclose_clients)"""
+    with _clients_lock:
+        clients = [_clients.pop(key) for key in list(_clients) if not key[0].startswith("async")]
+    for client in clients:
+        # The shared search transport does not own its session, so close the session directly
+        getattr(client, "session", client).close()
+
+
+async def aclose_clients():
+    """Close the shared async clients and pool; call on the event loop that used them"""
+    with _clients_lock:
+        clients = [_clients.pop(key) for key in list(_clients) if key[0].startswith("async")]
+    for client in clients:
+        await (client.aclose() if hasattr(client, "aclose") else client.close())
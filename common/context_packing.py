@@ -0,0 +1,105 @@
+"""
+Context Packing
+===============
+Fits retrieved sources into a fixed prompt-token budget. Results are pulled from
+the search iterator one at a time and pulling stops as soon as the budget is full,
+so later result pages are never requested. The last source that does not fit is
+cut back to a sentence boundary instead of being dropped or sent whole.
+"""
+
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+PackedContext = namedtuple("PackedContext", ["text", "tokens", "documents", "truncated"])
+
+# Where a sentence may end: ., ! or ? followed by whitespace, or a line break
+SENTENCE_END = re.compile(r"[.!?](?=\s)|\n")
+
+# Pieces smaller than this are not worth sending as a truncated source
+MIN_TRUNCATED_TOKENS = 20
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model=None):
+    """tiktoken encoding for the deployment's model, or None if tiktoken is unavailable"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    model = model or os.getenv("AZURE_OPENAI_MODEL_NAME", "gpt-4o")
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Custom deployment names are not known to tiktoken; gpt-4o's encoding is the default
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # The encoding files are downloaded on first use; offline we fall back to estimating
+        return None
+
+
+def count_tokens(text, model=None):
+    """Number of tokens in text (about 4 characters per token without tiktoken)"""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text, max_tokens, model=None):
+    """Keep at most max_tokens tokens of text, ending at the last full sentence"""
+    encoding = get_encoding(model)
+    if encoding is None:
+        cut = text[:max_tokens * 4]
+    else:
+        cut = encoding.decode(encoding.encode(text)[:max_tokens])
+    if len(cut) == len(text):
+        return text
+    ends = [match.end() for match in SENTENCE_END.finditer(cut)]
+    return cut[:ends[-1]].rstrip() if ends else ""
+
+
+def pack_context(results, format_fn, budget_tokens=None, model=None, separator="\n"):
+    """
+    Format search results into one context string that stays within budget_tokens
+
+    Args:
+        results: search results; iterated lazily and not consumed past the budget
+        format_fn: turns one result into the text placed in the prompt
+        budget_tokens (int): token budget (CONTEXT_TOKEN_BUDGET, default 3000)
+        model (str): model whose tokenizer is used for counting
+        separator (str): text placed between sources
+
+    Returns:
+        PackedContext: text, tokens used, the results included, and whether the last one was cut
+    """
+    if budget_tokens is None:
+        budget_tokens = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+    separator_tokens = count_tokens(separator, model) if separator else 0
+
+    pieces, documents = [], []
+    used = 0
+    truncated = False
+    for result in results:
+        text = format_fn(result)
+        cost = count_tokens(text, model) + (separator_tokens if pieces else 0)
+        if used + cost <= budget_tokens:
+            pieces.append(text)
+            documents.append(result)
+            used += cost
+            continue
+
+        # Out of room: send the part of this source that fits, then stop pulling results
+        remaining = budget_tokens - used - (separator_tokens if pieces else 0)
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            text = truncate_to_tokens(text, remaining, model)
+            if text:
+                pieces.append(text)
+                documents.append(result)
+                used += count_tokens(text, model) + (separator_tokens if len(pieces) > 1 else 0)
+                truncated = True
+        break
+
+    return PackedContext(separator.join(pieces), used, documents, truncated)
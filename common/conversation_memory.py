@@ -0,0 +1,263 @@
+"""
+Conversation Memory
+===================
+Lets a chat remember earlier turns without the prompt growing on every turn.
+
+- The last few turns are sent word for word.
+- Older turns are folded into a short running summary. Summaries are cached by the
+  turns they cover, so each new turn folds in only the turn that just became "old":
+  one small summarization call, not a re-read of the whole conversation.
+- Follow-up questions ("what does it cost?") are rewritten into standalone search
+  queries ("Northwind Standard plan cost") so retrieval finds the right documents.
+- Summary + recent turns always fit in a fixed token budget, so every turn costs
+  about the same no matter how long the conversation gets.
+
+    memory = create_conversation_memory(complete_fn)
+    context = memory.prepare(history, question)
+    results = search(context.query)
+    messages = [system_prompt, *context.messages, {"role": "user", "content": question}]
+
+complete_fn(messages, max_tokens) returns the model's reply as text.
+
+Settings (all optional):
+- MEMORY_RECENT_TURNS (default 3): turns sent word for word
+- MEMORY_TOKEN_BUDGET (default 1200): tokens for the summary plus the recent turns
+- MEMORY_SUMMARY_TOKENS (default 250): longest allowed summary
+- MEMORY_REWRITE_QUERIES (default true): rewrite follow-ups into standalone queries
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from common.context_packing import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+Turn = namedtuple("Turn", ["user", "assistant"])
+
+MemoryContext = namedtuple("MemoryContext", ["query", "messages", "summary", "recent_turns", "tokens"])
+
+SUMMARY_PROMPT = """You keep a running summary of a conversation between a user and an assistant.
+Update the summary with the new turns. Keep names, numbers, plans and open questions;
+drop greetings and repetition. Answer with the updated summary only, at most {max_words} words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}"""
+
+REWRITE_PROMPT = """Rewrite the user's latest question as a standalone search query that can be
+understood without the conversation. Resolve words like "it", "that" or "the plan" using the
+conversation. If the question already stands on its own, return it unchanged.
+Answer with the query only.
+
+Conversation:
+{conversation}
+
+Latest question: {question}"""
+
+
+def normalize_history(history):
+    """
+    Turns from a chat history in any of the usual shapes: Gradio's [[user, assistant], ...]
+    pairs, OpenAI-style [{"role", "content"}, ...] messages, or Turn tuples
+    """
+    turns = []
+    pending_user = None
+    for item in history or []:
+        if isinstance(item, dict):
+            content = item.get("content")
+            if not isinstance(content, str):
+                continue  # files and other rich content are not remembered
+            if item.get("role") == "user":
+                if pending_user is not None:
+                    turns.append(Turn(pending_user, ""))
+                pending_user = content
+            elif item.get("role") == "assistant":
+                turns.append(Turn(pending_user or "", content))
+                pending_user = None
+        else:
+            user, assistant = item[0], item[1]
+            turns.append(Turn(user if isinstance(user, str) else "",
+                              assistant if isinstance(assistant, str) else ""))
+    if pending_user is not None:
+        turns.append(Turn(pending_user, ""))
+    return turns
+
+
+def format_turns(turns):
+    return "\n".join(f"User: {turn.user}\nAssistant: {turn.assistant}" for turn in turns)
+
+
+def turn_messages(turns):
+    """Chat messages for turns, oldest first"""
+    messages = []
+    for turn in turns:
+        if turn.user:
+            messages.append({"role": "user", "content": turn.user})
+        if turn.assistant:
+            messages.append({"role": "assistant", "content": turn.assistant})
+    return messages
+
+
+def turn_tokens(turn, model=None):
+    # About 4 tokens of per-message overhead each for the user and assistant messages
+    return count_tokens(turn.user, model) + count_tokens(turn.assistant, model) + 8
+
+
+def _prefix_keys(turns):
+    """Key for every prefix of turns: keys[k] identifies turns[:k]"""
+    keys = [""]
+    digest = hashlib.sha1()
+    for turn in turns:
+        digest.update(turn.user.encode("utf-8") + b"\x00" + turn.assistant.encode("utf-8") + b"\x01")
+        keys.append(digest.copy().hexdigest())
+    return keys
+
+
+class ConversationMemory:
+    """Recent turns word for word, older turns in a cached running summary, within a token budget"""
+
+    def __init__(self, complete_fn, recent_turns=3, budget_tokens=1200, summary_tokens=250,
+                 rewrite_queries=True, cache_size=1024, model=None):
+        self.complete_fn = complete_fn
+        self.recent_turns = recent_turns
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.rewrite_queries = rewrite_queries
+        self.cache_size = cache_size
+        self.model = model
+        self._summaries = OrderedDict()  # prefix key -> summary of those turns
+        self._lock = threading.Lock()
+        self._stats = {"summaries_reused": 0, "turns_folded": 0, "rewrites": 0, "llm_errors": 0}
+
+    def _split(self, turns):
+        """(older turns to summarize, recent turns to send as-is) within the budget"""
+        recent = turns[-self.recent_turns:] if self.recent_turns else []
+        older = turns[:len(turns) - len(recent)]
+        budget = self.budget_tokens - (self.summary_tokens if older else 0)
+        while recent and sum(turn_tokens(turn, self.model) for turn in recent) > budget:
+            # The oldest recent turn no longer fits; it gets summarized instead
+            older, recent = turns[:len(older) + 1], recent[1:]
+            budget = self.budget_tokens - self.summary_tokens
+        return older, recent
+
+    def _cached_summary(self, keys, upto):
+        """(k, summary) for the longest prefix turns[:k], k <= upto, that was already summarized"""
+        with self._lock:
+            for k in range(upto, 0, -1):
+                summary = self._summaries.get(keys[k])
+                if summary is not None:
+                    self._summaries.move_to_end(keys[k])
+                    return k, summary
+        return 0, ""
+
+    def _remember_summary(self, key, summary):
+        with self._lock:
+            self._summaries[key] = summary
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+
+    def summarize(self, turns):
+        """Summary of turns, folding in only the turns not covered by a cached summary"""
+        if not turns:
+            return ""
+        keys = _prefix_keys(turns)
+        done, summary = self._cached_summary(keys, len(turns))
+        if done == len(turns):
+            with self._lock:
+                self._stats["summaries_reused"] += 1
+            return summary
+
+        new_turns = turns[done:]
+        # Each folded turn is capped, so one call never reads more than about one budget
+        per_turn = max(50, self.budget_tokens // (2 * len(new_turns)))
+        capped = [Turn(truncate_to_tokens(t.user, per_turn, self.model) or t.user[:per_turn * 4],
+                       truncate_to_tokens(t.assistant, per_turn, self.model) or t.assistant[:per_turn * 4])
+                  for t in new_turns]
+        prompt = SUMMARY_PROMPT.format(max_words=int(self.summary_tokens * 0.75),
+                                       summary=summary or "(none yet)", turns=format_turns(capped))
+        try:
+            updated = self.complete_fn([{"role": "user", "content": prompt}], self.summary_tokens)
+        except Exception as e:
+            # Without the model, keep the gist by appending the questions asked (not cached,
+            # so the next turn tries to summarize properly again)
+            with self._lock:
+                self._stats["llm_errors"] += 1
+            logger.warning("Could not summarize conversation, keeping the questions only: %s", e)
+            fallback = " ".join([summary] + [f"Asked: {t.user}" for t in new_turns]).strip()
+            return self._cap_summary(fallback)
+
+        summary = self._cap_summary((updated or "").strip())
+        self._remember_summary(keys[-1], summary)
+        with self._lock:
+            self._stats["turns_folded"] += len(new_turns)
+        return summary
+
+    def _cap_summary(self, summary):
+        return truncate_to_tokens(summary, self.summary_tokens, self.model) or summary[:self.summary_tokens * 4]
+
+    def rewrite(self, question, summary, recent):
+        """The question as a standalone search query (unchanged when there is no conversation)"""
+        if not self.rewrite_queries or not (summary or recent):
+            return question
+        conversation = format_turns(recent[-2:])
+        if summary:
+            conversation = f"Summary of earlier turns: {summary}\n{conversation}"
+        prompt = REWRITE_PROMPT.format(conversation=conversation, question=question)
+        try:
+            query = (self.complete_fn([{"role": "user", "content": prompt}], 60) or "").strip().strip('"')
+        except Exception as e:
+            with self._lock:
+                self._stats["llm_errors"] += 1
+            logger.warning("Could not rewrite follow-up question, searching for it as asked: %s", e)
+            return question
+        with self._lock:
+            self._stats["rewrites"] += 1
+        return query or question
+
+    def prepare(self, history, question, rewrite=True):
+        """
+        Memory for the next model call
+
+        Args:
+            history: the turns so far (see normalize_history), not including question
+            question (str): the user's new question
+            rewrite (bool): also rewrite the question into a standalone search query
+
+        Returns:
+            MemoryContext: query (standalone search query), messages (summary and recent turns
+            to place before the question), summary, recent_turns, and tokens used by messages
+        """
+        turns = [turn for turn in normalize_history(history) if turn.user or turn.assistant]
+        older, recent = self._split(turns)
+        summary = self.summarize(older)
+
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        messages += turn_messages(recent)
+        tokens = sum(count_tokens(message["content"], self.model) + 4 for message in messages)
+
+        query = self.rewrite(question, summary, recent) if rewrite else question
+        return MemoryContext(query, messages, summary, len(recent), tokens)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, cached_summaries=len(self._summaries))
+
+
+def create_conversation_memory(complete_fn, model=None):
+    """ConversationMemory configured from the MEMORY_* settings"""
+    return ConversationMemory(
+        complete_fn,
+        recent_turns=int(os.getenv("MEMORY_RECENT_TURNS", "3")),
+        budget_tokens=int(os.getenv("MEMORY_TOKEN_BUDGET", "1200")),
+        summary_tokens=int(os.getenv("MEMORY_SUMMARY_TOKENS", "250")),
+        rewrite_queries=os.getenv("MEMORY_REWRITE_QUERIES", "true").lower() == "true",
+        model=model,
+    )
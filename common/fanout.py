@@ -0,0 +1,194 @@
+"""
+Multi-Query Fan-out
+===================
+Short or vague questions often miss relevant chunks because the one query
+phrasing does not match how the documents are written. Fan-out searches for a
+few variants of the question at once and merges the rankings:
+
+1. The original question is searched right away while the variants are made:
+   - llm: the chat model writes rewrites and sub-questions (one short call,
+     cached per question)
+   - keywords: no model call; the question without filler words, and each part
+     of an "X and Y" question
+2. Every variant is searched concurrently on a shared thread pool.
+3. The rankings are merged with reciprocal rank fusion and de-duplicated by chunk id.
+
+The searches overlap, so the extra recall costs about one search round trip
+(plus the variant call in llm mode, which overlaps the first search), not N.
+
+Settings (all optional):
+- FANOUT_MODE (default off): llm, keywords or off
+- FANOUT_VARIANTS (default 3): variants searched besides the original question
+- FANOUT_MAX_WORKERS (default 8): searches in flight at once
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from common.fusion import reciprocal_rank_fusion
+from common.local_search import tokenize
+
+logger = logging.getLogger("rag.fanout")
+
+VARIANTS_PROMPT = """Write {count} different search queries that would find documents answering the
+question below. Mix rewrites that use other words for the same thing with narrower
+sub-questions for each part of the question. One query per line, no numbering.
+
+Question: {question}"""
+
+# Filler words dropped for the keyword variant
+FILLER_WORDS = frozenset(
+    "a an are can could do does give i is me my of please share should tell the to us what "
+    "which would you your about".split()
+)
+
+# Numbering or bullets the model may put in front of each query
+LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+def keyword_variants(question):
+    """Variants made without a model call: the question's keywords, and the parts of an 'X and Y' question"""
+    def keywords(text):
+        return " ".join(word for word in tokenize(text) if word not in FILLER_WORDS)
+
+    variants = [keywords(question)]
+    parts = re.split(r"\band\b|,", question)
+    if len(parts) > 1:
+        variants += [keywords(part) for part in parts]
+    return [variant for variant in variants if variant]
+
+
+def parse_variants(text):
+    """Queries from the model's reply, one per line"""
+    lines = (LIST_MARKER.sub("", line).strip().strip('"') for line in (text or "").splitlines())
+    return [line for line in lines if line]
+
+
+class QueryFanout:
+    """Searches several variants of a question concurrently and fuses the rankings"""
+
+    def __init__(self, mode="off", complete_fn=None, max_variants=3, max_workers=8, cache_size=256):
+        if mode == "llm" and complete_fn is None:
+            mode = "keywords"
+        self.mode = mode
+        self.complete_fn = complete_fn
+        self.max_variants = max_variants
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._variants = OrderedDict()  # question -> variants
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {"questions": 0, "searches": 0, "fanout_ms": 0.0, "slowest_search_ms": 0.0}
+
+    @property
+    def enabled(self):
+        return self.mode in ("llm", "keywords")
+
+    def executor(self):
+        """Thread pool for the searches, created on first use"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fanout")
+            return self._executor
+
+    def variants(self, question):
+        """Up to max_variants other queries for the question (cached per question)"""
+        with self._lock:
+            if question in self._variants:
+                self._variants.move_to_end(question)
+                return self._variants[question]
+
+        variants = []
+        if self.mode == "llm":
+            prompt = VARIANTS_PROMPT.format(count=self.max_variants, question=question)
+            try:
+                variants = parse_variants(self.complete_fn([{"role": "user", "content": prompt}], 150))
+            except Exception as e:
+                logger.warning("Could not generate query variants, using keywords: %s", e)
+        if not variants:
+            variants = keyword_variants(question)
+
+        # Drop repeats of the question and of each other
+        seen = {question.strip().lower()}
+        unique = []
+        for variant in variants:
+            if variant.lower() not in seen:
+                seen.add(variant.lower())
+                unique.append(variant)
+        unique = unique[:self.max_variants]
+
+        with self._lock:
+            self._variants[question] = unique
+            while len(self._variants) > self.cache_size:
+                self._variants.popitem(last=False)
+        return unique
+
+    def _timed_search(self, search_fn, query):
+        started = time.perf_counter()
+        results = list(search_fn(query))
+        return results, (time.perf_counter() - started) * 1000
+
+    def search(self, question, search_fn, key_field="chunk_id", top=None):
+        """
+        Search for the question and its variants at once; returns the fused results
+
+        Args:
+            question (str): the user's question
+            search_fn: search_fn(query) returns results best-first (called from worker threads)
+            key_field (str): field that identifies a chunk, used to de-duplicate
+            top (int): how many fused results to return (all when None)
+
+        With fan-out off this is just search_fn(question).
+        """
+        if not self.enabled:
+            return search_fn(question)
+
+        started = time.perf_counter()
+        executor = self.executor()
+        # The original question does not wait for the variants to be made
+        futures = [executor.submit(self._timed_search, search_fn, question)]
+        futures += [executor.submit(self._timed_search, search_fn, variant) for variant in self.variants(question)]
+        outcomes = [future.result() for future in futures]
+
+        fused = reciprocal_rank_fusion([results for results, _ in outcomes], key_field, top=top)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        slowest_ms = max(ms for _, ms in outcomes)
+        with self._lock:
+            self._stats["questions"] += 1
+            self._stats["searches"] += len(outcomes)
+            self._stats["fanout_ms"] += elapsed_ms
+            self._stats["slowest_search_ms"] += slowest_ms
+        logger.info("fanout question=%r searches=%d unique_results=%d total_ms=%.1f slowest_search_ms=%.1f",
+                    question[:80], len(outcomes), len(fused), elapsed_ms, slowest_ms)
+        return fused
+
+    def stats(self):
+        """Average searches per question, and total time next to the slowest single search"""
+        with self._lock:
+            stats = dict(self._stats)
+        questions = stats["questions"] or 1
+        return {
+            "mode": self.mode,
+            "questions": stats["questions"],
+            "searches_per_question": stats["searches"] / questions,
+            "avg_fanout_ms": stats["fanout_ms"] / questions,
+            "avg_slowest_search_ms": stats["slowest_search_ms"] / questions,
+        }
+
+
+def create_query_fanout(complete_fn=None):
+    """
+    QueryFanout configured from FANOUT_MODE / FANOUT_VARIANTS / FANOUT_MAX_WORKERS.
+    complete_fn(messages, max_tokens) returns the model's reply (needed for FANOUT_MODE=llm).
+    """
+    return QueryFanout(
+        mode=os.getenv("FANOUT_MODE", "off").lower(),
+        complete_fn=complete_fn,
+        max_variants=int(os.getenv("FANOUT_VARIANTS", "3")),
+        max_workers=int(os.getenv("FANOUT_MAX_WORKERS", "8")),
+    )
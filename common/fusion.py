@@ -0,0 +1,33 @@
+"""
+Result Fusion
+=============
+Reciprocal rank fusion (RRF): the same way Azure AI Search merges the keyword and
+vector rankings of a hybrid query. Each document scores sum(1 / (k + rank)).
+"""
+
+
+def reciprocal_rank_fusion(result_lists, key_field, top=None, k=60):
+    """
+    Merge several ranked result lists into one, de-duplicated by key_field
+
+    Args:
+        result_lists: iterables of result dicts, each already sorted best-first
+        key_field (str): field that identifies a document (e.g. "chunk_id")
+        top (int): how many fused results to return (all when None)
+        k (int): RRF damping constant; 60 is the value Azure AI Search uses
+
+    Returns:
+        list: result dicts best-first, with "@search.score" set to the fused score
+    """
+    scores = {}
+    documents = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = doc[key_field]
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            documents.setdefault(key, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    if top is not None:
+        ranked = ranked[:top]
+    return [dict(documents[key], **{"@search.score": scores[key]}) for key in ranked]
@@ -0,0 +1,250 @@
+"""
+Hedged Requests
+===============
+Cuts tail latency on idempotent reads (searches, embeddings). When the first
+attempt has not answered within the call's usual latency (a percentile of recent
+calls, HEDGE_PERCENTILE), a second identical attempt is sent and whichever
+answers first is used; the other one is cancelled.
+
+- The trigger delay follows a rolling window of observed latencies, so only the
+  slowest few percent of calls are ever hedged. Until enough calls have been
+  seen, nothing is hedged.
+- A hedge budget caps hedges at HEDGE_BUDGET_PERCENT of calls (a token bucket
+  every call adds to and every hedge spends from). When a service slows down
+  across the board, hedging stops instead of doubling its load.
+- Async attempts are real tasks, so the losing request is cancelled and its
+  connection freed, as are both attempts when the caller itself is cancelled. A sync
+  attempt cannot be interrupted; the loser finishes in the background on the hedging
+  thread pool and its result is dropped.
+- Sync calls run inline until enough latencies have been seen. After that the hedge
+  delay is counted from when the first attempt starts running on the pool, so time
+  spent queued behind other calls never triggers a hedge by itself.
+
+Only use it for calls that are safe to send twice.
+
+    hedger = create_hedger("search")
+    results = hedger.call(lambda: list(search_client.search(...)))
+    vector = await hedger.acall(lambda: embed_async(text))
+
+Settings (all optional):
+- HEDGING (default false): turn hedging on
+- HEDGE_PERCENTILE (default 95): hedge calls slower than this percentile
+- HEDGE_BUDGET_PERCENT (default 10): most hedges per 100 calls
+- HEDGE_MIN_DELAY_MS (default 20): never hedge sooner than this
+- HEDGE_MIN_SAMPLES (default 20): calls observed before hedging starts
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger("rag.hedging")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_hedge_executor():
+    """Thread pool the sync attempts run on (shared by all hedgers, created on first use)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv("HEDGE_MAX_WORKERS", "32"))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+        return _executor
+
+
+class LatencyWindow:
+    """The most recent latencies of one kind of call"""
+
+    def __init__(self, size=256):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def percentile(self, pct):
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class HedgeBudget:
+    """Every call earns `ratio` of a hedge and every hedge spends a whole one (at most `burst` saved up)"""
+
+    def __init__(self, ratio=0.1, burst=10):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = float(burst)
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class Hedger:
+    """Hedges one kind of idempotent call"""
+
+    def __init__(self, name, enabled=True, percentile=95, budget_percent=10, min_delay_ms=20,
+                 min_samples=20, window=256):
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay_ms / 1000.0
+        self.min_samples = min_samples
+        self.latencies = LatencyWindow(window)
+        self.budget = HedgeBudget(ratio=budget_percent / 100.0)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while there are too few samples"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    def _start(self):
+        """Count a call; returns the hedge delay to use"""
+        self._count("calls")
+        self.budget.earn()
+        return self.hedge_delay()
+
+    def _may_hedge(self):
+        if self.budget.try_spend():
+            self._count("hedged")
+            return True
+        self._count("budget_denied")
+        return False
+
+    def _timed(self, fn, running=None):
+        # Runs on the pool; records every attempt's latency, including losers that finish late
+        if running is not None:
+            running.set()
+        started = time.perf_counter()
+        result = fn()
+        self.latencies.add(time.perf_counter() - started)
+        return result
+
+    def call(self, fn):
+        """fn() with a hedge if it is slow; fn must be safe to call twice"""
+        if not self.enabled:
+            return fn()
+        delay = self._start()
+        if delay is None:
+            return self._timed(fn)  # nothing to hedge against yet
+        executor = get_hedge_executor()
+        running = threading.Event()
+        primary = executor.submit(self._timed, fn, running)
+        # Start the clock once the attempt runs, not while it waits for a free pool thread
+        running.wait()
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._may_hedge():
+            return primary.result()
+
+        hedge = executor.submit(self._timed, fn)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    for loser in pending:
+                        loser.cancel()  # only stops an attempt that has not started yet
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _timed_async(self, fn):
+        started = time.perf_counter()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # A cancelled loser took at least this long; keeps the window from only seeing winners
+            self.latencies.add(time.perf_counter() - started)
+            raise
+        self.latencies.add(time.perf_counter() - started)
+        return result
+
+    async def acall(self, fn):
+        """await fn() with a hedge if it is slow; fn returns a new coroutine each call"""
+        if not self.enabled:
+            return await fn()
+        delay = self._start()
+        primary = asyncio.ensure_future(self._timed_async(fn))
+        hedge = None
+        # Whatever happens (a winner, an error, or the caller being cancelled), no attempt outlives the call
+        try:
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._may_hedge():
+                return await primary
+
+            hedge = asyncio.ensure_future(self._timed_async(fn))
+            pending = {primary, hedge}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        delay = self.hedge_delay()
+        p50 = self.latencies.percentile(50)
+        stats.update(
+            name=self.name,
+            enabled=self.enabled,
+            hedge_rate=stats["hedged"] / (stats["calls"] or 1),
+            win_rate=stats["hedge_wins"] / (stats["hedged"] or 1),
+            hedge_delay_ms=None if delay is None else delay * 1000,
+            p50_ms=None if p50 is None else p50 * 1000,
+        )
+        return stats
+
+
+def create_hedger(name):
+    """Hedger for one kind of call, configured from HEDGING and the HEDGE_* settings"""
+    return Hedger(
+        name,
+        enabled=os.getenv("HEDGING", "false").lower() == "true",
+        percentile=float(os.getenv("HEDGE_PERCENTILE", "95")),
+        budget_percent=float(os.getenv("HEDGE_BUDGET_PERCENT", "10")),
+        min_delay_ms=float(os.getenv("HEDGE_MIN_DELAY_MS", "20")),
+        min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+    )
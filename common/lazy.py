@@ -0,0 +1,43 @@
+"""
+Lazy Objects
+============
+Stand-ins for clients that are expensive to create. A module can declare
+
+    search_client = Lazy(lambda: get_search_client(...))
+
+at import time and use search_client.search(...) as usual: the real client is only
+built on first use. Importing the module (for tests, tools, or before a server forks
+its workers) then costs no SDK imports and opens no connections.
+"""
+
+import threading
+
+
+class Lazy:
+    """Builds the real object with factory() on first attribute access"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._created = False
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        """The real object, created on the first call"""
+        if not self._created:
+            with self._lock:
+                if not self._created:
+                    self._value = self._factory()
+                    self._created = True
+        return self._value
+
+    @property
+    def created(self):
+        return self._created
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        state = repr(self._value) if self._created else "not created yet"
+        return f"Lazy({state})"
@@ -0,0 +1,323 @@
+"""
+Azure OpenAI Load Balancer
+==========================
+Spreads chat and embedding calls over several Azure OpenAI deployments (for example
+the same model in two regions), so throughput is no longer capped by one quota.
+
+Backends are listed as JSON in AZURE_OPENAI_BACKENDS:
+
+    [{"name": "eastus", "endpoint": "https://a.openai.azure.com/", "key": "...",
+      "deployment": "gpt-4o", "embedding_deployment": "text-embedding-3-large",
+      "tpm": 50000, "rpm": 300},
+     {"name": "swedencentral", "endpoint": "https://b.openai.azure.com/", ...}]
+
+Without it, one backend is built from the usual AZURE_OPENAI_* settings.
+
+Each call goes to the healthy backend with the most remaining quota (the
+x-ratelimit-remaining-* headers Azure returns, or the local token budget), or with
+BALANCER_STRATEGY=latency, the lowest recent latency. Throttled backends sit out for
+their retry-after; backends that keep failing are ejected for BALANCER_EJECT_SECONDS.
+The call then moves on to another backend. With a single backend nothing is ejected for
+failures (there is nowhere else to go); the call backs off and retries instead.
+
+The balancer owns retries: the OpenAI clients it builds have the SDK's own retries turned
+off (so AZURE_OPENAI_MAX_RETRIES does not apply to its calls), and BALANCER_MAX_RETRIES sets
+how many attempts a call gets across all backends.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from common.clients import get_async_openai_client, get_openai_client
+from common.rate_limit import (
+    RateLimiter, create_rate_limiter, estimate_chat_tokens, estimate_embedding_tokens,
+    is_retryable, retry_after_seconds
+)
+
+logger = logging.getLogger(__name__)
+
+# Responses from a backend that cannot serve calls at all (bad key, missing deployment)
+BACKEND_ERRORS = {401, 403, 404}
+
+# Quota headers older than this no longer describe the current minute
+QUOTA_HEADER_TTL = 60.0
+
+
+class Backend:
+    """One Azure OpenAI resource + deployments, with its health and load statistics"""
+
+    def __init__(self, name, client, async_client, deployment, embedding_deployment,
+                 chat_limiter=None, embedding_limiter=None):
+        self.name = name
+        self.client = client
+        self.async_client = async_client
+        self.deployments = {"chat": deployment, "embedding": embedding_deployment}
+        self.limiters = {
+            "chat": chat_limiter or RateLimiter(max_retries=0, name=f"{name}-chat"),
+            "embedding": embedding_limiter or RateLimiter(max_retries=0, name=f"{name}-embedding"),
+        }
+        self.latency_ewma = None
+        self.remaining = {}  # kind -> (remaining requests, remaining tokens, when reported)
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.counts = {"calls": 0, "failures": 0, "throttled": 0, "ejections": 0}
+
+    def remaining_tokens(self, kind, now):
+        """Tokens this backend can still take this minute; None when unknown"""
+        reported = self.remaining.get(kind)
+        if reported and now - reported[2] < QUOTA_HEADER_TTL and reported[1] is not None:
+            return reported[1]
+        return self.limiters[kind].remaining_tokens()
+
+
+def _header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class LoadBalancer:
+    """Chooses a backend per call, fails over on errors, and keeps per-backend stats"""
+
+    def __init__(self, backends, strategy="quota", max_retries=6, eject_seconds=30.0,
+                 failure_threshold=3, latency_alpha=0.3):
+        if not backends:
+            raise ValueError("LoadBalancer needs at least one backend")
+        self.backends = backends
+        self.strategy = strategy
+        self.max_retries = max_retries
+        self.eject_seconds = eject_seconds
+        self.failure_threshold = failure_threshold
+        self.latency_alpha = latency_alpha
+        self._lock = threading.Lock()
+
+    # Choosing a backend
+    # ------------------
+
+    def _score(self, backend, kind, now):
+        """Lower is better"""
+        if self.strategy == "latency":
+            # Untried backends go first so every backend gets a latency estimate
+            return (backend.latency_ewma or 0.0, backend.in_flight)
+        remaining = backend.remaining_tokens(kind, now)
+        return (-(remaining if remaining is not None else float("inf")), backend.in_flight)
+
+    def _choose(self, kind, exclude=()):
+        """Pick a backend and count the call against it; returns (backend, seconds to wait)"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [b for b in self.backends if b.name not in exclude] or self.backends
+            healthy = [b for b in candidates if b.ejected_until <= now]
+            if healthy:
+                best = min(self._score(b, kind, now) for b in healthy)
+                backend = random.choice([b for b in healthy if self._score(b, kind, now) == best])
+                wait = 0.0
+            else:
+                # Everyone is sitting out: use the backend that comes back first
+                backend = min(candidates, key=lambda b: b.ejected_until)
+                wait = backend.ejected_until - now
+            backend.in_flight += 1
+            backend.counts["calls"] += 1
+            return backend, wait
+
+    # Recording results
+    # -----------------
+
+    def _record_success(self, backend, kind, seconds, headers):
+        with self._lock:
+            backend.in_flight -= 1
+            backend.consecutive_failures = 0
+            if backend.latency_ewma is None:
+                backend.latency_ewma = seconds
+            else:
+                backend.latency_ewma += self.latency_alpha * (seconds - backend.latency_ewma)
+            requests_left = _header_int(headers, "x-ratelimit-remaining-requests")
+            tokens_left = _header_int(headers, "x-ratelimit-remaining-tokens")
+            if requests_left is not None or tokens_left is not None:
+                backend.remaining[kind] = (requests_left, tokens_left, time.monotonic())
+
+    def _release(self, backend):
+        """Undo the in-flight count of a call that was cancelled"""
+        with self._lock:
+            backend.in_flight -= 1
+
+    def _record_failure(self, backend, error):
+        """Update health after a failed call; returns True when another attempt may succeed"""
+        status = getattr(error, "status_code", None)
+        with self._lock:
+            backend.in_flight -= 1
+            backend.counts["failures"] += 1
+            now = time.monotonic()
+            if status == 429:
+                backend.counts["throttled"] += 1
+                # Sit out for as long as the service asked, then come straight back
+                backend.ejected_until = max(backend.ejected_until, now + (retry_after_seconds(error) or 10.0))
+                return True
+            if status in BACKEND_ERRORS or is_retryable(error):
+                backend.consecutive_failures += 1
+                # Ejecting the only backend would just make every call wait out eject_seconds
+                if len(self.backends) == 1:
+                    return is_retryable(error)
+                if status in BACKEND_ERRORS or backend.consecutive_failures >= self.failure_threshold:
+                    backend.ejected_until = now + self.eject_seconds
+                    backend.counts["ejections"] += 1
+                    logger.warning("Ejecting backend %s for %.0fs after %s (status %s)",
+                                   backend.name, self.eject_seconds, type(error).__name__, status)
+                # A missing deployment or bad key is only worth retrying somewhere else
+                return True
+            return False
+
+    # Calling
+    # -------
+
+    def _prepare(self, kind, backend, kwargs):
+        kwargs = dict(kwargs, model=backend.deployments[kind])
+        if kind == "chat":
+            estimate = estimate_chat_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        else:
+            estimate = estimate_embedding_tokens(kwargs.get("input", ""))
+        return kwargs, estimate
+
+    @staticmethod
+    def _endpoint(client, kind):
+        # with_raw_response gives access to the quota headers; .parse() returns the usual object
+        api = client.chat.completions if kind == "chat" else client.embeddings
+        return api.with_raw_response.create
+
+    def call(self, kind, **kwargs):
+        """Send one chat ("chat") or embeddings ("embedding") call; model is set per backend"""
+        tried = set()
+        for attempt in range(self.max_retries + 1):
+            backend, wait = self._choose(kind, exclude=tried)
+            if wait > 0:
+                time.sleep(wait)
+            call_kwargs, estimate = self._prepare(kind, backend, kwargs)
+            started = time.perf_counter()
+            try:
+                raw = backend.limiters[kind].attempt(
+                    self._endpoint(backend.client, kind), estimated_tokens=estimate, **call_kwargs
+                )
+            except Exception as e:
+                if not self._record_failure(backend, e) or attempt == self.max_retries:
+                    raise
+                tried.add(backend.name)
+                if len(tried) >= len(self.backends):
+                    # Every backend failed once: back off before going round again
+                    tried.clear()
+                    time.sleep(backend.limiters[kind].backoff(e, attempt))
+                continue
+            except BaseException:
+                self._release(backend)
+                raise
+            self._record_success(backend, kind, time.perf_counter() - started, raw.headers)
+            return raw.parse()
+
+    async def acall(self, kind, **kwargs):
+        """Async version of call() using each backend's async client"""
+        tried = set()
+        for attempt in range(self.max_retries + 1):
+            backend, wait = self._choose(kind, exclude=tried)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            call_kwargs, estimate = self._prepare(kind, backend, kwargs)
+            started = time.perf_counter()
+            try:
+                raw = await backend.limiters[kind].attempt_async(
+                    self._endpoint(backend.async_client, kind), estimated_tokens=estimate, **call_kwargs
+                )
+            except Exception as e:
+                if not self._record_failure(backend, e) or attempt == self.max_retries:
+                    raise
+                tried.add(backend.name)
+                if len(tried) >= len(self.backends):
+                    tried.clear()
+                    await asyncio.sleep(backend.limiters[kind].backoff(e, attempt))
+                continue
+            except BaseException:
+                # Cancelled (the user left the chat): free the slot without blaming the backend
+                self._release(backend)
+                raise
+            self._record_success(backend, kind, time.perf_counter() - started, raw.headers)
+            return raw.parse()  # parse() is synchronous on the async client too
+
+    def chat_completion(self, **kwargs):
+        return self.call("chat", **kwargs)
+
+    def embedding(self, **kwargs):
+        return self.call("embedding", **kwargs)
+
+    async def chat_completion_async(self, **kwargs):
+        return await self.acall("chat", **kwargs)
+
+    async def embedding_async(self, **kwargs):
+        return await self.acall("embedding", **kwargs)
+
+    def stats(self):
+        """Per-backend health and load, e.g. for logs or a metrics endpoint"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                dict(
+                    backend.counts,
+                    name=backend.name,
+                    healthy=backend.ejected_until <= now,
+                    ejected_seconds_left=round(max(0.0, backend.ejected_until - now), 1),
+                    in_flight=backend.in_flight,
+                    latency_ms=round(backend.latency_ewma * 1000, 1) if backend.latency_ewma else None,
+                    remaining_tokens={kind: backend.remaining_tokens(kind, now) for kind in backend.deployments},
+                )
+                for backend in self.backends
+            ]
+
+
+def create_backend(config):
+    """Backend from one AZURE_OPENAI_BACKENDS entry (a dict)"""
+    name = config.get("name") or config["endpoint"]
+    endpoint, key, api_version = config["endpoint"], config.get("key"), config.get("api_version")
+
+    def limiter(kind, rpm, tpm):
+        return RateLimiter(requests_per_minute=rpm, tokens_per_minute=tpm, max_retries=0, name=f"{name}-{kind}")
+
+    return Backend(
+        name,
+        # The balancer retries on another backend, so the SDK's own retries are turned off
+        client=get_openai_client(endpoint, key, api_version).with_options(max_retries=0),
+        async_client=get_async_openai_client(endpoint, key, api_version).with_options(max_retries=0),
+        deployment=config.get("deployment") or os.getenv("AZURE_OPENAI_MODEL_NAME", "gpt-4o"),
+        embedding_deployment=config.get("embedding_deployment")
+        or os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002"),
+        chat_limiter=limiter("chat", config.get("rpm"), config.get("tpm")),
+        embedding_limiter=limiter("embedding", config.get("embedding_rpm"), config.get("embedding_tpm")),
+    )
+
+
+def create_load_balancer():
+    """LoadBalancer over AZURE_OPENAI_BACKENDS, or over the single AZURE_OPENAI_* deployment"""
+    configs = json.loads(os.getenv("AZURE_OPENAI_BACKENDS") or "[]")
+    if configs:
+        backends = [create_backend(config) for config in configs]
+    else:
+        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        backends = [Backend(
+            "default",
+            client=get_openai_client(endpoint).with_options(max_retries=0),
+            async_client=get_async_openai_client(endpoint).with_options(max_retries=0),
+            deployment=os.getenv("AZURE_OPENAI_MODEL_NAME", "gpt-4o"),
+            embedding_deployment=os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002"),
+            chat_limiter=create_rate_limiter("AZURE_OPENAI_CHAT"),
+            embedding_limiter=create_rate_limiter("AZURE_OPENAI_EMBEDDING"),
+        )]
+
+    return LoadBalancer(
+        backends,
+        strategy=os.getenv("BALANCER_STRATEGY", "quota").lower(),
+        max_retries=int(os.getenv("BALANCER_MAX_RETRIES", "6")),
+        eject_seconds=float(os.getenv("BALANCER_EJECT_SECONDS", "30")),
+    )
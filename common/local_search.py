@@ -0,0 +1,342 @@
+"""
+Local Vector Index
+==================
+An in-process stand-in for Azure AI Search's SearchClient, for offline testing and
+low-latency retrieval over small corpora such as the Northwind benefits documents.
+
+- Vectors live in a memory-mapped NumPy matrix (vectors.npy), unit-normalized so
+  cosine similarity is a single matrix-vector product.
+- Keyword search uses a BM25 inverted index built when the index is opened.
+- Hybrid queries fuse both rankings with reciprocal rank fusion, like the service.
+- Every write produces a new generation (documents-<id>.json + vectors-<id>.npy) and then
+  switches the small pointer file index.json to it in one os.replace, so a reader always
+  loads documents and vectors of the same generation.
+
+Build a local copy of an existing Azure index with:
+    python -m common.local_search export <output-folder>
+"""
+
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from common.fusion import reciprocal_rank_fusion
+
+POINTER_FILE = "index.json"
+# Files of an index written before generations existed (still readable)
+DOCUMENTS_FILE = "documents.json"
+VECTORS_FILE = "vectors.npy"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lower-case word tokens used by the BM25 index"""
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring, vectorized per query term"""
+
+    def __init__(self, texts, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(texts)
+        self.doc_lengths = np.zeros(self.doc_count, dtype=np.float32)
+        postings = defaultdict(lambda: ([], []))
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                doc_ids, tfs = postings[term]
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+        self.postings = {
+            term: (np.array(doc_ids, dtype=np.int32), np.array(tfs, dtype=np.float32))
+            for term, (doc_ids, tfs) in postings.items()
+        }
+        self.avg_length = float(self.doc_lengths.mean()) if self.doc_count else 0.0
+
+    def scores(self, query):
+        """BM25 score of every document for the query (zeros when nothing matches)"""
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        if not self.doc_count:
+            return scores
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / (self.avg_length or 1.0))
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            doc_ids, tfs = self.postings[term]
+            idf = math.log(1 + (self.doc_count - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + length_norm[doc_ids])
+        return scores
+
+
+class LocalSearchClient:
+    """
+    Drop-in replacement for the parts of azure.search.documents.SearchClient the labs use:
+    search(), get_document_count(), upload_documents() and delete_documents().
+    """
+
+    def __init__(self, index_path, key_field="chunk_id", text_field="chunk",
+                 vector_field="text_vector", embed_fn=None):
+        self.index_path = Path(index_path)
+        self.key_field = key_field
+        self.text_field = text_field
+        self.vector_field = vector_field
+        self.embed_fn = embed_fn  # needed for VectorizableTextQuery (text -> vector)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self, attempts=3):
+        for attempt in range(attempts):
+            documents_file, vectors_file = _index_files(self.index_path)
+            try:
+                documents = json.loads(documents_file.read_text(encoding="utf-8")) if documents_file.exists() else []
+                vectors = np.load(vectors_file, mmap_mode="r") if vectors_file.exists() and documents else None
+                break
+            except FileNotFoundError:
+                # A writer switched generations and removed these files after we read the pointer
+                if attempt == attempts - 1:
+                    raise
+        self._documents, self._vectors = documents, vectors
+        self._bm25 = BM25Index([doc.get(self.text_field, "") for doc in self._documents])
+
+    def search(self, search_text=None, vector_queries=None, select=None, top=50, **kwargs):
+        """Keyword, vector or hybrid search; returns a list of result dicts best-first"""
+        with self._lock:
+            rankings = []
+            if search_text and search_text != "*":
+                rankings.append(self._keyword_ranking(search_text, top))
+            for vector_query in vector_queries or []:
+                rankings.append(self._vector_ranking(vector_query, top))
+
+            if not rankings:
+                ranked = [(i, 1.0) for i in range(min(top, len(self._documents)))]
+            elif len(rankings) == 1:
+                ranked = rankings[0][:top]
+            else:
+                fused = reciprocal_rank_fusion(
+                    [[{"id": i, "score": s} for i, s in ranking] for ranking in rankings],
+                    key_field="id", top=top,
+                )
+                ranked = [(doc["id"], doc["@search.score"]) for doc in fused]
+
+            return [self._result(position, score, select) for position, score in ranked]
+
+    def _keyword_ranking(self, search_text, top):
+        scores = self._bm25.scores(search_text)
+        candidates = np.flatnonzero(scores)
+        return _top_k(candidates, scores[candidates], top)
+
+    def _vector_ranking(self, vector_query, top):
+        if self._vectors is None:
+            return []
+        vector = getattr(vector_query, "vector", None)
+        if vector is None:
+            if self.embed_fn is None:
+                raise ValueError("LocalSearchClient needs embed_fn to run text vector queries")
+            vector = self.embed_fn(vector_query.text)
+        query = _unit(vector)
+        k = getattr(vector_query, "k_nearest_neighbors", None) or top
+        scores = self._vectors @ query
+        return _top_k(np.arange(len(scores)), scores, k)
+
+    def _result(self, position, score, select):
+        doc = self._documents[position]
+        if select:
+            result = {field: doc.get(field) for field in select}
+        else:
+            result = dict(doc)
+        result["@search.score"] = float(score)
+        return result
+
+    def get_document_count(self):
+        return len(self._documents)
+
+    def upload_documents(self, documents):
+        """Add or replace documents (each must include the key field and the vector field)"""
+        with self._lock:
+            merged = {doc[self.key_field]: doc for doc in self._all_documents()}
+            for doc in documents:
+                merged[doc[self.key_field]] = doc
+            self._write(list(merged.values()))
+        return [_IndexingResult(doc[self.key_field]) for doc in documents]
+
+    def merge_or_upload_documents(self, documents):
+        return self.upload_documents(documents)
+
+    def delete_documents(self, documents):
+        """Remove documents by key"""
+        with self._lock:
+            keys = {doc[self.key_field] for doc in documents}
+            self._write([doc for doc in self._all_documents() if doc[self.key_field] not in keys])
+        return [_IndexingResult(doc[self.key_field]) for doc in documents]
+
+    def _all_documents(self):
+        """Documents with their vectors re-attached (used when rewriting the index)"""
+        for position, doc in enumerate(self._documents):
+            if self._vectors is None:
+                yield dict(doc)
+            else:
+                yield dict(doc, **{self.vector_field: self._vectors[position].tolist()})
+
+    def _write(self, documents):
+        self._vectors = None  # release the memory map so the file can be replaced (Windows)
+        write_local_index(self.index_path, documents, vector_field=self.vector_field)
+        self._load()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncLocalSearchClient:
+    """Async facade over LocalSearchClient, shaped like azure.search.documents.aio.SearchClient"""
+
+    def __init__(self, client):
+        self._client = client
+
+    async def search(self, **kwargs):
+        return _AsyncResults(self._client.search(**kwargs))
+
+    async def get_document_count(self):
+        return self._client.get_document_count()
+
+    async def close(self):
+        self._client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class _AsyncResults:
+    def __init__(self, results):
+        self._results = iter(results)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _IndexingResult:
+    """Mirrors the fields of azure.search.documents.models.IndexingResult"""
+
+    def __init__(self, key):
+        self.key = key
+        self.succeeded = True
+        self.status_code = 200
+        self.error_message = None
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _top_k(positions, scores, k):
+    """Top-k (position, score) pairs without sorting the whole array"""
+    if k <= 0:
+        return []
+    if len(positions) > k:
+        best = np.argpartition(-scores, k - 1)[:k]
+        positions, scores = positions[best], scores[best]
+    order = np.argsort(-scores, kind="stable")
+    return [(int(positions[i]), float(scores[i])) for i in order]
+
+
+def _index_files(index_path):
+    """(documents file, vectors file) of the current generation"""
+    pointer = index_path / POINTER_FILE
+    if pointer.exists():
+        current = json.loads(pointer.read_text(encoding="utf-8"))
+        return index_path / current["documents"], index_path / current["vectors"]
+    return index_path / DOCUMENTS_FILE, index_path / VECTORS_FILE
+
+
+def write_local_index(index_path, documents, vector_field="text_vector"):
+    """Write documents and their unit-normalized vectors as a new generation, then switch to it"""
+    index_path = Path(index_path)
+    index_path.mkdir(parents=True, exist_ok=True)
+    documents = list(documents)
+    vectors = np.vstack([_unit(doc[vector_field]) for doc in documents]) if documents else np.zeros((0, 0), np.float32)
+    texts = [{k: v for k, v in doc.items() if k != vector_field} for doc in documents]
+
+    # The new generation's files are complete before the pointer names them
+    generation = f"{time.time_ns():x}-{os.getpid()}"
+    current = {"generation": generation, "documents": f"documents-{generation}.json",
+               "vectors": f"vectors-{generation}.npy"}
+    with open(index_path / current["vectors"], "wb") as f:
+        np.save(f, vectors.astype(np.float32))
+    (index_path / current["documents"]).write_text(json.dumps(texts, ensure_ascii=False), encoding="utf-8")
+    pointer_tmp = index_path / (POINTER_FILE + f".{generation}.tmp")
+    pointer_tmp.write_text(json.dumps(current), encoding="utf-8")
+    os.replace(pointer_tmp, index_path / POINTER_FILE)
+
+    # Remove older generations; a file still memory-mapped by a reader (Windows) is left for next time
+    keep = {current["documents"], current["vectors"]}
+    for old in [*index_path.glob("documents-*.json"), *index_path.glob("vectors-*.npy"),
+                index_path / DOCUMENTS_FILE, index_path / VECTORS_FILE]:
+        if old.name not in keep and old.exists():
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+def export_azure_index(search_client, index_path, embed_fn=None, vector_field="text_vector",
+                       text_field="chunk", batch_size=16):
+    """
+    Copy every document of an Azure AI Search index into a local index.
+    When the vector field is not retrievable, chunks are re-embedded with embed_fn.
+    """
+    documents = [
+        {k: v for k, v in doc.items() if not k.startswith("@search.")}
+        for doc in search_client.search(search_text="*")
+    ]
+    missing = [doc for doc in documents if not doc.get(vector_field)]
+    if missing:
+        if embed_fn is None:
+            raise ValueError(f"'{vector_field}' is not retrievable; pass embed_fn to re-embed chunks")
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            for doc, vector in zip(batch, embed_fn([doc[text_field] for doc in batch])):
+                doc[vector_field] = vector
+    write_local_index(index_path, documents, vector_field=vector_field)
+    return len(documents)
+
+
+if __name__ == "__main__":
+    # python -m common.local_search export <output-folder>
+    from dotenv import load_dotenv
+    from common.clients import create_azure_search_client, create_embed_fn
+
+    if len(sys.argv) != 3 or sys.argv[1] != "export":
+        print("Usage: python -m common.local_search export <output-folder>")
+        sys.exit(1)
+
+    load_dotenv()
+    count = export_azure_index(create_azure_search_client(), sys.argv[2], embed_fn=create_embed_fn())
+    print(f"✅ Exported {count} documents to {sys.argv[2]}")
@@ -0,0 +1,332 @@
+"""
+Client-Side Rate Limiting
+=========================
+Keeps Azure OpenAI calls inside the deployment's quota instead of bouncing off it
+with 429 (Too Many Requests) errors.
+
+- Token buckets for requests/min and tokens/min. Tokens are estimated before the
+  call from the prompt plus max_tokens, which is how Azure OpenAI counts them.
+- 429 and transient errors are retried with jittered exponential backoff, waiting
+  at least as long as the service's retry-after header asks.
+- The number of calls in flight adapts to throttling (AIMD): it is halved when a
+  429 arrives and grows back by about one slot per round of successful calls.
+
+    limiter = create_rate_limiter("AZURE_OPENAI_CHAT")
+    response = chat_completion(client, limiter, model=..., messages=..., max_tokens=200)
+
+Settings for a limiter created with prefix P (all optional):
+- P_RPM / P_TPM: the deployment's requests and tokens per minute quota
+- P_MAX_CONCURRENCY (default 32): upper bound for calls in flight
+- P_MAX_RETRIES (default 6): retries after a 429 or transient error
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from common.context_packing import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: throttled, timed out, or a transient server error
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Connection problems raised by the openai SDK before any status is received
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+
+class TokenBucket:
+    """
+    Refills at per_minute / 60 units per second. Azure enforces quotas over short
+    windows, so the bucket only holds 10 seconds' worth of budget for bursts.
+    Reservations may overdraw the bucket; the caller then waits for the debt to refill.
+    """
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute / 6.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        """Take amount from the bucket; returns seconds to wait before using it"""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # A single call larger than the burst size still has to be allowed through
+        self.level -= min(amount, self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+
+class AdaptiveConcurrency:
+    """
+    Limit on calls in flight that follows observed throttling (additive increase,
+    multiplicative decrease). Usable from threads and from asyncio tasks.
+    """
+
+    def __init__(self, max_limit=32, min_limit=1, decrease_interval=1.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.decrease_interval = decrease_interval
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._async_waiters = deque()
+
+    def _try_acquire(self):
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _wake_waiters(self):
+        self._changed.notify_all()
+        while self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(lambda f=future: f.done() or f.set_result(None))
+
+    def acquire(self):
+        with self._changed:
+            while not self._try_acquire():
+                self._changed.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_acquire():
+                    return
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            await future
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_waiters()
+
+    def on_success(self):
+        with self._lock:
+            if self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self._wake_waiters()
+
+    def on_throttle(self):
+        with self._lock:
+            # One burst of 429s counts as a single signal, not one halving per failed call
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_interval:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+
+
+def is_retryable(error):
+    """Whether a failed call may succeed when sent again"""
+    return (getattr(error, "status_code", None) in RETRYABLE_STATUS
+            or type(error).__name__ in RETRYABLE_ERRORS)
+
+
+def retry_after_seconds(error):
+    """Delay requested by the service in a 429/503 response, or None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # an HTTP date instead of seconds; fall back to backoff
+    return None
+
+
+class RateLimiter:
+    """Budgets, retries and adaptive concurrency around one deployment's calls"""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_concurrency=32,
+                 max_retries=6, base_delay=1.0, max_delay=60.0, name="azure-openai"):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "throttled": 0, "retries": 0, "failed": 0, "waited_seconds": 0.0}
+
+    def _reserve(self, estimated_tokens):
+        """Reserve budget for one call; returns seconds to wait before sending it"""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._paused_until - now)
+            if self.requests:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens and estimated_tokens:
+                delay = max(delay, self.tokens.reserve(estimated_tokens, now))
+            self._stats["calls"] += 1
+            self._stats["waited_seconds"] += delay
+            return delay
+
+    def _record_error(self, error):
+        """Note a failed call: a 429 pauses everyone for retry-after and lowers concurrency"""
+        if getattr(error, "status_code", None) != 429:
+            return
+        retry_after = retry_after_seconds(error)
+        with self._lock:
+            self._stats["throttled"] += 1
+            if retry_after:
+                # Everyone waits, not only the caller that was throttled
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        self.concurrency.on_throttle()
+
+    def backoff(self, error, attempt):
+        """Jittered exponential backoff, but never shorter than the service's retry-after"""
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+        return max(retry_after_seconds(error) or 0.0, delay)
+
+    def _retry_delay(self, error, attempt):
+        """Seconds to wait before retrying after error, or None to give up"""
+        if not is_retryable(error):
+            return None
+        with self._lock:
+            if attempt >= self.max_retries:
+                self._stats["failed"] += 1
+                return None
+            self._stats["retries"] += 1
+        delay = self.backoff(error, attempt)
+        logger.info("%s: %s (status %s), retry %d in %.1fs (concurrency limit %d)",
+                    self.name, type(error).__name__, getattr(error, "status_code", None),
+                    attempt + 1, delay, int(self.concurrency.limit))
+        return delay
+
+    def attempt(self, fn, *args, estimated_tokens=0, **kwargs):
+        """
+        One call of fn(*args, **kwargs) within the budget and concurrency limit, no retries.
+        For streamed responses the concurrency slot is released once the stream starts.
+        """
+        delay = self._reserve(estimated_tokens)
+        if delay:
+            time.sleep(delay)
+        self.concurrency.acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._record_error(e)
+            raise
+        else:
+            self.concurrency.on_success()
+            return result
+        finally:
+            self.concurrency.release()
+
+    async def attempt_async(self, fn, *args, estimated_tokens=0, **kwargs):
+        """Async version of attempt()"""
+        delay = self._reserve(estimated_tokens)
+        if delay:
+            await asyncio.sleep(delay)
+        await self.concurrency.acquire_async()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            self._record_error(e)
+            raise
+        else:
+            self.concurrency.on_success()
+            return result
+        finally:
+            self.concurrency.release()
+
+    def call(self, fn, *args, estimated_tokens=0, **kwargs):
+        """Call fn(*args, **kwargs) within the budget, retrying throttled calls"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.attempt(fn, *args, estimated_tokens=estimated_tokens, **kwargs)
+            except Exception as e:
+                retry_in = self._retry_delay(e, attempt)
+                if retry_in is None:
+                    raise
+            time.sleep(retry_in)
+
+    async def acall(self, fn, *args, estimated_tokens=0, **kwargs):
+        """Async version of call() for the async clients: await limiter.acall(client.x.create, ...)"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.attempt_async(fn, *args, estimated_tokens=estimated_tokens, **kwargs)
+            except Exception as e:
+                retry_in = self._retry_delay(e, attempt)
+                if retry_in is None:
+                    raise
+            await asyncio.sleep(retry_in)
+
+    def remaining_tokens(self):
+        """Tokens left in the tokens/min bucket right now, or None without a TPM budget"""
+        if self.tokens is None:
+            return None
+        with self._lock:
+            bucket = self.tokens
+            return min(bucket.capacity, bucket.level + (time.monotonic() - bucket.updated) * bucket.rate)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(concurrency_limit=int(self.concurrency.limit), in_flight=self.concurrency.in_flight)
+        return stats
+
+
+def create_rate_limiter(prefix="AZURE_OPENAI"):
+    """RateLimiter configured from the {prefix}_RPM / _TPM / _MAX_CONCURRENCY / _MAX_RETRIES settings"""
+    def setting(name, default=None):
+        value = os.getenv(f"{prefix}_{name}")
+        return int(value) if value else default
+
+    return RateLimiter(
+        requests_per_minute=setting("RPM"),
+        tokens_per_minute=setting("TPM"),
+        max_concurrency=setting("MAX_CONCURRENCY", 32),
+        max_retries=setting("MAX_RETRIES", 6),
+        name=prefix.lower(),
+    )
+
+
+def estimate_chat_tokens(messages, max_tokens=None):
+    """Tokens Azure counts against TPM for a chat call: the prompt plus max_tokens"""
+    prompt = sum(count_tokens(str(message.get("content") or "")) + 4 for message in messages)
+    return prompt + (max_tokens or 0)
+
+
+def estimate_embedding_tokens(texts):
+    """Tokens in an embeddings input (one string or a list)"""
+    if isinstance(texts, str):
+        return count_tokens(texts)
+    return sum(count_tokens(text) for text in texts)
+
+
+def chat_completion(client, limiter, **kwargs):
+    """client.chat.completions.create(**kwargs) through the limiter"""
+    estimate = estimate_chat_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+    return limiter.call(client.chat.completions.create, estimated_tokens=estimate, **kwargs)
+
+
+def embedding(client, limiter, **kwargs):
+    """client.embeddings.create(**kwargs) through the limiter"""
+    estimate = estimate_embedding_tokens(kwargs.get("input", ""))
+    return limiter.call(client.embeddings.create, estimated_tokens=estimate, **kwargs)
+
+
+async def chat_completion_async(client, limiter, **kwargs):
+    """Async client.chat.completions.create(**kwargs) through the limiter"""
+    estimate = estimate_chat_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+    return await limiter.acall(client.chat.completions.create, estimated_tokens=estimate, **kwargs)
+
+
+async def embedding_async(client, limiter, **kwargs):
+    """Async client.embeddings.create(**kwargs) through the limiter"""
+    estimate = estimate_embedding_tokens(kwargs.get("input", ""))
+    return await limiter.acall(client.embeddings.create, estimated_tokens=estimate, **kwargs)
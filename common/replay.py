@@ -0,0 +1,179 @@
+"""
+Record / Replay Transports
+==========================
+HTTP transports that record real Azure OpenAI and Azure AI Search responses to
+fixture files, and later replay them (with configurable injected latency) without
+touching the network. Used by benchmarks/bench_rag.py to measure client-side cost
+reproducibly.
+
+- ReplayHTTPXTransport plugs into the openai SDK:   AzureOpenAI(http_client=httpx.Client(transport=...))
+- ReplayRequestsAdapter plugs into azure-core:      SearchClient(..., transport=RequestsTransport(session=...))
+
+Fixtures are keyed on method + path + query + (normalized JSON) body, so host names
+and API keys do not need to match between recording and replaying.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx  # installed with the openai SDK
+import requests  # installed with azure-core
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Headers that describe the wire encoding; bodies are stored decoded, so these are dropped
+_HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class FixtureStore:
+    """A folder of recorded responses, one JSON file per request key"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(method, url, body):
+        parts = urlsplit(str(url))
+        query = urlencode(sorted(parse_qsl(parts.query)))
+        if body:
+            try:
+                body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+            except ValueError:
+                pass
+        digest = hashlib.sha256(f"{method.upper()} {parts.path}?{query}\n".encode("utf-8") + (body or b""))
+        return digest.hexdigest()
+
+    def save(self, key, method, url, status, headers, body):
+        headers = {k: v for k, v in headers.items() if k.lower() not in _HOP_HEADERS}
+        try:
+            stored_body, encoding = body.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            stored_body, encoding = base64.b64encode(body).decode("ascii"), "base64"
+        fixture = {
+            "request": {"method": method, "url": urlsplit(str(url)).path},
+            "status": status,
+            "headers": headers,
+            "body": stored_body,
+            "body_encoding": encoding,
+        }
+        with self._lock:
+            (self.directory / f"{key}.json").write_text(json.dumps(fixture, indent=1), encoding="utf-8")
+
+    def load(self, key, method, url):
+        """Return (status, headers, body bytes) for a recorded request"""
+        path = self.directory / f"{key}.json"
+        if not path.exists():
+            raise LookupError(f"No recorded response for {method} {urlsplit(str(url)).path} "
+                              f"in {self.directory} - record it first")
+        fixture = json.loads(path.read_text(encoding="utf-8"))
+        body = fixture["body"].encode("utf-8")
+        if fixture["body_encoding"] == "base64":
+            body = base64.b64decode(body)
+        return fixture["status"], fixture["headers"], body
+
+
+class InjectedLatency:
+    """Simulated network + service time added to every replayed response"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+
+    def sleep(self):
+        delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+
+class ReplayHTTPXTransport(httpx.BaseTransport):
+    """httpx transport for the openai SDK; mode is "record" or "replay" """
+
+    def __init__(self, store, mode="replay", latency=None, inner=None):
+        self.store = store
+        self.mode = mode
+        self.latency = latency or InjectedLatency()
+        self.inner = inner or (httpx.HTTPTransport() if mode == "record" else None)
+
+    def handle_request(self, request):
+        body = request.read()
+        key = self.store.key(request.method, request.url, body)
+        if self.mode == "record":
+            response = self.inner.handle_request(request)
+            content = response.read()
+            response.close()
+            self.store.save(key, request.method, request.url, response.status_code, dict(response.headers), content)
+            status, headers = response.status_code, dict(response.headers)
+        else:
+            status, headers, content = self.store.load(key, request.method, request.url)
+            self.latency.sleep()
+        headers = {k: v for k, v in headers.items() if k.lower() not in _HOP_HEADERS}
+        return httpx.Response(status, headers=headers, content=content, request=request)
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+
+
+class ReplayRequestsAdapter(BaseAdapter):
+    """requests adapter for azure-core's RequestsTransport; mode is "record" or "replay" """
+
+    def __init__(self, store, mode="replay", latency=None, inner=None):
+        super().__init__()
+        self.store = store
+        self.mode = mode
+        self.latency = latency or InjectedLatency()
+        self.inner = inner or (HTTPAdapter() if mode == "record" else None)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        key = self.store.key(request.method, request.url, body)
+        if self.mode == "record":
+            live = self.inner.send(request, stream=False, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+            status, headers, content = live.status_code, dict(live.headers), live.content
+            self.store.save(key, request.method, request.url, status, headers, content)
+        else:
+            status, headers, content = self.store.load(key, request.method, request.url)
+            self.latency.sleep()
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(
+            {k: v for k, v in headers.items() if k.lower() not in _HOP_HEADERS}
+        )
+        response._content = content
+        response._content_consumed = True
+        response.raw = io.BytesIO(content)
+        response.url = request.url
+        response.request = request
+        response.encoding = "utf-8"
+        return response
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+
+
+def replay_http_client(store, mode="replay", latency=None):
+    """httpx.Client for AzureOpenAI(http_client=...)"""
+    return httpx.Client(transport=ReplayHTTPXTransport(store, mode, latency))
+
+
+def replay_search_transport(store, mode="replay", latency=None):
+    """azure-core transport for SearchClient(..., transport=...)"""
+    from azure.core.pipeline.transport import RequestsTransport
+
+    session = requests.Session()
+    adapter = ReplayRequestsAdapter(store, mode, latency)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return RequestsTransport(session=session, session_owner=True)
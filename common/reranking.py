@@ -0,0 +1,271 @@
+"""
+Local Re-ranking with Adaptive Retrieval Depth
+==============================================
+Re-scores retrieved chunks on this machine before they go into the prompt, so the
+prompt gets fewer, better chunks. Retrieval depth adapts per query:
+
+1. Retrieve a shallow candidate list (RETRIEVAL_SHALLOW_K, default the chunks kept
+   plus 5: 8 for 3 chunks) and re-rank it.
+2. If the chunks we keep all come from the top of that list, stop: a deeper search
+   would not change them.
+3. Only when the re-ranker had to pull a kept chunk up from the last RETRIEVAL_TAIL
+   (default 2) places of the shallow list, a sign that more good chunks sit just
+   below it, retrieve RETRIEVAL_DEEP_K (default 50) candidates and re-rank those.
+   Optionally (RETRIEVAL_MARGIN > 0) also go deeper when the kept chunks do not
+   outscore the first dropped one by that share of the score range.
+
+benchmarks/eval_retrieval_depth.py measures how often a set of these settings goes
+deep, and what staying shallow misses, on the Lab-Data PDFs.
+
+Re-rankers (RERANKER):
+- lexical (default): BM25 plus query-term coverage over the candidates, vectorized
+  with NumPy; no model, well under a millisecond for 50 chunks.
+- cross-encoder: a small CPU cross-encoder (RERANKER_MODEL) scoring every
+  (query, chunk) pair in one batch. Needs `pip install sentence-transformers`;
+  falls back to lexical without it.
+- none: keep the search service's order (depth still adapts).
+
+Each query logs its depth, retrieval and re-rank time, and how many kept chunks
+came from beyond the shallow depth (what the deeper search bought), so the
+latency/recall tradeoff can be tuned from the logs or stats().
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from common.local_search import BM25Index, tokenize
+
+logger = logging.getLogger("rag.rerank")
+
+# Words that match every chunk and say nothing about relevance
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or our "
+    "share tell that the this to us was we what when where which who why will with you your".split()
+)
+
+
+def _normalize(scores):
+    """Scale scores to 0..1 (all ones when they are equal)"""
+    scores = np.asarray(scores, dtype=np.float32)
+    if not len(scores):
+        return scores
+    low, high = scores.min(), scores.max()
+    if high - low < 1e-9:
+        return np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+
+def retrieval_scores(documents):
+    """The search service's scores, or 1/rank when results carry none"""
+    scores = [doc.get("@search.score") for doc in documents]
+    if any(score is None for score in scores):
+        return 1.0 / np.arange(1, len(documents) + 1, dtype=np.float32)
+    return np.asarray(scores, dtype=np.float32)
+
+
+class LexicalReranker:
+    """BM25 over the candidates blended with the fraction of query terms each one contains"""
+
+    name = "lexical"
+
+    def __init__(self, text_fields=("title", "chunk")):
+        self.text_fields = text_fields
+
+    def document_text(self, doc):
+        return " ".join(str(doc.get(field) or "") for field in self.text_fields)
+
+    def score(self, query, documents):
+        texts = [self.document_text(doc) for doc in documents]
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term not in STOPWORDS]
+        if not terms or not texts:
+            return np.zeros(len(texts), dtype=np.float32)
+        bm25 = BM25Index(texts).scores(" ".join(terms))
+        # Coverage: documents x terms presence matrix, averaged over the query terms
+        token_sets = [set(tokenize(text)) for text in texts]
+        present = np.array([[term in tokens for term in terms] for tokens in token_sets], dtype=np.float32)
+        return 0.5 * _normalize(bm25) + 0.5 * present.mean(axis=1)
+
+
+class CrossEncoderReranker:
+    """A small cross-encoder scoring (query, chunk) pairs on the CPU, in one batch"""
+
+    name = "cross-encoder"
+
+    def __init__(self, model_name="cross-encoder/ms-marco-MiniLM-L-6-v2", text_fields=("title", "chunk")):
+        from sentence_transformers import CrossEncoder  # optional dependency
+
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.text_fields = text_fields
+
+    def score(self, query, documents):
+        if not documents:
+            return np.zeros(0, dtype=np.float32)
+        pairs = [(query, " ".join(str(doc.get(f) or "") for f in self.text_fields)) for doc in documents]
+        return np.asarray(self.model.predict(pairs, batch_size=32), dtype=np.float32)
+
+
+def create_reranker(kind=None):
+    """Re-ranker named by RERANKER (lexical, cross-encoder or none); None means no re-ranking"""
+    kind = (kind or os.getenv("RERANKER", "lexical")).lower()
+    if kind == "none":
+        return None
+    if kind == "cross-encoder":
+        model_name = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+        try:
+            return CrossEncoderReranker(model_name)
+        except ImportError:
+            logger.warning("RERANKER=cross-encoder needs sentence-transformers; using the lexical re-ranker")
+        except Exception as e:
+            logger.warning("Could not load %s (%s); using the lexical re-ranker", model_name, e)
+    return LexicalReranker()
+
+
+def rerank(query, documents, reranker, weight=0.5):
+    """
+    Documents best-first by a blend of the search service's score and the re-ranker's score
+
+    Returns:
+        (documents, scores): re-ordered documents (with "@rerank.score" set) and their scores
+    """
+    documents = list(documents)
+    prior = _normalize(retrieval_scores(documents))
+    if reranker is None or not documents:
+        return documents, prior
+    scores = (1 - weight) * prior + weight * _normalize(reranker.score(query, documents))
+    order = np.argsort(-scores, kind="stable")
+    return [dict(documents[i], **{"@rerank.score": float(scores[i])}) for i in order], scores[order]
+
+
+class AdaptiveRetriever:
+    """Shallow retrieval + re-ranking, going deeper only when the cut-off is ambiguous"""
+
+    def __init__(self, reranker, keep=3, shallow_k=8, deep_k=50, margin=0.0, weight=0.5, tail=2):
+        self.reranker = reranker
+        self.keep = keep
+        self.shallow_k = shallow_k
+        self.deep_k = deep_k
+        self.margin = margin
+        self.tail = tail
+        self.weight = weight
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "deep": 0, "deep_gain": 0, "search_ms": 0.0, "rerank_ms": 0.0}
+
+    def is_confident(self, scores, candidates, keep=None):
+        """Whether the kept chunks clearly outscore the first dropped one (always true when margin is 0)"""
+        keep = keep or self.keep
+        if self.margin <= 0 or candidates < self.shallow_k or len(scores) <= keep:
+            return True  # the index has no more results to find
+        last_kept, first_dropped = float(scores[keep - 1]), float(scores[keep])
+        spread = float(scores[0] - scores[-1]) or 1.0
+        return (last_kept - first_dropped) / spread >= self.margin
+
+    def _rank(self, query, candidates):
+        started = time.perf_counter()
+        ranked, scores = rerank(query, candidates, self.reranker, self.weight)
+        return ranked, scores, (time.perf_counter() - started) * 1000
+
+    def _record(self, query, search_ms, rerank_ms, deep, kept, shallow_keys, key_field):
+        gain = sum(1 for doc in kept if doc.get(key_field) not in shallow_keys) if deep else 0
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["deep"] += int(deep)
+            self._stats["deep_gain"] += gain
+            self._stats["search_ms"] += search_ms
+            self._stats["rerank_ms"] += rerank_ms
+        logger.info("rerank query=%r depth=%d search_ms=%.1f rerank_ms=%.2f kept=%d from_deep=%d",
+                    query[:80], self.deep_k if deep else self.shallow_k, search_ms, rerank_ms, len(kept), gain)
+
+    def promoted_from_tail(self, ranked, candidates, key_field, keep):
+        """Whether a kept chunk came from the last `tail` places of the search service's ranking"""
+        if len(candidates) < self.shallow_k:
+            return False
+        positions = {doc.get(key_field): i for i, doc in enumerate(candidates)}
+        return any(positions.get(doc.get(key_field), 0) >= len(candidates) - self.tail for doc in ranked[:keep])
+
+    def _first_pass(self, query, candidates, key_field, keep):
+        """Re-rank the shallow candidates; returns (ranked, rerank ms, go deeper?, shallow keys)"""
+        ranked, scores, rerank_ms = self._rank(query, candidates)
+        deep = (not self.is_confident(scores, len(candidates), keep)
+                or self.promoted_from_tail(ranked, candidates, key_field, keep))
+        return ranked, rerank_ms, deep, {doc.get(key_field) for doc in candidates}
+
+    def retrieve(self, query, search_fn, key_field="chunk_id", keep=None):
+        """
+        Best `keep` chunks for the query
+
+        Args:
+            query (str): the search query (used by the re-ranker)
+            search_fn: search_fn(depth) returns up to depth results, best-first
+            key_field (str): field that identifies a chunk
+            keep (int): chunks to return (defaults to self.keep)
+        """
+        started = time.perf_counter()
+        candidates = list(search_fn(self.shallow_k))
+        search_ms = (time.perf_counter() - started) * 1000
+        keep = keep or self.keep
+        ranked, rerank_ms, deep, shallow_keys = self._first_pass(query, candidates, key_field, keep)
+        if deep:
+            started = time.perf_counter()
+            candidates = list(search_fn(self.deep_k))
+            search_ms += (time.perf_counter() - started) * 1000
+            ranked, _, deep_rerank_ms = self._rank(query, candidates)
+            rerank_ms += deep_rerank_ms
+        kept = ranked[:keep]
+        self._record(query, search_ms, rerank_ms, deep, kept, shallow_keys, key_field)
+        return kept
+
+    async def aretrieve(self, query, candidates, deeper_fn, key_field="chunk_id", keep=None, search_ms=0.0):
+        """
+        Async version of retrieve() for shallow candidates the caller already fetched (so the
+        first search can overlap with embedding). await deeper_fn(depth) is only called when
+        the re-ranked cut-off is ambiguous; search_ms is the time the first search took.
+        """
+        keep = keep or self.keep
+        candidates = list(candidates)
+        # Re-ranking is CPU work (a cross-encoder batch can take a while); keep it off the event loop
+        ranked, rerank_ms, deep, shallow_keys = await asyncio.to_thread(
+            self._first_pass, query, candidates, key_field, keep)
+        if deep:
+            started = time.perf_counter()
+            candidates = list(await deeper_fn(self.deep_k))
+            search_ms += (time.perf_counter() - started) * 1000
+            ranked, _, deep_rerank_ms = await asyncio.to_thread(self._rank, query, candidates)
+            rerank_ms += deep_rerank_ms
+        kept = ranked[:keep]
+        self._record(query, search_ms, rerank_ms, deep, kept, shallow_keys, key_field)
+        return kept
+
+    def stats(self):
+        """Share of queries that went deep, what that bought, and average time per stage"""
+        with self._lock:
+            stats = dict(self._stats)
+        queries = stats["queries"] or 1
+        return {
+            "queries": stats["queries"],
+            "deep_ratio": stats["deep"] / queries,
+            "kept_from_deep_per_deep_query": stats["deep_gain"] / (stats["deep"] or 1),
+            "avg_search_ms": stats["search_ms"] / queries,
+            "avg_rerank_ms": stats["rerank_ms"] / queries,
+        }
+
+
+def create_adaptive_retriever(keep=3):
+    """
+    AdaptiveRetriever configured from RERANKER, RERANK_KEEP, RETRIEVAL_* and RERANK_WEIGHT
+    (keep is the number of chunks kept when RERANK_KEEP is not set)
+    """
+    keep = int(os.getenv("RERANK_KEEP") or keep)
+    return AdaptiveRetriever(
+        create_reranker(),
+        keep=keep,
+        shallow_k=int(os.getenv("RETRIEVAL_SHALLOW_K") or keep + 5),
+        deep_k=int(os.getenv("RETRIEVAL_DEEP_K", "50")),
+        margin=float(os.getenv("RETRIEVAL_MARGIN", "0")),
+        weight=float(os.getenv("RERANK_WEIGHT", "0.5")),
+        tail=int(os.getenv("RETRIEVAL_TAIL", "2")),
+    )